@@ -1,13 +1,16 @@
-from ultralytics import YOLO
 import multiprocessing
+from model_registry import register_model
+from rebalance import rebalanced_trainer
+from profile_training import add_profile_arguments, run_profile_from_args
+from ddp_cpu import add_ddp_arguments, train_cpu_ddp
 
-def train():
-    print("🚀 PHASE 2: Training Initiated on RTX 3050...")
-    
-    # Load Small model (Best balance for 6GB VRAM)
-    model = YOLO('yolov8s.pt') 
+# Repeat-factor sampling: rare SKUs are drawn more often (see rebalance.py); opt in with --rebalance
+REBALANCE = False
 
-    model.train(
+def train(rebalance=REBALANCE, profile_args=None, cpu_ddp=0):
+    from ultralytics import YOLO
+    
+    config = dict(
         data='data/vista.yaml',
         
         # --- HARDWARE OPTIMIZATION ---
@@ -37,8 +40,40 @@ def train():
         name='Student_Model_v2',
         exist_ok=True   # Overwrite old run if exists
     )
-    print("✅ Training Complete. Best model saved in RetailEye_Runs/Student_Model_v2/weights/best.pt")
+    trainer = rebalanced_trainer() if rebalance else None
+    
+    if profile_args is not None:
+        run_profile_from_args('yolov8s.pt', config, trainer, profile_args)
+        return
+    
+    if cpu_ddp:
+        # GPU-less host: N data-parallel CPU processes (repeat-factor sampling is single-process only)
+        print(f"🚀 PHASE 2: Training Initiated on {cpu_ddp} CPU workers...")
+        result = train_cpu_ddp('yolov8s.pt', config, cpu_ddp)
+        best_path, class_names = result['best'], result['names']
+    else:
+        print("🚀 PHASE 2: Training Initiated on RTX 3050...")
+        
+        # Load Small model (Best balance for 6GB VRAM)
+        model = YOLO('yolov8s.pt') 
+        model.train(trainer=trainer, **config)
+        best_path, class_names = str(model.trainer.best), model.names
+    print(f"✅ Training Complete. Best model saved in {best_path}")
+    
+    # Record the run so 3_submit.py can resolve it through the registry
+    register_model(best_path, name='Student_Model_v2', class_names=class_names)
+    print(f"📚 Registered {best_path} as 'Student_Model_v2'")
+    print("👉 Promote it with: python model_registry.py alias production Student_Model_v2")
 
 if __name__ == '__main__':
+    import argparse
+    
     multiprocessing.freeze_support()
-    train()
+    parser = argparse.ArgumentParser(description="Train the RetailEye student model")
+    parser.add_argument('--rebalance', action='store_true',
+                        help='Repeat-factor sampling: draw images with rare classes more often')
+    add_profile_arguments(parser)
+    add_ddp_arguments(parser)
+    args = parser.parse_args()
+    train(rebalance=REBALANCE or args.rebalance, profile_args=args if args.profile else None,
+          cpu_ddp=args.cpu_ddp)
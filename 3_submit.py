@@ -1,70 +1,130 @@
-from ultralytics import YOLO
-import pandas as pd
 import glob
 import os
+import time
+import pipeline_metrics as metrics
+from optimize_thresholds import load_thresholds, prediction_floor, accept_detection
+from model_registry import resolve_weights
+from submission_writer import SubmissionWriter, run_key, raw_detections
+from result_manifest import ResultManifest, default_manifest_path
 
 # --- CONFIGURATION ---
-MODEL_PATH = 'runs/detect/RetailEye_Runs/Student_Model_v2/weights/best.pt'
+# 'production' alias from the model registry, else the Student_Model_v2 run
+MODEL_PATH = resolve_weights('production', default='runs/detect/RetailEye_Runs/Student_Model_v2/weights/best.pt')
 TEST_DIR   = 'data/images/test/*.jpg'
 OUTPUT_CSV = 'submissions/final_submission.csv'
+WRITE_PARQUET = False   # Also write final_submission.parquet (raw boxes, scores, latency; needs pyarrow)
+INCREMENTAL = True      # Only infer new/changed test images, reuse the last run's results (--full: all)
 
 # --- STRATEGY SETTINGS ---
 # 0.50 Conf = We must be 50% sure an object exists.
 # 0.60 IoU  = Remove duplicate boxes overlapping by 60%.
+# These are fallbacks - run optimize_thresholds.py to tune them on the val split.
 CONF_THRESHOLD = 0.50  
 IOU_THRESHOLD  = 0.60  
 
-def generate_submission():
+def generate_submission(model=None, parquet=WRITE_PARQUET, incremental=INCREMENTAL):
+    """Write the submission CSV (pass a loaded model to skip the load, e.g. from model_server.py)"""
     print("🚀 PHASE 3: Inference Initiated...")
     
     if not os.path.exists('submissions'): os.makedirs('submissions')
     
-    if not os.path.exists(MODEL_PATH):
-        print(f"❌ Error: Model not found at {MODEL_PATH}. Did you run training?")
-        return
-
-    print(f"🤖 Loading model: {MODEL_PATH}")
-    model = YOLO(MODEL_PATH)
+    thresholds = load_thresholds(default_conf=CONF_THRESHOLD, default_iou=IOU_THRESHOLD)
+    print(f"🎛️  Thresholds: conf={thresholds['conf']:.2f}, iou={thresholds['iou']:.2f}, "
+          f"{len(thresholds['class_conf'])} per-class overrides")
     
-    test_images = glob.glob(TEST_DIR)
+    # Sorted, so an interrupted run's rows are a prefix of the list and can be resumed
+    test_images = sorted(glob.glob(TEST_DIR))
     print(f"📂 Found {len(test_images)} test images. Processing...")
     
-    submission_data = []
+    metrics.enable_from_env()
+    key = run_key(getattr(model, 'ckpt_path', None) or MODEL_PATH, thresholds, imgsz=640)
+    manifest = ResultManifest(default_manifest_path(OUTPUT_CSV), key)
+    if incremental:
+        # Diff against the last run: unchanged images keep their stored labels (and boxes for the sidecar)
+        todo = manifest.diff(test_images, need_raw=parquet)
+        stats = manifest.stats
+        print(f"🧮 Incremental: {stats['new']} new, {stats['changed']} changed, {stats['unchanged']} reused, "
+              f"{stats['removed']} removed → {len(todo)} to infer")
+    else:
+        todo = test_images      # Full run: re-infer everything and rebuild the stored results
+    
+    # Weights are only loaded when something has to be inferred (heavy import, too)
+    if model is None and todo:
+        from ultralytics import YOLO
+        if not os.path.exists(MODEL_PATH):
+            print(f"❌ Error: Model not found at {MODEL_PATH}. Did you run training?")
+            return
+
+        print(f"🤖 Loading model: {MODEL_PATH}")
+        model = YOLO(MODEL_PATH)
+    
+    # Rows are streamed to disk as they come; a crash keeps everything flushed so far.
+    # The manifest is saved with every flush, so rows a resumed run skips stay recorded.
+    out = SubmissionWriter(OUTPUT_CSV, key, parquet=parquet, on_flush=manifest.save)
+    start = out.resume_from([os.path.basename(p) for p in test_images])
+    if not incremental:
+        # Only the rows an interrupted run already wrote keep their stored results
+        written = {os.path.basename(p) for p in test_images[:start]}
+        manifest.images = {name: rec for name, rec in manifest.images.items() if name in written}
     
     # Run Inference in batches (faster) or loop
-    for i, img_path in enumerate(test_images):
-        if i % 100 == 0: print(f"   Processing image {i}/{len(test_images)}...")
+    with out:
+        for i in range(start, len(test_images)):
+            img_path = test_images[i]
+            img_id = os.path.basename(img_path)
+            stored = manifest.label(img_id)
+            if stored is not None:
+                out.write(img_id, stored, *manifest.raw(img_id))
+                continue
+            if i % 100 == 0: print(f"   Processing image {i}/{len(test_images)}...")
+            metrics.gauge('queue_depth', len(test_images) - i, lane='submission')
+            started = time.perf_counter()
         
-        results = model.predict(
-            img_path, 
-            conf=CONF_THRESHOLD, 
-            iou=IOU_THRESHOLD, 
-            imgsz=640, 
-            verbose=False
-        )
+            results = model.predict(
+                metrics.decode(img_path, lane='submission'), 
+                conf=prediction_floor(thresholds), 
+                iou=thresholds['iou'], 
+                imgsz=640, 
+                verbose=False
+            )
         
-        result = results[0]
-        detected_names = []
+            result = results[0]
+            metrics.observe_speed(result, lane='submission')
+            detected_names = []
         
-        if result.boxes:
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                # Safety check for index out of range
-                if cls_id < len(result.names):
-                    cls_name = result.names[cls_id]
-                    detected_names.append(cls_name)
+            if result.boxes:
+                for box in result.boxes:
+                    cls_id = int(box.cls[0])
+                    # Safety check for index out of range
+                    if cls_id < len(result.names):
+                        cls_name = result.names[cls_id]
+                        if accept_detection(cls_name, float(box.conf[0]), thresholds):
+                            detected_names.append(cls_name)
         
-        # Format: "Item1 Item2 Item3"
-        label_str = " ".join(detected_names)
+            # Format: "Item1 Item2 Item3"
+            label_str = " ".join(detected_names)
         
-        img_id = os.path.basename(img_path)
-        submission_data.append({'ImageID': img_id, 'Label': label_str})
-
-    # Save to CSV
-    df = pd.DataFrame(submission_data)
-    df.to_csv(OUTPUT_CSV, index=False)
+            detections = raw_detections(result) if parquet else None   # Kept for the sidecar
+            latency_ms = (time.perf_counter() - started) * 1e3
+            # Recorded before the row: the flush that makes the row durable also saves this
+            manifest.record(img_path, label_str, detections, latency_ms if parquet else None)
+            with metrics.timer('csv_write', lane='submission'):
+                out.write(img_id, label_str, detections, latency_ms=latency_ms)
+            metrics.inc('images', lane='submission')
+            metrics.inc('detections', len(detected_names), lane='submission')
+    metrics.gauge('queue_depth', 0, lane='submission')
     print(f"\n🏆 SUCCESS: Submission Saved to {OUTPUT_CSV}")
     print("👉 Upload this file to Kaggle/Unstop immediately.")
+    return OUTPUT_CSV
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Phase 3: write the submission CSV for the test images')
+    parser.add_argument('--full', action='store_true',
+                        help="Re-infer every test image instead of reusing the last run's results")
+    args = parser.parse_args()
+    generate_submission(incremental=INCREMENTAL and not args.full)
 
 if __name__ == '__main__':
-    generate_submission()
+    main()
@@ -1,12 +1,12 @@
-from ultralytics import YOLO
 import os
 import glob
 import shutil
 from tqdm import tqdm
+from model_registry import resolve_weights
 
 # --- CONFIGURATION ---
-# 1. The Teacher: Your best model so far
-MODEL_PATH = 'runs/detect/RetailEye_Runs/Mosaic_Model_v1/weights/best.pt'
+# 1. The Teacher: Your best model so far ('teacher' alias in the model registry)
+MODEL_PATH = resolve_weights('teacher', default='runs/detect/RetailEye_Runs/Mosaic_Model_v1/weights/best.pt')
 
 # 2. The Unlabeled Data: Multiple sources
 UNLABELED_DIRS = [
@@ -22,18 +22,22 @@ TRAIN_LBL_DIR = 'data/labels/train/'
 # Very low threshold to maximize pseudo-label generation
 CONF_THRESHOLD = 0.01  # 1% confidence - very aggressive
 
-def auto_label():
+def auto_label(model=None):
+    """Pseudo-label the unlabeled pools (pass a loaded teacher to skip the load)"""
+    from ultralytics import YOLO
+    
     print("🚀 PHASE 4: Auto-Labeling (Teacher-Student) - FULL EXPANSION")
     print("=" * 60)
     
-    # Validation
-    if not os.path.exists(MODEL_PATH):
-        print(f"❌ Error: Teacher model not found at {MODEL_PATH}")
-        print("   -> Run '2_train.py' first!")
-        return
+    if model is None:
+        # Validation
+        if not os.path.exists(MODEL_PATH):
+            print(f"❌ Error: Teacher model not found at {MODEL_PATH}")
+            print("   -> Run '2_train.py' first!")
+            return
 
-    print(f"👨‍🏫 Loading Teacher Model: {MODEL_PATH}")
-    model = YOLO(MODEL_PATH)
+        print(f"👨‍🏫 Loading Teacher Model: {MODEL_PATH}")
+        model = YOLO(MODEL_PATH)
     
     # Collect all unlabeled images from multiple sources
     all_images = []
@@ -94,6 +98,7 @@ def auto_label():
     print("=" * 60)
     print("👉 NEXT STEP: python 2_train.py → Train Student_Model_v2")
     print("   (Training will take significantly longer with 1400+ images!)")
+    return {'created': count, 'copied': copied_imgs, 'skipped': skipped}
 
 if __name__ == '__main__':
     auto_label()
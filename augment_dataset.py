@@ -4,8 +4,6 @@ When you have few labeled images, augmentation creates variations
 """
 
 import os
-import cv2
-import numpy as np
 from pathlib import Path
 import shutil
 import random
@@ -36,6 +34,9 @@ class DataAugmenter:
     
     def augment_image(self, img, aug_type):
         """Apply augmentation to image"""
+        import cv2
+        import numpy as np
+        
         if aug_type == "flip_h":
             return cv2.flip(img, 1)  # Horizontal flip
         elif aug_type == "flip_v":
@@ -95,6 +96,8 @@ class DataAugmenter:
             split: 'train' or 'val'
             multiplier: How many augmented versions per original image
         """
+        import cv2
+        
         print("=" * 60)
         print("DATA AUGMENTATION SCRIPT")
         print("=" * 60)
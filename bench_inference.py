@@ -0,0 +1,461 @@
+"""
+Inference Benchmark - Per-stage latency, throughput, memory and load time per backend
+Runs a fixed image set (deterministic synthetic shelf images + sample val images) through
+decode → letterbox → forward → NMS → postprocess for PyTorch, ONNX and INT8 ONNX, each
+backend in its own process so peak RSS and load time are its own. Results are written as
+JSON and compared against a stored baseline; the run FAILS (exit 1) on a regression.
+
+    python bench_inference.py --model production --save-baseline   # record the reference
+    python bench_inference.py --model production                    # compare against it
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+
+# --- CONFIGURATION ---
+BENCH_DIR = 'runs/bench'
+BASELINE = os.path.join(BENCH_DIR, 'inference_baseline.json')
+BACKENDS = ('pytorch', 'onnx', 'int8')
+IMGSZ = 640
+SYNTHETIC_SIZES = [(640, 480), (1280, 720), (1920, 1080), (3024, 4032)]   # (w, h) of phone/shelf shots
+SAMPLE_DIR = 'data/images/val'
+SAMPLE_IMAGES = 8
+BATCH_SIZES = (1, 4, 16)
+REPEATS = 5                 # Passes over the image set for the latency percentiles
+WARMUP = 3
+CONF = 0.25
+IOU = 0.5
+THRESHOLD = 0.10            # Allowed slowdown (or throughput drop) vs baseline
+MIN_DELTA_MS = 1.0          # Smaller absolute changes are noise, never a regression
+STAGES = ('decode', 'letterbox', 'forward', 'nms', 'postprocess')
+
+
+# ============================================================
+# FIXED INPUTS
+# ============================================================
+
+def synthetic_image(width, height, seed):
+    """Shelf-like test image: gradient background, rows of coloured 'products', sensor noise"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    y = np.linspace(60, 200, height, dtype=np.float32)[:, None, None]
+    img = np.broadcast_to(y, (height, width, 3)).copy()
+    shelf_h = max(height // 4, 1)
+    for top in range(0, height - shelf_h + 1, shelf_h):
+        x = 0
+        while x < width:
+            w = int(rng.integers(width // 20 + 1, width // 8 + 2))
+            h = int(rng.integers(shelf_h // 2, shelf_h))
+            img[top + shelf_h - h:top + shelf_h, x:x + w] = rng.integers(0, 256, 3)
+            x += w + int(rng.integers(2, 12))
+    img += rng.normal(0, 6, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def fixed_images(sample_dir=SAMPLE_DIR, samples=SAMPLE_IMAGES):
+    """Synthetic images (generated once, deterministic) + the first `samples` sorted sample images"""
+    import glob
+
+    out_dir = os.path.join(BENCH_DIR, 'images')
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for seed, (w, h) in enumerate(SYNTHETIC_SIZES):
+        path = os.path.join(out_dir, f"synthetic_{w}x{h}.jpg")
+        if not os.path.exists(path):
+            import cv2
+            cv2.imwrite(path, synthetic_image(w, h, seed), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths.append(path)
+    real = sorted(glob.glob(os.path.join(sample_dir, '*.jpg')) + glob.glob(os.path.join(sample_dir, '*.png')))
+    return paths + real[:samples]
+
+
+# ============================================================
+# BACKEND ARTIFACTS
+# ============================================================
+
+def onnx_dynamic(weights, imgsz=IMGSZ):
+    """Dynamic-batch ONNX export, cached by weights content under runs/bench/models"""
+    import shutil
+    from ultralytics import YOLO
+    from model_registry import file_sha256
+
+    model_dir = os.path.join(BENCH_DIR, 'models')
+    os.makedirs(model_dir, exist_ok=True)
+    stem = os.path.join(model_dir, f"{file_sha256(weights)[:12]}_{imgsz}")
+    if not os.path.exists(stem + '.onnx'):
+        shutil.copy2(weights, stem + '.pt')
+        YOLO(stem + '.pt').export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    return stem + '.onnx'
+
+
+def quantize_int8(onnx_path, calib_images, imgsz=IMGSZ):
+    """Static INT8 (QDQ, per-channel weights) quantization calibrated on the fixed images"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    out_path = onnx_path.replace('.onnx', '_int8.onnx')
+    if os.path.exists(out_path):
+        return out_path
+    input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = iter({input_name: letterbox(decode(p), imgsz)[0][None]} for p in calib_images)
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    quantize_static(onnx_path, out_path, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return out_path
+
+
+def prepare_backends(weights, backends, images, imgsz=IMGSZ):
+    """{backend: model path}; backends whose dependencies are missing are skipped"""
+    paths = {}
+    if 'pytorch' in backends:
+        paths['pytorch'] = weights
+    if 'onnx' in backends or 'int8' in backends:
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            print("⚠️  onnxruntime not installed - skipping ONNX/INT8 (pip install onnxruntime)")
+            return paths
+        print("📦 Preparing ONNX export...")
+        onnx_path = onnx_dynamic(weights, imgsz)
+        if 'onnx' in backends:
+            paths['onnx'] = onnx_path
+        if 'int8' in backends:
+            print("📦 Preparing INT8 quantization...")
+            paths['int8'] = quantize_int8(onnx_path, images, imgsz)
+    return paths
+
+
+# ============================================================
+# PIPELINE STAGES (run inside the per-backend process)
+# ============================================================
+
+def decode(path):
+    import cv2
+    return cv2.imread(path)
+
+
+def letterbox(img, size=IMGSZ):
+    """Resize keeping aspect ratio, pad to size x size; returns (CHW float32 RGB, gain, (pad_w, pad_h))"""
+    import cv2
+    import numpy as np
+
+    h, w = img.shape[:2]
+    gain = min(size / h, size / w)
+    nh, nw = round(h * gain), round(w * gain)
+    if (nh, nw) != (h, w):
+        img = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    img = cv2.copyMakeBorder(img, top, size - nh - top, left, size - nw - left,
+                             cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    chw = np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32) / 255.0
+    return chw, gain, (left, top)
+
+
+def load_backend(kind, path, device='cpu'):
+    """Returns forward(batch ndarray) -> raw predictions tensor (b, 4 + nc, anchors)"""
+    import torch
+
+    if kind == 'pytorch':
+        from ultralytics import YOLO
+
+        dev = torch.device('cpu' if device == 'cpu' else f"cuda:{device}")
+        model = YOLO(path).model.fuse(verbose=False).eval().float().to(dev)
+        sync = torch.cuda.synchronize if dev.type == 'cuda' else (lambda: None)
+
+        def forward(batch):
+            with torch.inference_mode():
+                out = model(torch.from_numpy(batch).to(dev))
+            sync()
+            return out[0] if isinstance(out, (list, tuple)) else out
+        return forward
+
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    def forward(batch):
+        return torch.from_numpy(session.run(None, {input_name: batch})[0])
+    return forward
+
+
+def postprocess(det, gain, pad, shape):
+    """Detections of one image back to original-image normalized (cls, conf, xywhn) rows"""
+    h, w = shape[:2]
+    rows = []
+    for x1, y1, x2, y2, conf, cls in det.cpu().tolist():
+        x1, x2 = (x1 - pad[0]) / gain, (x2 - pad[0]) / gain
+        y1, y2 = (y1 - pad[1]) / gain, (y2 - pad[1]) / gain
+        x1, x2 = min(max(x1, 0), w), min(max(x2, 0), w)
+        y1, y2 = min(max(y1, 0), h), min(max(y2, 0), h)
+        rows.append((int(cls), conf, ((x1 + x2) / 2 / w, (y1 + y2) / 2 / h, (x2 - x1) / w, (y2 - y1) / h)))
+    return rows
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024   # bytes on macOS, KB on Linux
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, 'peak_wset', info.rss) / 1024**2
+        except ImportError:
+            return None
+
+
+def percentiles(values_ms):
+    import numpy as np
+
+    v = np.asarray(values_ms)
+    return {'mean_ms': float(v.mean()), 'p50_ms': float(np.percentile(v, 50)),
+            'p95_ms': float(np.percentile(v, 95)), 'p99_ms': float(np.percentile(v, 99))}
+
+
+def run_backend(kind, path, images, imgsz=IMGSZ, device='cpu', repeats=REPEATS, batch_sizes=BATCH_SIZES):
+    """Full measurement of one backend (call in a fresh process)"""
+    import numpy as np
+
+    start = time.perf_counter()
+    import torch
+    from ultralytics.utils.ops import non_max_suppression
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forward = load_backend(kind, path, device)
+    load_s = time.perf_counter() - start
+
+    warm = letterbox(decode(images[0]), imgsz)[0][None]
+    for _ in range(WARMUP):
+        non_max_suppression(forward(warm), CONF, IOU)
+
+    # Per-stage latency, one image at a time
+    stages = {s: [] for s in STAGES + ('total',)}
+    detections = 0
+    for _ in range(repeats):
+        for img_path in images:
+            t0 = time.perf_counter()
+            img = decode(img_path)
+            t1 = time.perf_counter()
+            chw, gain, pad = letterbox(img, imgsz)
+            t2 = time.perf_counter()
+            pred = forward(chw[None])
+            t3 = time.perf_counter()
+            det = non_max_suppression(pred, CONF, IOU)[0]
+            t4 = time.perf_counter()
+            rows = postprocess(det, gain, pad, img.shape)
+            t5 = time.perf_counter()
+            for stage, (a, b) in zip(STAGES + ('total',),
+                                     ((t0, t1), (t1, t2), (t2, t3), (t3, t4), (t4, t5), (t0, t5))):
+                stages[stage].append((b - a) * 1e3)
+            detections += len(rows)
+
+    # End-to-end throughput per batch size
+    throughput = {}
+    for bs in batch_sizes:
+        n = bs * max(2, -(-2 * len(images) // bs))
+        order = [images[i % len(images)] for i in range(n)]
+        batch = np.stack([letterbox(decode(p), imgsz)[0] for p in order[:bs]])
+        non_max_suppression(forward(batch), CONF, IOU)          # Warm this batch shape
+        start = time.perf_counter()
+        for i in range(0, n, bs):
+            imgs = [decode(p) for p in order[i:i + bs]]
+            boxes = [letterbox(img, imgsz) for img in imgs]
+            dets = non_max_suppression(forward(np.stack([b[0] for b in boxes])), CONF, IOU)
+            for det, (_, gain, pad), img in zip(dets, boxes, imgs):
+                postprocess(det, gain, pad, img.shape)
+        throughput[f"bs{bs}"] = n / (time.perf_counter() - start)
+
+    return {'backend': kind, 'path': path, 'import_s': import_s, 'load_s': load_s,
+            'peak_rss_mb': peak_rss_mb(), 'torch_threads': torch.get_num_threads(),
+            'latency': {s: percentiles(v) for s, v in stages.items()},
+            'throughput': throughput, 'detections_per_pass': detections / repeats}
+
+
+def _backend_main(job_path, out_path):
+    with open(job_path) as f:
+        job = json.load(f)
+    result = run_backend(job['kind'], job['path'], job['images'], job['imgsz'], job['device'],
+                         job['repeats'], job['batch_sizes'])
+    with open(out_path, 'w') as f:
+        json.dump(result, f)
+
+
+# ============================================================
+# SUITE
+# ============================================================
+
+def environment(device):
+    env = {'python': platform.python_version(), 'machine': platform.machine(),
+           'processor': platform.processor(), 'cpu_count': os.cpu_count(), 'device': device}
+    for module in ('torch', 'ultralytics', 'onnxruntime', 'cv2'):
+        try:
+            env[module] = __import__(module).__version__
+        except ImportError:
+            env[module] = None
+    return env
+
+
+def run_suite(weights, backends=BACKENDS, imgsz=IMGSZ, device='cpu', repeats=REPEATS, batch_sizes=BATCH_SIZES):
+    images = fixed_images()
+    paths = prepare_backends(weights, backends, images, imgsz)
+    results = {'weights': weights, 'imgsz': imgsz, 'images': [os.path.basename(p) for p in images],
+               'repeats': repeats, 'environment': environment(device), 'backends': {}}
+    for kind, path in paths.items():
+        print(f"\n▶ {kind}: {path}")
+        job = {'kind': kind, 'path': path, 'images': images, 'imgsz': imgsz,
+               'device': device if kind == 'pytorch' else 'cpu', 'repeats': repeats,
+               'batch_sizes': list(batch_sizes)}
+        job_path = os.path.join(BENCH_DIR, f"_job_{kind}.json")
+        out_path = os.path.join(BENCH_DIR, f"_result_{kind}.json")
+        with open(job_path, 'w') as f:
+            json.dump(job, f)
+        code = subprocess.run([sys.executable, os.path.abspath(__file__), '_backend', job_path, out_path]).returncode
+        if code != 0 or not os.path.exists(out_path):
+            print(f"   ❌ {kind} failed (exit code {code})")
+            continue
+        with open(out_path) as f:
+            results['backends'][kind] = json.load(f)
+        os.remove(job_path)
+        os.remove(out_path)
+        print_backend(results['backends'][kind])
+    return results
+
+
+def print_backend(r):
+    rss = f", peak RSS {r['peak_rss_mb']:.0f} MB" if r['peak_rss_mb'] else ''
+    print(f"   load {r['load_s']:.2f}s (imports {r['import_s']:.1f}s){rss}")
+    print(f"   {'stage':12s} {'p50':>8s} {'p95':>8s} {'p99':>8s}  (ms)")
+    for stage, p in r['latency'].items():
+        print(f"   {stage:12s} {p['p50_ms']:8.2f} {p['p95_ms']:8.2f} {p['p99_ms']:8.2f}")
+    print("   throughput   " + "  ".join(f"{k}: {v:.1f} img/s" for k, v in r['throughput'].items()))
+
+
+def flatten(backend):
+    """Comparable metrics of one backend: name -> (value, higher_is_better, is_ms)"""
+    metrics = {'load_s': (backend['load_s'], False, False)}
+    if backend.get('peak_rss_mb'):
+        metrics['peak_rss_mb'] = (backend['peak_rss_mb'], False, False)
+    for stage, p in backend['latency'].items():
+        metrics[f"{stage}.p50_ms"] = (p['p50_ms'], False, True)
+        metrics[f"{stage}.p95_ms"] = (p['p95_ms'], False, True)
+    for key, v in backend['throughput'].items():
+        metrics[f"throughput.{key}"] = (v, True, False)
+    return metrics
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Print current vs baseline; returns the list of regressions"""
+    differs = [k for k in ('processor', 'cpu_count', 'device', 'torch', 'onnxruntime')
+               if results['environment'].get(k) != baseline['environment'].get(k)]
+    if differs:
+        print(f"⚠️  Environment differs from the baseline ({', '.join(differs)}) - comparison may not be meaningful")
+
+    regressions = []
+    for kind, current in results['backends'].items():
+        base = baseline['backends'].get(kind)
+        if base is None:
+            print(f"\n   {kind}: no baseline")
+            continue
+        print(f"\n   {kind}:")
+        base_metrics = flatten(base)
+        for name, (value, higher_better, is_ms) in flatten(current).items():
+            if name not in base_metrics:
+                continue
+            ref = base_metrics[name][0]
+            change = (value - ref) / ref if ref else 0.0
+            worse = -change if higher_better else change
+            regressed = worse > threshold and not (is_ms and abs(value - ref) < MIN_DELTA_MS)
+            mark = '❌' if regressed else ('✅' if worse < -threshold else '  ')
+            print(f"     {mark} {name:24s} {ref:10.2f} → {value:10.2f}  ({change:+.1%})")
+            if regressed:
+                regressions.append(f"{kind} {name}: {ref:.2f} → {value:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    import argparse
+
+    if len(sys.argv) == 4 and sys.argv[1] == '_backend':
+        _backend_main(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description="Inference latency/throughput/memory benchmark per backend")
+    parser.add_argument('--model', type=str, default='production', help='Registry alias/name or weights path')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--device', type=str, default='cpu', help='PyTorch device (cpu or CUDA index)')
+    parser.add_argument('--imgsz', type=int, default=IMGSZ)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Allowed regression (0.10 = 10%%)')
+    parser.add_argument('--baseline', type=str, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--json', type=str, default=os.path.join(BENCH_DIR, 'inference_latest.json'))
+    args = parser.parse_args()
+
+    from model_registry import resolve_weights, find_entry_by_weights, record_benchmark
+
+    weights = resolve_weights(args.model, default=args.model)
+    if not weights or not os.path.exists(weights):
+        print(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("⏱️  INFERENCE BENCHMARK")
+    print("=" * 60)
+    print(f"Model: {weights}  |  imgsz {args.imgsz}  |  backends: {', '.join(args.backends)}")
+    results = run_suite(weights, args.backends, args.imgsz, args.device, args.repeats)
+    if not results['backends']:
+        print("❌ No backend could be measured")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+    with open(args.json, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {args.json}")
+    entry = find_entry_by_weights(weights)
+    if entry:
+        record_benchmark(entry['name'], 'inference_suite', {
+            kind: {'p50_ms': r['latency']['total']['p50_ms'], 'throughput': r['throughput'],
+                   'peak_rss_mb': r['peak_rss_mb']} for kind, r in results['backends'].items()})
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  No baseline at {args.baseline} - run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print("\n" + "=" * 60)
+    print(f"📊 VS BASELINE (threshold {args.threshold:.0%})")
+    print("=" * 60)
+    regressions = compare(results, baseline, args.threshold)
+    print("\n" + "=" * 60)
+    if regressions:
+        print("❌ INFERENCE REGRESSION:")
+        for r in regressions:
+            print(f"   - {r}")
+        print("=" * 60)
+        sys.exit(1)
+    print("✅ No regression vs baseline")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Data-Pipeline Benchmark - Wall time, throughput and peak memory of the data scripts at scale
+Generates synthetic COCO datasets (long-tail category mix, tiny real JPEGs) of configurable
+size, then runs each pipeline stage as its own process against a fresh copy of the dataset:
+conversion, expansion, indexing, augmentation, integrity checks, the JSON diagnostics and
+(with --teacher) pseudo-labelling. Results are JSON and compared against a stored baseline;
+the run FAILS (exit 1) on a regression.
+
+    python bench_pipeline.py --annotations 1000 100000 --save-baseline
+    python bench_pipeline.py --annotations 1000 100000 --stages convert index integrity
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import subprocess
+
+# --- CONFIGURATION ---
+BENCH_DIR = 'runs/bench/pipeline'
+BASELINE = 'runs/bench/pipeline_baseline.json'
+SIZES = [1000, 10000, 100000]     # Annotations per synthetic dataset
+CATEGORIES = 120
+ANNOTATIONS_PER_IMAGE = 10        # Dense shelves
+IMAGE_SIZE = (64, 48)             # (w, h) of the tiny JPEGs
+JPEG_POOL = 16                    # Distinct encoded images written round-robin
+SPLIT_SHARES = {'train': 0.75, 'val': 0.15, 'train_unannotated': 0.10}
+TEST_SHARE = 0.05                 # Extra unlabeled test images (not in the JSON)
+AUGMENT_MULTIPLIER = 2
+THRESHOLD = 0.15                  # Allowed slowdown / memory growth vs baseline
+MIN_DELTA_S = 0.25                # Smaller absolute changes are noise, never a regression
+GENERATOR_VERSION = 1
+
+
+# ============================================================
+# SYNTHETIC DATASET
+# ============================================================
+
+def dataset_plan(annotations, categories=CATEGORIES):
+    images = max(10, annotations // ANNOTATIONS_PER_IMAGE)
+    counts = {split: max(1, int(images * share)) for split, share in SPLIT_SHARES.items()}
+    counts['train'] = images - counts['val'] - counts['train_unannotated']
+    return {'annotations': annotations, 'categories': categories, 'images': images,
+            'splits': counts, 'test_images': max(10, int(images * TEST_SHARE))}
+
+
+def jpeg_pool(seed=0):
+    """A few distinct tiny JPEGs; files are written from these bytes (no per-file encode)"""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    w, h = IMAGE_SIZE
+    pool = []
+    for _ in range(JPEG_POOL):
+        img = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        pool.append(cv2.imencode('.jpg', cv2.GaussianBlur(img, (5, 5), 0))[1].tobytes())
+    return pool
+
+
+def generate_dataset(root, annotations, categories=CATEGORIES, seed=0):
+    """
+    Write <root>/data with raw_annotations/train_annotations.json, images/{train,val,
+    train_unannotated,test}, YOLO labels for train/val and vista.yaml. Returns the plan.
+    """
+    import numpy as np
+
+    plan = dataset_plan(annotations, categories)
+    rng = np.random.default_rng(seed)
+    data = os.path.join(root, 'data')
+    w, h = IMAGE_SIZE
+    n_img = plan['images']
+
+    # Long-tail class mix (a few SKUs dominate), boxes inside the image
+    weights = 1.0 / np.arange(1, categories + 1) ** 0.8
+    cls = rng.choice(categories, annotations, p=weights / weights.sum())
+    img_idx = np.sort(rng.integers(0, n_img, annotations))
+    bw = rng.integers(4, w // 2, annotations)
+    bh = rng.integers(4, h // 2, annotations)
+    bx = (rng.random(annotations) * (w - bw)).astype(int)
+    by = (rng.random(annotations) * (h - bh)).astype(int)
+
+    split_of = []
+    for split, n in plan['splits'].items():
+        split_of += [split] * n
+    names = [f"img_{i:07d}.jpg" for i in range(n_img)]
+
+    pool = jpeg_pool(seed)
+    for split in list(plan['splits']) + ['test']:
+        os.makedirs(os.path.join(data, 'images', split), exist_ok=True)
+    for split in ('train', 'val'):
+        os.makedirs(os.path.join(data, 'labels', split), exist_ok=True)
+    for i, (name, split) in enumerate(zip(names, split_of)):
+        with open(os.path.join(data, 'images', split, name), 'wb') as f:
+            f.write(pool[i % len(pool)])
+    for i in range(plan['test_images']):
+        with open(os.path.join(data, 'images', 'test', f"test_{i:07d}.jpg"), 'wb') as f:
+            f.write(pool[i % len(pool)])
+
+    # YOLO labels for the annotated splits (train_unannotated is left for expand_dataset.py)
+    starts = np.searchsorted(img_idx, np.arange(n_img + 1))
+    for i, (name, split) in enumerate(zip(names, split_of)):
+        if split == 'train_unannotated':
+            continue
+        a, b = starts[i], starts[i + 1]
+        lines = [f"{c} {(x + bw_ / 2) / w:.6f} {(y + bh_ / 2) / h:.6f} {bw_ / w:.6f} {bh_ / h:.6f}\n"
+                 for c, x, y, bw_, bh_ in zip(cls[a:b], bx[a:b], by[a:b], bw[a:b], bh[a:b])]
+        with open(os.path.join(data, 'labels', split, name[:-4] + '.txt'), 'w') as f:
+            f.writelines(lines)
+
+    # COCO JSON, streamed (a 1M-annotation file never exists as Python dicts)
+    os.makedirs(os.path.join(data, 'raw_annotations'), exist_ok=True)
+    with open(os.path.join(data, 'raw_annotations', 'train_annotations.json'), 'w') as f:
+        f.write('{"images": ')
+        json.dump([{'id': i, 'file_name': name, 'width': w, 'height': h} for i, name in enumerate(names)], f)
+        f.write(', "categories": ')
+        json.dump([{'id': c, 'name': f"sku_{c:04d}"} for c in range(categories)], f)
+        f.write(', "annotations": [')
+        chunk = 50000
+        for start in range(0, annotations, chunk):
+            end = min(start + chunk, annotations)
+            f.write((', ' if start else '') + ', '.join(
+                f'{{"id": {k}, "image_id": {img_idx[k]}, "category_id": {cls[k]}, '
+                f'"bbox": [{bx[k]}, {by[k]}, {bw[k]}, {bh[k]}], "area": {bw[k] * bh[k]}, "iscrowd": 0}}'
+                for k in range(start, end)))
+        f.write(']}')
+
+    with open(os.path.join(data, 'vista.yaml'), 'w') as f:
+        f.write(f"path: {os.path.abspath(data)}\ntrain: images/train\nval: images/val\ntest: images/test\n")
+        f.write(f"nc: {categories}\nnames:\n" + ''.join(f"  {c}: sku_{c:04d}\n" for c in range(categories)))
+    return plan
+
+
+def pristine_dataset(annotations, categories=CATEGORIES, seed=0, regenerate=False):
+    """Generated dataset for this size, cached under runs/bench/pipeline/datasets"""
+    key = f"a{annotations}_c{categories}_s{seed}_v{GENERATOR_VERSION}"
+    root = os.path.join(BENCH_DIR, 'datasets', key)
+    marker = os.path.join(root, 'plan.json')
+    if os.path.exists(marker) and not regenerate:
+        with open(marker) as f:
+            return root, json.load(f), 0.0
+    shutil.rmtree(root, ignore_errors=True)
+    start = time.perf_counter()
+    plan = generate_dataset(root, annotations, categories, seed)
+    seconds = time.perf_counter() - start
+    with open(marker, 'w') as f:
+        json.dump(plan, f)
+    return root, plan, seconds
+
+
+def _link_or_copy(src, dst):
+    """Images and the raw JSON are only read by the stages: hard-link them, copy everything else"""
+    if os.sep + 'labels' + os.sep not in src and not src.endswith('.yaml'):
+        try:
+            os.link(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+def fresh_workspace(pristine, work):
+    shutil.rmtree(work, ignore_errors=True)
+    shutil.copytree(os.path.join(pristine, 'data'), os.path.join(work, 'data'), copy_function=_link_or_copy)
+    os.makedirs(os.path.join(work, 'runs'), exist_ok=True)
+
+
+# ============================================================
+# STAGES
+# ============================================================
+
+def _clear_labels(work):
+    for split in ('train', 'val'):
+        path = os.path.join(work, 'data', 'labels', split)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def _register_teacher(teacher):
+    def prepare(work):
+        from model_registry import register_model
+        register_model(os.path.abspath(teacher), name='bench_teacher', alias='teacher',
+                       path=os.path.join(work, 'runs', 'model_registry.json'))
+    return prepare
+
+
+def stage_table(plan, teacher=None):
+    """name -> (argv, prepare(work) or None, items processed, item unit)"""
+    s = plan['splits']
+    labeled = s['train'] + s['val']
+    stages = {
+        'convert': (['convert_data.py'], _clear_labels, plan['annotations'], 'annotations'),
+        'expand': (['expand_dataset.py', '--target', str(plan['images'])], None,
+                   s['train_unannotated'], 'images'),
+        'expand_stats': (['expand_dataset.py', '--stats-only'], None, plan['images'], 'images'),
+        'index': (['dataset_index.py', '--rebuild'], None, plan['images'], 'images'),
+        'augment': (['augment_dataset.py', '--multiplier', str(AUGMENT_MULTIPLIER)], None,
+                    s['train'] * AUGMENT_MULTIPLIER, 'images written'),
+        'integrity': (['check_integrity.py', '--report', 'runs/integrity_report.json'], None,
+                      labeled + s['train_unannotated'] + plan['test_images'], 'images'),
+        'diagnose_json': (['diagnose_json.py'], None, plan['annotations'], 'annotations'),
+        'deep_diagnose': (['deep_diagnose.py'], None, plan['annotations'], 'annotations'),
+        'check_annotations': (['check_annotations.py'], None, plan['annotations'], 'annotations'),
+    }
+    if teacher:
+        stages['auto_expand'] = (['4_auto_expand.py'], _register_teacher(teacher),
+                                 s['train_unannotated'] + plan['test_images'], 'images')
+    return stages
+
+
+def run_stage(argv, work, log_path):
+    """Run one script with cwd=work; returns wall seconds, CPU seconds, peak RSS (MB), exit code"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), argv[0])
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    with open(log_path, 'w') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, script] + argv[1:], cwd=work, env=env,
+                                stdin=subprocess.PIPE, stdout=log, stderr=subprocess.STDOUT)
+        proc.stdin.write(b'yes\n' * 4)    # Small-dataset confirmations
+        proc.stdin.close()
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            cpu = usage.ru_utime + usage.ru_stime
+            peak = usage.ru_maxrss / (1024**2 if sys.platform == 'darwin' else 1024)
+        else:
+            proc.wait()
+            cpu = peak = None
+        wall = time.perf_counter() - start
+    return wall, cpu, peak, proc.returncode
+
+
+def run_size(annotations, stages, categories=CATEGORIES, teacher=None, regenerate=False):
+    print(f"\n📦 Dataset: {annotations:,} annotations, {categories} categories")
+    pristine, plan, gen_s = pristine_dataset(annotations, categories, regenerate=regenerate)
+    print(f"   {plan['images']:,} images ({', '.join(f'{k} {v:,}' for k, v in plan['splits'].items())}, "
+          f"test {plan['test_images']:,})" + (f" - generated in {gen_s:.1f}s" if gen_s else " - cached"))
+
+    table = stage_table(plan, teacher)
+    work = os.path.join(BENCH_DIR, 'work')
+    log_dir = os.path.join(BENCH_DIR, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    results = {'plan': plan, 'generate_s': gen_s, 'stages': {}}
+    for name in stages:
+        if name not in table:
+            print(f"   ⏭️  {name}: not available (auto_expand needs --teacher)")
+            continue
+        argv, prepare, items, unit = table[name]
+        fresh_workspace(pristine, work)
+        if prepare:
+            prepare(work)
+        log_path = os.path.join(log_dir, f"a{annotations}_{name}.log")
+        wall, cpu, peak, code = run_stage(argv, work, log_path)
+        r = {'wall_s': wall, 'cpu_s': cpu, 'peak_rss_mb': peak, 'items': items, 'unit': unit,
+             'items_per_s': items / wall if wall else None, 'exit_code': code}
+        results['stages'][name] = r
+        mark = '✅' if code == 0 else '❌'
+        mem = f"{peak:7.0f} MB" if peak else f"{'-':>10s}"
+        print(f"   {mark} {name:18s} {wall:8.2f}s {r['items_per_s']:12,.0f} {unit}/s {mem}"
+              + ("" if code == 0 else f"  (exit {code}, see {log_path})"))
+    shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Print current vs baseline per size/stage; returns the list of regressions"""
+    regressions = []
+    for size, current in results['sizes'].items():
+        base_size = baseline['sizes'].get(size)
+        if base_size is None:
+            print(f"\n   {size} annotations: no baseline")
+            continue
+        print(f"\n   {size} annotations:")
+        for name, r in current['stages'].items():
+            base = base_size['stages'].get(name)
+            if base is None or r['exit_code'] != 0:
+                continue
+            for key, floor in (('wall_s', MIN_DELTA_S), ('peak_rss_mb', 0)):
+                value, ref = r.get(key), base.get(key)
+                if not value or not ref:
+                    continue
+                change = (value - ref) / ref
+                regressed = change > threshold and value - ref > floor
+                mark = '❌' if regressed else ('✅' if change < -threshold else '  ')
+                print(f"     {mark} {name:18s} {key:12s} {ref:10.2f} → {value:10.2f}  ({change:+.1%})")
+                if regressed:
+                    regressions.append(f"{size} ann / {name} {key}: {ref:.2f} → {value:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    import argparse
+
+    default_stages = list(stage_table(dataset_plan(1000), teacher='x'))
+    parser = argparse.ArgumentParser(description="Benchmark the data-pipeline scripts on synthetic COCO data")
+    parser.add_argument('--annotations', type=int, nargs='+', default=SIZES, help='Dataset sizes (1k-1M)')
+    parser.add_argument('--categories', type=int, default=CATEGORIES)
+    parser.add_argument('--stages', nargs='+', choices=default_stages, default=None,
+                        help='Stages to run (default: all; auto_expand only with --teacher)')
+    parser.add_argument('--teacher', type=str, default=None, help='Weights for the auto_expand stage')
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild cached synthetic datasets')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Allowed regression (0.15 = 15%%)')
+    parser.add_argument('--baseline', type=str, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--json', type=str, default='runs/bench/pipeline_latest.json')
+    args = parser.parse_args()
+
+    # Scripts are run by absolute path; datasets and results stay under the repo's runs/
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    stages = args.stages or [s for s in default_stages if s != 'auto_expand' or args.teacher]
+    if args.teacher and not os.path.exists(args.teacher):
+        print(f"❌ Teacher weights not found: {args.teacher}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("⏱️  DATA-PIPELINE BENCHMARK")
+    print("=" * 60)
+    print(f"Stages: {', '.join(stages)}")
+    results = {'environment': {'python': platform.python_version(), 'machine': platform.machine(),
+                               'processor': platform.processor(), 'cpu_count': os.cpu_count()},
+               'categories': args.categories, 'sizes': {}}
+    for annotations in args.annotations:
+        results['sizes'][str(annotations)] = run_size(annotations, stages, args.categories, args.teacher,
+                                                      args.regenerate)
+
+    os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+    with open(args.json, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {args.json}")
+    failed = [f"{size} ann / {name}" for size, r in results['sizes'].items()
+              for name, s in r['stages'].items() if s['exit_code'] != 0]
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        regressions = []
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\n" + "=" * 60)
+        print(f"📊 VS BASELINE (threshold {args.threshold:.0%})")
+        print("=" * 60)
+        regressions = compare(results, baseline, args.threshold)
+    else:
+        print(f"ℹ️  No baseline at {args.baseline} - run with --save-baseline to create one")
+        regressions = []
+
+    print("\n" + "=" * 60)
+    if failed or regressions:
+        print("❌ PIPELINE REGRESSION:")
+        for item in failed:
+            print(f"   - {item}: stage failed")
+        for r in regressions:
+            print(f"   - {r}")
+        print("=" * 60)
+        sys.exit(1)
+    print("✅ All stages ran" + (" within baseline" if os.path.exists(args.baseline) else ""))
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Startup Benchmark - Cold-start import cost of the stats/diagnostic commands
+Runs each command under `python -X importtime`, summarizes where the time goes,
+and FAILS (exit 1) if a command imports a heavy framework or exceeds its budget
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+# --- CONFIGURATION ---
+# Commands the edge boxes run at boot: (label, argv, import budget in ms)
+COMMANDS = [
+    ('quick_start status', ['quick_start.py', '--status'], 150),
+    ('verify_setup quick', ['verify_setup.py', '--quick'], 150),
+    ('dataset stats', ['expand_dataset.py', '--stats-only'], 150),
+    ('model registry list', ['model_registry.py', 'list'], 150),
+    ('warm worker status', ['model_server.py', 'status'], 200),
+]
+
+# Non-zero exits that are a normal answer, not a crash (checks failed / no worker running).
+# A traceback on stderr still fails the command whatever its exit code.
+EXPECTED_EXIT_CODES = {
+    'verify_setup quick': (0, 1),
+    'warm worker status': (0, 1),
+}
+
+# None of these may be imported by the commands above
+FORBIDDEN = ['torch', 'ultralytics', 'pandas', 'cv2', 'numpy', 'yaml']
+
+TOP_N = 5
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into top-level (module, cumulative_us) pairs
+    and the set of every imported module.
+    """
+    top_level = []
+    imported = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|', 2)
+            cumulative_us = int(cumulative.strip())
+        except ValueError:
+            continue
+        # Nested imports are indented under their parent
+        module = name.strip()
+        imported.add(module)
+        if name.startswith(' ') and not name.startswith('  '):
+            top_level.append((module, cumulative_us))
+    return top_level, imported
+
+
+def measure(argv, repeats=3):
+    """Best-of-N import time and wall time for one command"""
+    best, crash = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime'] + argv,
+                              stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True)
+        wall_ms = 1000 * (time.perf_counter() - start)
+        top_level, imported = parse_importtime(proc.stderr)
+        if 'Traceback (most recent call last)' in proc.stderr and crash is None:
+            crash = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')][-1]
+        import_ms = sum(us for _, us in top_level) / 1000
+        run = {'import_ms': import_ms, 'wall_ms': wall_ms, 'top_level': top_level,
+               'imported': imported, 'returncode': proc.returncode}
+        if best is None or run['import_ms'] < best['import_ms']:
+            best = run
+    best['crash'] = crash
+    return best
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark for diagnostic commands")
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per command (best is kept)')
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='Multiply every budget (slow boxes, CI noise)')
+    parser.add_argument('--json', type=str, default=None, help='Write results to this JSON file')
+
+    args = parser.parse_args()
+
+    # Commands use repo-relative paths
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    print("=" * 60)
+    print("⏱️  COLD-START IMPORT BENCHMARK")
+    print("=" * 60)
+
+    failures = []
+    results = {}
+    for label, argv, budget_ms in COMMANDS:
+        budget_ms *= args.budget_scale
+        run = measure(argv, repeats=args.repeats)
+        heavy = sorted(m for m in FORBIDDEN if m in run['imported'])
+        over = run['import_ms'] > budget_ms
+        failed = run['crash'] or run['returncode'] not in EXPECTED_EXIT_CODES.get(label, (0,))
+        status = '❌' if heavy or over or failed else '✅'
+
+        print(f"\n{status} {label}: imports {run['import_ms']:.0f} ms "
+              f"(budget {budget_ms:.0f} ms), wall {run['wall_ms']:.0f} ms")
+        for module, us in sorted(run['top_level'], key=lambda x: -x[1])[:TOP_N]:
+            print(f"     {us / 1000:7.1f} ms  {module}")
+        if heavy:
+            print(f"     ⚠️  Heavy framework imported: {', '.join(heavy)}")
+            failures.append(f"{label}: imports {', '.join(heavy)}")
+        if failed:
+            reason = run['crash'] or f"exit code {run['returncode']}"
+            print(f"     ⚠️  Command failed: {reason}")
+            failures.append(f"{label}: failed ({reason})")
+        if over:
+            failures.append(f"{label}: {run['import_ms']:.0f} ms > {budget_ms:.0f} ms budget")
+
+        results[label] = {'argv': argv, 'import_ms': run['import_ms'], 'wall_ms': run['wall_ms'],
+                          'budget_ms': budget_ms, 'heavy_imports': heavy,
+                          'returncode': run['returncode'], 'crash': run['crash'],
+                          'top_level': run['top_level'][:TOP_N]}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    print("\n" + "=" * 60)
+    if failures:
+        print("❌ STARTUP REGRESSION:")
+        for failure in failures:
+            print(f"   - {failure}")
+        print("=" * 60)
+        sys.exit(1)
+    print("✅ All diagnostic commands within budget")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
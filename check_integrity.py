@@ -0,0 +1,341 @@
+"""
+Dataset Integrity Checker - Validate every image/label pair in parallel
+Header-only image decode (corrupt/truncated JPEG/PNG, size vs COCO width/height),
+label checks (coords, class ids, zero-area/duplicate boxes) and a JSON report.
+
+Exit codes: 0 = clean, 1 = warnings only, 2 = errors found
+"""
+
+import os
+import sys
+import json
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from dataset_index import SPLITS, IMAGE_EXTS
+
+# --- CONFIGURATION ---
+BASE_PATH = 'data'
+DATA_YAML = 'data/vista.yaml'
+JSON_PATH = 'data/raw_annotations/train_annotations.json'
+REPORT_FILE = 'runs/integrity_report.json'
+
+COORD_TOLERANCE = 1e-3   # Box edges may overshoot [0, 1] by this much (converter rounding)
+CHUNK_SIZE = 256         # Pairs per worker task
+EOI_TAIL = 65536         # Bytes at the end of a JPEG searched for its end-of-image marker
+
+ERRORS = {'image_unreadable', 'image_truncated', 'size_mismatch', 'label_malformed',
+          'coords_out_of_range', 'class_out_of_range', 'zero_area_box'}
+WARNINGS = {'missing_label', 'orphan_label', 'empty_label', 'duplicate_box', 'jpeg_trailing_data'}
+
+EXIT_OK, EXIT_WARNINGS, EXIT_ERRORS = 0, 1, 2
+
+JPEG_EOI = b'\xff\xd9'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'IEND\xaeB`\x82'
+# JPEG start-of-frame markers (C4/C8/CC are DHT/JPG/DAC, not frames)
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# ============================================================
+# IMAGE HEADERS (no pixel decode)
+# ============================================================
+
+def _jpeg_size(f):
+    """Walk JPEG segments up to the first SOF marker and return (width, height)"""
+    f.seek(2)
+    while True:
+        prefix = f.read(1)
+        if not prefix:
+            raise ValueError("no SOF marker before end of file")
+        if prefix != b'\xff':
+            raise ValueError("expected JPEG marker")
+        marker = f.read(1)
+        while marker == b'\xff':        # Fill bytes
+            marker = f.read(1)
+        if not marker:
+            raise ValueError("no SOF marker before end of file")
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue                    # Standalone markers
+        if code in (0xD9, 0xDA):
+            raise ValueError("no SOF marker before image data")
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            raise ValueError("truncated segment header")
+        length = struct.unpack('>H', length_bytes)[0]
+        if code in JPEG_SOF:
+            frame = f.read(5)
+            if len(frame) != 5:
+                raise ValueError("truncated SOF segment")
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _find_marker(f, marker, chunk_size=1 << 20):
+    """True if marker occurs between the current position and the end of the file"""
+    carry = b''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return False
+        if marker in carry + chunk:
+            return True
+        carry = chunk[-(len(marker) - 1):]
+
+
+def read_image_header(path):
+    """
+    (width, height, issue) from the file header alone.
+    issue is None, or (code, detail) for corrupt / truncated files.
+    """
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            head = f.read(32)
+            if head[:2] == b'\xff\xd8':
+                width, height = _jpeg_size(f)
+                frame_end = f.tell()
+                f.seek(max(frame_end, size - EOI_TAIL))
+                if JPEG_EOI in f.read(EOI_TAIL):
+                    return width, height, None
+                # Rare: long trailer after the image. Only a full scan tells it from truncation.
+                f.seek(frame_end)
+                if _find_marker(f, JPEG_EOI):
+                    return width, height, ('jpeg_trailing_data', f"over {EOI_TAIL} bytes after end-of-image")
+                return width, height, ('image_truncated', "no JPEG end-of-image marker")
+            if head[:8] == PNG_SIGNATURE:
+                if head[12:16] != b'IHDR':
+                    return None, None, ('image_unreadable', "PNG without IHDR chunk")
+                width, height = struct.unpack('>II', head[16:24])
+                f.seek(max(0, size - 8))
+                if f.read(8) != PNG_IEND:
+                    return width, height, ('image_truncated', "no PNG IEND chunk")
+                return width, height, None
+        return None, None, ('image_unreadable', "not a JPEG/PNG file")
+    except (OSError, ValueError, struct.error) as e:
+        return None, None, ('image_unreadable', str(e))
+
+
+# ============================================================
+# LABELS
+# ============================================================
+
+def check_label_lines(path, num_classes):
+    """Issues for one YOLO label file: [(code, detail), ...]"""
+    issues = []
+    seen = set()
+    with open(path) as f:
+        lines = f.read().splitlines()
+    if not any(line.strip() for line in lines):
+        return [('empty_label', "no boxes")]
+
+    for n, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != 5:
+            issues.append(('label_malformed', f"line {n}: {len(parts)} fields"))
+            continue
+        try:
+            cls_id = int(parts[0])
+            x, y, w, h = (float(v) for v in parts[1:])
+        except ValueError:
+            issues.append(('label_malformed', f"line {n}: non-numeric value"))
+            continue
+
+        if not 0 <= cls_id < num_classes:
+            issues.append(('class_out_of_range', f"line {n}: class {cls_id} (yaml has {num_classes})"))
+        if w <= 0 or h <= 0:
+            issues.append(('zero_area_box', f"line {n}: w={w:g} h={h:g}"))
+        elif (min(x - w / 2, y - h / 2) < -COORD_TOLERANCE
+              or max(x + w / 2, y + h / 2) > 1 + COORD_TOLERANCE
+              or not (0 <= x <= 1 and 0 <= y <= 1)):
+            issues.append(('coords_out_of_range', f"line {n}: {x:g} {y:g} {w:g} {h:g}"))
+
+        key = (cls_id, round(x, 6), round(y, 6), round(w, 6), round(h, 6))
+        if key in seen:
+            issues.append(('duplicate_box', f"line {n}: duplicate of an earlier box"))
+        seen.add(key)
+    return issues
+
+
+def check_pair(task):
+    """Worker: all issues for one (image, label, expected COCO size) task"""
+    img_path, label_path, expected_wh, num_classes = task
+    issues = []
+    if img_path:
+        width, height, problem = read_image_header(img_path)
+        if problem:
+            issues.append((img_path,) + problem)
+        if expected_wh and width is not None and (width, height) != tuple(expected_wh):
+            issues.append((img_path, 'size_mismatch',
+                           f"{width}x{height} on disk, {expected_wh[0]}x{expected_wh[1]} in COCO JSON"))
+    if label_path:
+        try:
+            issues.extend((label_path,) + issue for issue in check_label_lines(label_path, num_classes))
+        except (OSError, UnicodeDecodeError) as e:
+            issues.append((label_path, 'label_malformed', str(e)))
+    return issues
+
+
+def _check_chunk(tasks):
+    issues = []
+    for task in tasks:
+        issues.extend(check_pair(task))
+    return issues
+
+
+# ============================================================
+# DRIVER
+# ============================================================
+
+def load_num_classes(data_yaml=DATA_YAML):
+    with open(data_yaml) as f:
+        names = yaml.safe_load(f).get('names', {})
+    if isinstance(names, list):
+        return len(names)
+    return max(names) + 1 if names else 0
+
+
+def load_coco_sizes(json_path=JSON_PATH):
+    """{file_name: (width, height)} from the COCO annotation file"""
+    with open(json_path) as f:
+        data = json.load(f)
+    return {img['file_name']: (img['width'], img['height'])
+            for img in data.get('images', []) if 'width' in img and 'height' in img}
+
+
+def _list_names(directory, exts, ignore_case=False):
+    """File names with one of the given extensions (one scandir, same filters as the dataset index)"""
+    if not os.path.isdir(directory):
+        return []
+    with os.scandir(directory) as entries:
+        return [e.name for e in entries
+                if (e.name.lower() if ignore_case else e.name).endswith(exts) and e.is_file()]
+
+
+def build_tasks(splits, num_classes, coco_sizes, base_path=BASE_PATH):
+    """One task per image/label stem; missing/orphan pairs are reported directly"""
+    tasks, issues = [], []
+    for split in splits:
+        images_dir = os.path.join(base_path, 'images', split)
+        labels_dir = os.path.join(base_path, 'labels', split)
+        # Names only - all parsing happens in the workers
+        images = {os.path.splitext(name)[0]: name for name in _list_names(images_dir, IMAGE_EXTS, ignore_case=True)}
+        labels = {name[:-4] for name in _list_names(labels_dir, ('.txt',))}
+        # Unlabeled test images are expected
+        expect_labels = split != 'test' or bool(labels)
+
+        for stem in sorted(set(images) | labels):
+            img_path = os.path.join(images_dir, images[stem]) if stem in images else None
+            label_path = os.path.join(labels_dir, stem + '.txt') if stem in labels else None
+            if img_path is None:
+                issues.append((label_path, 'orphan_label', "no matching image"))
+            elif label_path is None and expect_labels:
+                issues.append((img_path, 'missing_label', "no label file"))
+            expected = coco_sizes.get(images[stem]) if stem in images else None
+            tasks.append((img_path, label_path, expected, num_classes))
+    return tasks, issues
+
+
+def run_checks(splits=SPLITS, workers=None, use_coco=True):
+    """Check every pair in parallel and return the report dict"""
+    start = time.time()
+    num_classes = load_num_classes()
+    coco_sizes = load_coco_sizes() if use_coco and os.path.exists(JSON_PATH) else {}
+    tasks, issues = build_tasks(splits, num_classes, coco_sizes)
+
+    chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            issues.extend(_check_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_issues in pool.map(_check_chunk, chunks):
+                issues.extend(chunk_issues)
+
+    counts = {}
+    for _, code, _ in issues:
+        counts[code] = counts.get(code, 0) + 1
+    n_errors = sum(n for code, n in counts.items() if code in ERRORS)
+    n_warnings = sum(n for code, n in counts.items() if code in WARNINGS)
+
+    return {
+        'splits': list(splits),
+        'pairs_checked': len(tasks),
+        'num_classes': num_classes,
+        'coco_sizes_checked': bool(coco_sizes),
+        'seconds': round(time.time() - start, 2),
+        'errors': n_errors,
+        'warnings': n_warnings,
+        'counts': dict(sorted(counts.items())),
+        'issues': [{'file': path, 'code': code, 'severity': 'error' if code in ERRORS else 'warning',
+                    'detail': detail} for path, code, detail in sorted(issues, key=lambda i: (i[0] or '', i[1]))],
+    }
+
+
+def exit_code(report):
+    if report['errors']:
+        return EXIT_ERRORS
+    if report['warnings']:
+        return EXIT_WARNINGS
+    return EXIT_OK
+
+
+def print_report(report, top=20):
+    print("\n" + "=" * 60)
+    print("🩺 DATASET INTEGRITY REPORT")
+    print("=" * 60)
+    print(f"Pairs checked: {report['pairs_checked']} ({', '.join(report['splits'])}) "
+          f"in {report['seconds']:.1f}s")
+    if not report['coco_sizes_checked']:
+        print("ℹ️  COCO width/height not checked (no annotation JSON)")
+    for code, n in report['counts'].items():
+        icon = '❌' if code in ERRORS else '⚠️ '
+        print(f"  {icon} {code:22s}: {n}")
+    if report['issues']:
+        print(f"\nFirst {min(top, len(report['issues']))} issues:")
+        for issue in report['issues'][:top]:
+            print(f"  [{issue['code']}] {issue['file']}: {issue['detail']}")
+    print("=" * 60)
+    if report['errors']:
+        print(f"❌ {report['errors']} error(s), {report['warnings']} warning(s)")
+    elif report['warnings']:
+        print(f"⚠️  {report['warnings']} warning(s), no errors")
+    else:
+        print("✅ Dataset is clean")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel image/label integrity checker")
+    parser.add_argument('--splits', nargs='*', default=SPLITS, help='Splits to check (default: all)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--report', type=str, default=REPORT_FILE, help=f'JSON report path (default: {REPORT_FILE})')
+    parser.add_argument('--no-coco', action='store_true', help='Skip the COCO width/height comparison')
+    parser.add_argument('--top', type=int, default=20, help='Issues to print (all are in the report)')
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_YAML):
+        print(f"❌ {DATA_YAML} not found - run generate_yaml.py first")
+        sys.exit(EXIT_ERRORS)
+
+    report = run_checks(args.splits, workers=args.workers, use_coco=not args.no_coco)
+    print_report(report, top=args.top)
+
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report saved to {args.report}")
+    sys.exit(exit_code(report))
+
+
+if __name__ == '__main__':
+    main()
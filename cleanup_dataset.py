@@ -5,10 +5,11 @@ This script identifies and fixes issues with your YOLO dataset
 
 import json
 import os
-import glob
 import shutil
 from pathlib import Path
 
+from dataset_index import DatasetIndex
+
 # CONFIGURATION
 JSON_PATH = 'data/raw_annotations/train_annotations.json'
 TRAIN_IMG_DIR = 'data/images/train/'
@@ -25,11 +26,17 @@ def main():
     with open(JSON_PATH) as f:
         data = json.load(f)
     
-    # Get file sets
-    train_imgs = set([os.path.basename(f) for f in glob.glob(os.path.join(TRAIN_IMG_DIR, '*.jpg'))])
-    val_imgs = set([os.path.basename(f) for f in glob.glob(os.path.join(VAL_IMG_DIR, '*.jpg'))])
+    # Get file sets (one scandir per folder via the dataset index)
+    index = DatasetIndex()
+    train_imgs = {name for name in index.images(TRAIN_IMG_DIR) if name.endswith('.jpg')}
+    val_imgs = {name for name in index.images(VAL_IMG_DIR) if name.endswith('.jpg')}
     json_imgs = {img['file_name'] for img in data['images']}
-    train_labels = set([os.path.basename(f) for f in glob.glob(os.path.join(TRAIN_LABEL_DIR, '*.txt'))])
+    train_label_records = index.labels(TRAIN_LABEL_DIR)
+    train_labels = set(train_label_records)
+    try:
+        index.save()    # Next run only re-parses labels that changed
+    except OSError:
+        pass  # Read-only data dir - still usable in memory
     
     print(f"\n📊 CURRENT STATE:")
     print(f"  Total train images: {len(train_imgs)}")
@@ -50,8 +57,7 @@ def main():
     empty_labels = []
     valid_labels = []
     for label_file in train_labels:
-        label_path = os.path.join(TRAIN_LABEL_DIR, label_file)
-        if os.path.getsize(label_path) == 0:
+        if train_label_records[label_file][0] == 0:
             empty_labels.append(label_file)
         else:
             valid_labels.append(label_file)
@@ -0,0 +1,390 @@
+"""
+Copy-Paste Augmentation - Synthetic dense-checkout images from a product crop bank
+Product crops are extracted once into a memory-mapped crop bank, then pasted onto
+background/basket images with controllable density, occlusion and scale
+(labels are generated from the final, occlusion-aware layout). Crops, backgrounds and
+output all stay in the post-split train set, so nothing pasted can leak into val.
+"""
+
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from label_store import LabelStore
+
+# --- CONFIGURATION ---
+BANK_DIR = 'data/crop_bank'
+CROP_SIZE = 128            # Crops are stored in CROP_SIZE x CROP_SIZE slots (aspect kept)
+MIN_CROP_PIXELS = 12       # Boxes smaller than this (source pixels) are not banked
+
+OUTPUT_PREFIX = 'cp'       # Synthetic files: cp_<seed>_<n>.jpg
+HELD_OUT_SPLITS = ('val', 'test')           # Never a crop source, background or output
+SPLIT_MANIFEST = 'data/split_manifest.json'  # split_dataset.py: the bank must be built after it
+DENSITY = 12               # Mean pasted products per image (Poisson)
+MAX_PASTES = 60
+SCALE_RANGE = (0.08, 0.30) # Pasted long side as a fraction of the image short side
+MAX_OCCLUSION = 0.35       # A paste may cover at most this much of any existing box
+MIN_VISIBLE = 0.4          # Boxes less visible than this after all pastes are dropped
+PLACEMENT_TRIES = 16       # Candidate positions evaluated per paste (vectorized)
+FEATHER = 3                # Soft-edge width in pixels
+MASK_STRIDE = 4            # Visibility is tracked on a 1/4-resolution ownership map
+CLASS_BALANCE = 1.0        # 0 = natural class frequencies, 1 = every class equally likely
+
+
+# ============================================================
+# CROP BANK
+# ============================================================
+
+def _extract_chunk(task):
+    """Worker: crop every box of a few images straight into the shared memmap"""
+    bank_path, count, items = task
+    crops = np.memmap(bank_path, dtype=np.uint8, mode='r+', shape=(count, CROP_SIZE, CROP_SIZE, 3))
+    results = []
+    for img_path, start, xywh in items:
+        img = cv2.imread(img_path)
+        hw = np.zeros((len(xywh), 2), dtype=np.int16)
+        if img is None:
+            results.append((start, hw))
+            continue
+        H, W = img.shape[:2]
+        for j, (x, y, w, h) in enumerate(xywh):
+            # Tight crops: the pasted patch IS the new box, so labels stay exact
+            x1 = int(max(0, (x - w / 2) * W))
+            y1 = int(max(0, (y - h / 2) * H))
+            x2 = int(min(W, (x + w / 2) * W))
+            y2 = int(min(H, (y + h / 2) * H))
+            if min(x2 - x1, y2 - y1) < MIN_CROP_PIXELS:
+                continue
+            scale = CROP_SIZE / max(x2 - x1, y2 - y1)
+            cw = max(1, min(CROP_SIZE, round((x2 - x1) * scale)))
+            ch = max(1, min(CROP_SIZE, round((y2 - y1) * scale)))
+            crops[start + j, :ch, :cw] = cv2.resize(img[y1:y2, x1:x2], (cw, ch), interpolation=cv2.INTER_AREA)
+            hw[j] = (ch, cw)
+        results.append((start, hw))
+    crops.flush()
+    return results
+
+
+def _check_split(split):
+    if split in HELD_OUT_SPLITS:
+        raise ValueError(f"copy-paste must not read or write the '{split}' split (train crops would leak into it)")
+
+
+def build_bank(split='train', base_path='data', bank_dir=BANK_DIR, workers=None):
+    """Extract every labeled box of a split into the memory-mapped crop bank"""
+    _check_split(split)
+    images_dir = os.path.join(base_path, 'images', split)
+    store = LabelStore.build(images_dir, os.path.join(base_path, 'labels', split))
+    count = store.n_boxes
+    if count == 0:
+        print(f"❌ No labeled boxes in {images_dir}")
+        return None
+
+    os.makedirs(bank_dir, exist_ok=True)
+    bank_path = os.path.join(bank_dir, 'crops.u8')
+    np.memmap(bank_path, dtype=np.uint8, mode='w+', shape=(count, CROP_SIZE, CROP_SIZE, 3)).flush()
+
+    items = []
+    for row in np.flatnonzero((store.image_files != '') & (store.boxes_per_image() > 0)):
+        if str(store.stems[row]).startswith(OUTPUT_PREFIX + '_'):
+            continue  # Never bank crops of earlier synthetic output (their slots stay invalid)
+        start, end = store.offsets[row], store.offsets[row + 1]
+        items.append((os.path.join(images_dir, str(store.image_files[row])), int(start),
+                      store.xywh[start:end].tolist()))
+    chunks = [(bank_path, count, items[i:i + 64]) for i in range(0, len(items), 64)]
+
+    print(f"🧩 Extracting {sum(len(item[2]) for item in items)} crops from {len(items)} images...")
+    start_time = time.time()
+    hw = np.zeros((count, 2), dtype=np.int16)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_extract_chunk, chunks):
+            for start, chunk_hw in results:
+                hw[start:start + len(chunk_hw)] = chunk_hw
+
+    valid = hw[:, 0] > 0
+    np.savez(os.path.join(bank_dir, 'meta.npz'), cls=store.cls, hw=hw, valid=valid,
+             source=store.stems[store.box_image()])
+    with open(os.path.join(bank_dir, 'bank.json'), 'w') as f:
+        json.dump({'count': int(count), 'crop_size': CROP_SIZE, 'split': split,
+                   'valid': int(valid.sum())}, f, indent=2)
+    print(f"✅ {int(valid.sum())} usable crops banked in {time.time() - start_time:.1f}s → {bank_dir}")
+    return CropBank(bank_dir)
+
+
+class CropBank:
+    """Read-only view of a built crop bank (memmap + metadata index)"""
+
+    def __init__(self, bank_dir=BANK_DIR):
+        with open(os.path.join(bank_dir, 'bank.json')) as f:
+            info = json.load(f)
+        if info['crop_size'] != CROP_SIZE:
+            raise ValueError(f"Crop bank uses {info['crop_size']}px slots, expected {CROP_SIZE} - rebuild it")
+        self.crops = np.memmap(os.path.join(bank_dir, 'crops.u8'), dtype=np.uint8, mode='r',
+                               shape=(info['count'], CROP_SIZE, CROP_SIZE, 3))
+        with np.load(os.path.join(bank_dir, 'meta.npz')) as meta:
+            self.cls = meta['cls']
+            self.hw = meta['hw']
+            self.valid = meta['valid']
+            self.source = meta['source']
+
+    def class_counts(self):
+        return np.bincount(self.cls[self.valid], minlength=int(self.cls.max()) + 1)
+
+    def sampling_weights(self, balance=CLASS_BALANCE, classes=None):
+        """
+        Per-crop sampling probabilities.
+        Class c is drawn with probability ~ count_c ** (1 - balance), so balance=1
+        gives every class the same share and favours rare SKUs.
+        """
+        counts = self.class_counts().astype(np.float64)
+        class_p = np.where(counts > 0, counts ** (1.0 - balance), 0.0)
+        if classes is not None:
+            keep = np.zeros_like(class_p, dtype=bool)
+            keep[[c for c in classes if c < len(keep)]] = True
+            class_p[~keep] = 0.0
+        if class_p.sum() == 0:
+            raise ValueError("No crops for the requested classes")
+        per_crop = np.where(self.valid, class_p[self.cls] / np.maximum(counts[self.cls], 1), 0.0)
+        return per_crop / per_crop.sum()
+
+    def crop(self, i):
+        h, w = self.hw[i]
+        return self.crops[i, :h, :w]
+
+
+# ============================================================
+# COMPOSITING
+# ============================================================
+
+def _feather_alpha(h, w):
+    """(h, w, 1) soft-edge alpha mask"""
+    ramp_y = np.minimum(np.arange(h) + 1, h - np.arange(h)) / FEATHER
+    ramp_x = np.minimum(np.arange(w) + 1, w - np.arange(w)) / FEATHER
+    return np.clip(np.minimum.outer(ramp_y, ramp_x), 0, 1)[..., None].astype(np.float32)
+
+
+def composite(background, bank, crop_ids, rng, existing=None, scale_range=SCALE_RANGE,
+              max_occlusion=MAX_OCCLUSION, min_visible=MIN_VISIBLE):
+    """
+    Paste crops onto a copy of `background`.
+    existing: optional (cls, xywh normalized) arrays of boxes already in the image.
+    Returns (image, cls array, normalized xywh array).
+    """
+    img = background.copy()
+    H, W = img.shape[:2]
+    boxes = []   # pixel [x1, y1, x2, y2]
+    classes = []
+    if existing is not None:
+        for c, (x, y, w, h) in zip(*existing):
+            boxes.append([max(0.0, (x - w / 2) * W), max(0.0, (y - h / 2) * H),
+                          min(W, (x + w / 2) * W), min(H, (y + h / 2) * H)])
+            classes.append(int(c))
+
+    # Ownership map: which box is on top at each (downsampled) pixel
+    owner = np.full((H // MASK_STRIDE + 1, W // MASK_STRIDE + 1), -1, dtype=np.int32)
+
+    def paint(k, x1, y1, x2, y2):
+        s = MASK_STRIDE
+        owner[int(y1) // s:int(np.ceil(y2 / s)), int(x1) // s:int(np.ceil(x2 / s))] = k
+
+    for k, b in enumerate(boxes):
+        paint(k, *b)
+    # Visible cells before any paste: original overlaps between real boxes don't count
+    base_cells = list(np.bincount(owner.ravel() + 1, minlength=len(boxes) + 1)[1:])
+
+    short_side = min(H, W)
+    for i in crop_ids:
+        ch, cw = (int(v) for v in bank.hw[i])
+        scale = rng.uniform(*scale_range) * short_side / max(ch, cw)
+        nw, nh = max(2, min(W, round(cw * scale))), max(2, min(H, round(ch * scale)))
+
+        # Evaluate PLACEMENT_TRIES positions at once against every existing box
+        xs = rng.integers(0, W - nw + 1, PLACEMENT_TRIES)
+        ys = rng.integers(0, H - nh + 1, PLACEMENT_TRIES)
+        if boxes:
+            b = np.asarray(boxes)
+            iw = np.clip(np.minimum(xs[:, None] + nw, b[:, 2]) - np.maximum(xs[:, None], b[:, 0]), 0, None)
+            ih = np.clip(np.minimum(ys[:, None] + nh, b[:, 3]) - np.maximum(ys[:, None], b[:, 1]), 0, None)
+            area = np.maximum((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]), 1)
+            ok = np.flatnonzero(((iw * ih) / area).max(axis=1) <= max_occlusion)
+            if len(ok) == 0:
+                continue  # Too crowded for this product
+            x1, y1 = int(xs[ok[0]]), int(ys[ok[0]])
+        else:
+            x1, y1 = int(xs[0]), int(ys[0])
+
+        patch = cv2.resize(np.asarray(bank.crop(i)), (nw, nh), interpolation=cv2.INTER_LINEAR)
+        patch = patch.astype(np.float32) * rng.uniform(0.8, 1.2)   # Lighting jitter
+        alpha = _feather_alpha(nh, nw)
+        roi = img[y1:y1 + nh, x1:x1 + nw]
+        roi[:] = np.clip(alpha * patch + (1 - alpha) * roi, 0, 255).astype(np.uint8)
+
+        boxes.append([x1, y1, x1 + nw, y1 + nh])
+        classes.append(int(bank.cls[i]))
+        paint(len(boxes) - 1, x1, y1, x1 + nw, y1 + nh)
+        base_cells.append(int((owner == len(boxes) - 1).sum()))
+
+    if not boxes:
+        return img, np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+
+    # Drop boxes that later pastes have mostly covered
+    b = np.asarray(boxes, dtype=np.float64)
+    visible_cells = np.bincount(owner.ravel() + 1, minlength=len(boxes) + 1)[1:]
+    keep = visible_cells / np.maximum(base_cells, 1) >= min_visible
+
+    b = b[keep]
+    xywh = np.stack([(b[:, 0] + b[:, 2]) / 2 / W, (b[:, 1] + b[:, 3]) / 2 / H,
+                     (b[:, 2] - b[:, 0]) / W, (b[:, 3] - b[:, 1]) / H], axis=1)
+    return img, np.asarray(classes)[keep], np.clip(xywh, 0, 1).astype(np.float32)
+
+
+# ============================================================
+# PARALLEL GENERATION
+# ============================================================
+
+_worker = {}
+
+
+def _init_worker(bank_dir, backgrounds, weights, options):
+    _worker['bank'] = CropBank(bank_dir)
+    _worker['backgrounds'] = backgrounds
+    _worker['cdf'] = np.cumsum(weights)  # Inverse-CDF sampling: O(log n) per crop
+    _worker['options'] = options
+
+
+def _generate_chunk(job):
+    """Worker: render a range of synthetic images"""
+    seed, indices, out_images, out_labels = job
+    bank, opts = _worker['bank'], _worker['options']
+    backgrounds, cdf = _worker['backgrounds'], _worker['cdf']
+    written = 0
+    for n in indices:
+        rng = np.random.default_rng([seed, n])
+        bg_path, existing = backgrounds[rng.integers(len(backgrounds))]
+        background = cv2.imread(bg_path)
+        if background is None:
+            continue
+        k = int(np.clip(rng.poisson(opts['density']), 1, MAX_PASTES))
+        crop_ids = np.minimum(np.searchsorted(cdf, rng.random(k), side='right'), len(cdf) - 1)
+        img, cls, xywh = composite(background, bank, crop_ids, rng, existing=existing,
+                                   scale_range=opts['scale_range'],
+                                   max_occlusion=opts['max_occlusion'])
+
+        stem = f"{OUTPUT_PREFIX}_{seed}_{n:06d}"
+        cv2.imwrite(os.path.join(out_images, stem + '.jpg'), img, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        with open(os.path.join(out_labels, stem + '.txt'), 'w') as f:
+            f.writelines(f"{c} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n" for c, (x, y, w, h) in zip(cls, xywh))
+        written += 1
+    return written
+
+
+def load_backgrounds(background_dir=None, split='train', base_path='data'):
+    """
+    [(image path, existing boxes or None)].
+    With background_dir (empty baskets, counters): plain images, no boxes.
+    Otherwise the labeled split itself, keeping its boxes (occlusion-aware).
+    """
+    if background_dir:
+        names = sorted(n for n in os.listdir(background_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+        return [(os.path.join(background_dir, n), None) for n in names]
+
+    images_dir = os.path.join(base_path, 'images', split)
+    store = LabelStore.build(images_dir, os.path.join(base_path, 'labels', split))
+    backgrounds = []
+    for row in np.flatnonzero(store.image_files != ''):
+        if str(store.stems[row]).startswith(OUTPUT_PREFIX + '_'):
+            continue  # Never paste onto earlier synthetic output
+        start, end = store.offsets[row], store.offsets[row + 1]
+        backgrounds.append((os.path.join(images_dir, str(store.image_files[row])),
+                            (store.cls[start:end], store.xywh[start:end])))
+    return backgrounds
+
+
+def generate(count, bank_dir=BANK_DIR, background_dir=None, split='train', out_root='data',
+             density=DENSITY, scale_range=SCALE_RANGE, max_occlusion=MAX_OCCLUSION,
+             balance=CLASS_BALANCE, classes=None, seed=0, workers=None):
+    """Render `count` synthetic images in parallel into <out_root>/{images,labels}/<split>"""
+    _check_split(split)
+    bank = CropBank(bank_dir)
+    weights = bank.sampling_weights(balance=balance, classes=classes)
+    backgrounds = load_backgrounds(background_dir, split)
+    if not backgrounds:
+        print("❌ No background images found")
+        return 0
+
+    out_images = os.path.join(out_root, 'images', split)
+    out_labels = os.path.join(out_root, 'labels', split)
+    os.makedirs(out_images, exist_ok=True)
+    os.makedirs(out_labels, exist_ok=True)
+
+    options = {'density': density, 'scale_range': scale_range, 'max_occlusion': max_occlusion}
+    jobs = [(seed, range(i, min(i + 32, count)), out_images, out_labels) for i in range(0, count, 32)]
+
+    print(f"🎨 Generating {count} images from {int(bank.valid.sum())} crops on {len(backgrounds)} backgrounds...")
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(bank_dir, backgrounds, weights, options)) as pool:
+        written = sum(pool.map(_generate_chunk, jobs))
+    elapsed = time.time() - start
+    print(f"✅ {written} images in {elapsed:.1f}s ({60 * written / max(elapsed, 1e-6):.0f}/min) → {out_images}")
+    return written
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Copy-paste augmentation for dense checkout scenes")
+    sub = parser.add_subparsers(dest='command')
+
+    p_bank = sub.add_parser('bank', help='Extract product crops into the crop bank')
+    p_bank.add_argument('--split', type=str, default='train', help='Split to extract crops from (never val)')
+    p_bank.add_argument('--workers', type=int, default=None)
+
+    p_gen = sub.add_parser('generate', help='Render synthetic images from the crop bank')
+    p_gen.add_argument('--count', type=int, default=1000, help='Images to generate (default: 1000)')
+    p_gen.add_argument('--backgrounds', type=str, default=None,
+                       help='Folder of background/basket images (default: labeled train images)')
+    p_gen.add_argument('--split', type=str, default='train',
+                       help='Split to write into and take backgrounds from (default: train, never val)')
+    p_gen.add_argument('--density', type=float, default=DENSITY, help=f'Mean products per image (default: {DENSITY})')
+    p_gen.add_argument('--scale', type=float, nargs=2, default=SCALE_RANGE, metavar=('MIN', 'MAX'),
+                       help='Product size range as a fraction of the image short side')
+    p_gen.add_argument('--max-occlusion', type=float, default=MAX_OCCLUSION,
+                       help=f'Max fraction of an existing box a paste may cover (default: {MAX_OCCLUSION})')
+    p_gen.add_argument('--balance', type=float, default=CLASS_BALANCE,
+                       help='0 = natural class mix, 1 = equal per class (default: 1)')
+    p_gen.add_argument('--classes', type=int, nargs='*', default=None, help='Only paste these class ids')
+    p_gen.add_argument('--seed', type=int, default=0)
+    p_gen.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.command in ('bank', 'generate') and args.split in HELD_OUT_SPLITS:
+        print(f"❌ --split {args.split} is held out: crops and synthetic images only live in train")
+        return
+    if args.command == 'bank':
+        if not os.path.exists(SPLIT_MANIFEST):
+            print("❌ Split the dataset first (python split_dataset.py) - crops must come from the final train set")
+            return
+        build_bank(split=args.split, workers=args.workers)
+    elif args.command == 'generate':
+        bank_json = os.path.join(BANK_DIR, 'bank.json')
+        if not os.path.exists(bank_json):
+            print("❌ No crop bank yet. Run: python copy_paste.py bank")
+            return
+        if os.path.exists(SPLIT_MANIFEST) and os.path.getmtime(SPLIT_MANIFEST) > os.path.getmtime(bank_json):
+            print("❌ The crop bank predates the last train/val split. Rebuild it: python copy_paste.py bank")
+            return
+        generate(args.count, background_dir=args.backgrounds, split=args.split, density=args.density,
+                 scale_range=tuple(args.scale), max_occlusion=args.max_occlusion,
+                 balance=args.balance, classes=args.classes, seed=args.seed, workers=args.workers)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Dataset Index - One os.scandir pass over images/labels, cached and updated incrementally
+Status and validation views read counts, empty labels and class histograms from here
+instead of re-globbing every folder and calling getsize() per label file
+"""
+
+import os
+import json
+import time
+
+# --- CONFIGURATION ---
+BASE_PATH = 'data'
+INDEX_FILE = 'data/.dataset_index.json'
+SPLITS = ['train', 'val', 'test']
+UNANNOTATED_DIR = 'data/images/train_unannotated'
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+INDEX_VERSION = 2           # 2: one relative key per folder (v1 could hold absolute duplicates)
+
+
+def parse_label_file(path):
+    """Box count and {class_id: count} histogram of one YOLO label file"""
+    hist = {}
+    boxes = 0
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            boxes += 1
+            hist[parts[0]] = hist.get(parts[0], 0) + 1
+    return boxes, hist
+
+
+def dir_key(directory):
+    """One key per folder however it is spelled (relative to the working directory)"""
+    path = os.path.abspath(directory)
+    try:
+        return os.path.relpath(path)
+    except ValueError:
+        return path  # Other drive (Windows) - no relative form
+
+
+class DatasetIndex:
+    def __init__(self, base_path=BASE_PATH, index_file=INDEX_FILE):
+        self.base_path = base_path
+        self.index_file = index_file
+        self.dirs = {}
+        self.fresh = set()  # Directories scanned by this process
+        self.stats = {'scanned': 0, 'parsed': 0, 'seconds': 0.0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # Corrupt cache - rebuild from scratch
+        if saved.get('version') == INDEX_VERSION:
+            self.dirs = saved.get('dirs', {})
+
+    def save(self):
+        """Write the index atomically"""
+        os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+        tmp_path = self.index_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'dirs': self.dirs}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_file)
+
+    # --- Scanning ---------------------------------------------------------
+
+    def scan_dir(self, directory, kind):
+        """
+        Refresh one directory with a single scandir pass.
+        kind='images' records (size, mtime); kind='labels' also parses box counts,
+        but only for files whose size/mtime changed since the last scan.
+        """
+        key = dir_key(directory)
+        old_files = self.dirs.get(key, {}).get('files', {})
+        files = {}
+
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if kind == 'images':
+                        if not name.lower().endswith(IMAGE_EXTS):
+                            continue
+                    elif not name.endswith('.txt'):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    self.stats['scanned'] += 1
+                    record = [st.st_size, st.st_mtime_ns]
+                    if kind == 'labels':
+                        old = old_files.get(name)
+                        if old and old[0] == record[0] and old[1] == record[1]:
+                            record = old
+                        else:
+                            boxes, hist = parse_label_file(entry.path) if st.st_size else (0, {})
+                            record += [boxes, hist]
+                            self.stats['parsed'] += 1
+                    files[name] = record
+
+        self.dirs[key] = {'kind': kind, 'files': files}
+        self.fresh.add(key)
+        return files
+
+    def refresh(self, splits=SPLITS, include_unannotated=True):
+        """Incrementally refresh every split (and the unannotated pool)"""
+        start = time.time()
+        for split in splits:
+            self.scan_dir(os.path.join(self.base_path, 'images', split), 'images')
+            self.scan_dir(os.path.join(self.base_path, 'labels', split), 'labels')
+        if include_unannotated:
+            self.scan_dir(UNANNOTATED_DIR, 'images')
+        self.stats['seconds'] = time.time() - start
+        return self
+
+    # --- Queries ----------------------------------------------------------
+
+    def _files(self, directory, kind):
+        key = dir_key(directory)
+        if key not in self.fresh:
+            self.scan_dir(directory, kind)
+        return self.dirs[key]['files']
+
+    def images(self, directory):
+        """{file_name: [size, mtime_ns]} for the image files in a directory"""
+        return self._files(directory, 'images')
+
+    def labels(self, directory):
+        """{file_name: [size, mtime_ns, n_boxes, {class_id: count}]} for label files"""
+        return self._files(directory, 'labels')
+
+    def summarize(self, images_dir, labels_dir):
+        """Counts, pairing and class histogram for one images/labels directory pair"""
+        images = self.images(images_dir)
+        labels = self.labels(labels_dir)
+        image_stems = {os.path.splitext(name)[0] for name in images}
+        label_stems = {name[:-4] for name in labels}
+
+        class_hist = {}
+        boxes = 0
+        empty = []
+        for name, record in labels.items():
+            boxes += record[2]
+            if record[0] == 0:
+                empty.append(name)
+            for cls_id, count in record[3].items():
+                class_hist[int(cls_id)] = class_hist.get(int(cls_id), 0) + count
+
+        return {
+            'images': len(images),
+            'labels': len(labels),
+            'boxes': boxes,
+            'empty_labels': sorted(empty),
+            'images_without_labels': sorted(image_stems - label_stems),
+            'labels_without_images': sorted(label_stems - image_stems),
+            'class_hist': class_hist,
+        }
+
+    def split_summary(self, split):
+        """summarize() for data/images/<split> + data/labels/<split>"""
+        return self.summarize(os.path.join(self.base_path, 'images', split),
+                              os.path.join(self.base_path, 'labels', split))
+
+
+def get_index(splits=SPLITS, save=True):
+    """Load the cached index, bring it up to date, and persist it"""
+    index = DatasetIndex().refresh(splits)
+    if save:
+        try:
+            index.save()
+        except OSError:
+            pass  # Read-only data dir - still usable in memory
+    return index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build / refresh the dataset index")
+    parser.add_argument('--rebuild', action='store_true', help='Discard the cache and re-parse everything')
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(INDEX_FILE):
+        os.remove(INDEX_FILE)
+
+    index = get_index()
+    print("=" * 60)
+    print("🗂️  DATASET INDEX")
+    print("=" * 60)
+    print(f"Scanned {index.stats['scanned']} files, parsed {index.stats['parsed']} label files "
+          f"in {index.stats['seconds']:.2f}s")
+    for split in SPLITS:
+        s = index.split_summary(split)
+        print(f"\n{split.upper()}: {s['images']} images, {s['labels']} labels, {s['boxes']} boxes")
+        print(f"  Empty labels: {len(s['empty_labels'])} | "
+              f"Images without labels: {len(s['images_without_labels'])} | "
+              f"Labels without images: {len(s['labels_without_images'])}")
+        if s['class_hist']:
+            print(f"  Classes present: {len(s['class_hist'])}")
+    print(f"\n💾 Index: {INDEX_FILE}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+CPU Data-Parallel Training - N training processes over gloo on one GPU-less host
+Each worker trains on its own shard of the dataset (DistributedSampler), gradients are
+all-reduced over gloo and the global batch stays the configured one. The cores are
+split evenly between workers so intra-op threads don't oversubscribe the machine.
+
+    python train_augmented.py --cpu-ddp 8            # a real run, 8 workers
+    python ddp_cpu.py scaling --max-workers 8        # images/sec and efficiency for 1..8 workers
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+
+# --- CONFIGURATION ---
+DDP_DIR = 'runs/ddp_cpu'
+SCALING_EPOCHS = 2          # Timed epoch is the last one (the first includes start-up)
+SCALING_FRACTION = 0.2      # Share of the train set used per scaling trial
+GLOO_TIMEOUT_MINUTES = 180  # Ranks > 0 wait in collectives while rank 0 validates
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def threads_per_worker(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+# ============================================================
+# WORKER SIDE
+# ============================================================
+
+def _patch_for_gloo():
+    """
+    ultralytics' DDP path assumes CUDA: DDP(device_ids=[RANK]) and dist.barrier(device_ids=...).
+    Both are rejected for CPU modules / gloo, so drop device_ids in this process only.
+    """
+    import torch
+    import torch.distributed as dist
+
+    base_ddp = torch.nn.parallel.DistributedDataParallel
+
+    class CPUDistributedDataParallel(base_ddp):
+        def __init__(self, module, device_ids=None, output_device=None, *args, **kwargs):
+            if next(module.parameters()).device.type == 'cpu':
+                device_ids = output_device = None
+            super().__init__(module, device_ids, output_device, *args, **kwargs)
+
+    torch.nn.parallel.DistributedDataParallel = CPUDistributedDataParallel
+
+    barrier = dist.barrier
+
+    def gloo_barrier(*args, device_ids=None, **kwargs):
+        return barrier(*args, **kwargs)
+
+    dist.barrier = gloo_barrier
+
+
+def cpu_ddp_trainer(world_size, base=None):
+    """Trainer subclass (of `base`, default DetectionTrainer) that runs DDP on CPU over gloo"""
+    from datetime import timedelta
+
+    import torch
+    import torch.distributed as dist
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils import RANK
+
+    base = base or DetectionTrainer
+
+    class CPUDDPTrainer(base):
+        def train(self):
+            # BaseTrainer.train() derives world size from CUDA device ids; ours comes from the launcher
+            self._do_train(world_size)
+
+        def _setup_ddp(self, world_size):
+            self.device = torch.device('cpu')
+            dist.init_process_group('gloo', rank=RANK, world_size=world_size,
+                                    timeout=timedelta(minutes=GLOO_TIMEOUT_MINUTES))
+
+    return CPUDDPTrainer
+
+
+def _timing_callbacks(model, out_path):
+    """Rank 0: time each epoch's training steps (validation excluded)"""
+    times = []
+    state = {}
+
+    def on_train_epoch_start(trainer):
+        state['start'] = time.perf_counter()
+
+    def on_train_epoch_end(trainer):
+        times.append(time.perf_counter() - state['start'])
+
+    def on_train_end(trainer):
+        images = len(trainer.train_loader.dataset)
+        with open(out_path, 'w') as f:
+            json.dump({'epoch_seconds': times, 'images_per_epoch': images}, f)
+
+    model.add_callback('on_train_epoch_start', on_train_epoch_start)
+    model.add_callback('on_train_epoch_end', on_train_epoch_end)
+    model.add_callback('on_train_end', on_train_end)
+
+
+def _result_callback(model, out_path):
+    """Rank 0: record where ultralytics actually saved the run (it may differ from project/name)"""
+    def on_train_end(trainer):
+        names = trainer.data.get('names') if isinstance(trainer.data, dict) else None
+        with open(out_path, 'w') as f:
+            json.dump({'save_dir': str(trainer.save_dir), 'best': str(trainer.best),
+                       'names': names}, f)
+
+    model.add_callback('on_train_end', on_train_end)
+
+
+def worker_main(job_path):
+    """Entry point of one rank (RANK/WORLD_SIZE/MASTER_* come from the launcher's env)"""
+    with open(job_path) as f:
+        job = json.load(f)
+    import torch
+    torch.set_num_threads(job['threads'])
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    if world_size > 1:
+        _patch_for_gloo()
+
+    from ultralytics import YOLO
+
+    model = YOLO(job['model'])
+    rank = int(os.environ.get('RANK', -1))
+    if job.get('timing') and rank in (-1, 0):
+        _timing_callbacks(model, job['timing'])
+    if job.get('result') and rank in (-1, 0):
+        _result_callback(model, job['result'])
+    model.train(trainer=cpu_ddp_trainer(world_size), **job['train'])
+
+
+# ============================================================
+# LAUNCHER
+# ============================================================
+
+def launch(model_name, train_args, workers, threads=None, timing=None, result=None, log_dir=DDP_DIR):
+    """
+    Run one training with `workers` CPU processes; rank 0 prints to this console,
+    the others log to <log_dir>/rank<N>.log. Returns 0 when every rank succeeded.
+    With `result`, rank 0 writes {save_dir, best, names} of the finished run there.
+    """
+    threads = threads or threads_per_worker(workers)
+    train_args = dict(train_args, device='cpu')
+    os.makedirs(log_dir, exist_ok=True)
+    fd, job_path = tempfile.mkstemp(suffix='.json', dir=log_dir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'model': model_name, 'train': train_args, 'threads': threads, 'timing': timing,
+                   'result': result}, f)
+
+    port = free_port()
+    procs, logs = [], []
+    try:
+        for rank in range(workers):
+            env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads),
+                       CUDA_VISIBLE_DEVICES='')
+            if workers > 1:
+                env.update(MASTER_ADDR='127.0.0.1', MASTER_PORT=str(port), RANK=str(rank),
+                           LOCAL_RANK=str(rank), WORLD_SIZE=str(workers), LOCAL_WORLD_SIZE=str(workers))
+            cmd = [sys.executable, os.path.abspath(__file__), '_worker', job_path]
+            if rank == 0:
+                procs.append(subprocess.Popen(cmd, env=env))
+            else:
+                log = open(os.path.join(log_dir, f"rank{rank}.log"), 'w')
+                logs.append(log)
+                procs.append(subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT))
+
+        # One dead rank would leave the others blocked in a collective
+        while True:
+            codes = [p.poll() for p in procs]
+            if all(c is not None for c in codes):
+                break
+            if any(c not in (None, 0) for c in codes):
+                failed = [r for r, c in enumerate(codes) if c not in (None, 0)]
+                print(f"❌ Rank(s) {failed} failed - stopping the others (logs in {log_dir})")
+                for p in procs:
+                    if p.poll() is None:
+                        p.terminate()
+                break
+            time.sleep(1)
+        for p in procs:
+            p.wait()
+        return procs[0].returncode or max(p.returncode for p in procs)
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        raise
+    finally:
+        for log in logs:
+            log.close()
+        os.remove(job_path)
+
+
+def train_cpu_ddp(model_name, config, workers):
+    """
+    Real training run (config as passed to model.train) on `workers` CPU processes.
+    Returns rank 0's report: {'save_dir', 'best', 'names'} as ultralytics resolved them.
+    """
+    print("=" * 60)
+    print(f"🧮 CPU DATA-PARALLEL TRAINING: {workers} workers x {threads_per_worker(workers)} threads (gloo)")
+    print("=" * 60)
+    print(f"   Global batch {config.get('batch')} → {max(1, int(config.get('batch', 16)) // workers)} per worker")
+    os.makedirs(DDP_DIR, exist_ok=True)
+    fd, result_path = tempfile.mkstemp(prefix='result_', suffix='.json', dir=DDP_DIR)
+    os.close(fd)
+    try:
+        code = launch(model_name, config, workers, result=result_path)
+        if code != 0:
+            raise RuntimeError(f"CPU DDP training failed (exit code {code})")
+        with open(result_path) as f:
+            result = json.load(f)
+    except ValueError:
+        raise RuntimeError(f"CPU DDP rank 0 exited cleanly but wrote no result to {result_path}")
+    finally:
+        os.remove(result_path)
+    if isinstance(result.get('names'), dict):
+        result['names'] = {int(k): v for k, v in result['names'].items()}   # JSON keys are strings
+    return result
+
+
+def add_ddp_arguments(parser):
+    """--cpu-ddp option shared by the training scripts"""
+    parser.add_argument('--cpu-ddp', type=int, default=0, metavar='N',
+                        help='Train with N data-parallel CPU processes over gloo (no GPU needed)')
+    return parser
+
+
+# ============================================================
+# SCALING BENCHMARK
+# ============================================================
+
+def scaling(model_name, base_args, max_workers, epochs=SCALING_EPOCHS, fraction=SCALING_FRACTION):
+    """
+    Images/sec of the training steps for 1, 2, 4, ... max_workers processes, each with
+    cores // max_workers threads, plus one single process using every core for reference.
+    """
+    counts = sorted({1, max_workers} | {2 ** k for k in range(1, max_workers.bit_length()) if 2 ** k < max_workers})
+    per_worker = threads_per_worker(max_workers)
+    configs = [('threaded', 1, os.cpu_count() or 1)] + [(f"ddp{n}", n, per_worker) for n in counts]
+    args = dict(base_args, epochs=epochs, fraction=fraction, val=False, plots=False, save=False,
+                project=DDP_DIR, exist_ok=True)
+
+    results = []
+    for label, n, threads in configs:
+        print(f"\n▶ {label}: {n} process(es) x {threads} thread(s)")
+        timing = os.path.join(DDP_DIR, f"timing_{label}.json")
+        code = launch(model_name, dict(args, name=f"scaling_{label}"), n, threads=threads, timing=timing)
+        if code != 0 or not os.path.exists(timing):
+            print(f"   ❌ failed (exit code {code})")
+            continue
+        with open(timing) as f:
+            t = json.load(f)
+        seconds = t['epoch_seconds'][-1]
+        results.append({'config': label, 'workers': n, 'threads': threads, 'seconds': seconds,
+                        'images_per_sec': t['images_per_epoch'] / seconds})
+
+    base = next((r for r in results if r['config'] == 'ddp1'), None)
+    threaded = next((r for r in results if r['config'] == 'threaded'), None)
+    print("\n" + "=" * 60)
+    print(f"📈 CPU DDP SCALING ({os.cpu_count()} cores, {per_worker} thread(s) per worker)")
+    print("=" * 60)
+    print(f"   {'config':10s} {'img/s':>8s} {'speedup':>8s} {'efficiency':>10s} {'vs threaded':>12s}")
+    for r in results:
+        if base and r['config'] != 'threaded':
+            r['speedup'] = r['images_per_sec'] / base['images_per_sec']
+            r['efficiency'] = r['speedup'] / r['workers']
+        if threaded:
+            r['vs_threaded'] = r['images_per_sec'] / threaded['images_per_sec']
+        speed = f"{r['speedup']:7.2f}x" if 'speedup' in r else f"{'':8s}"
+        eff = f"{r['efficiency']:10.0%}" if 'efficiency' in r else f"{'':10s}"
+        print(f"   {r['config']:10s} {r['images_per_sec']:8.1f} {speed} {eff} {r.get('vs_threaded', 1):11.2f}x")
+    print("   efficiency = speedup / workers (1.0 = perfect linear scaling)")
+
+    path = os.path.join(DDP_DIR, 'scaling.json')
+    with open(path, 'w') as f:
+        json.dump({'cpu_cores': os.cpu_count(), 'model': model_name, 'args': args, 'results': results}, f, indent=2)
+    print(f"💾 Saved to {path}")
+    return results
+
+
+def main():
+    import argparse
+
+    if len(sys.argv) == 3 and sys.argv[1] == '_worker':
+        worker_main(sys.argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description="CPU data-parallel training over gloo")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('train', 'scaling'):
+        p = sub.add_parser(name)
+        p.add_argument('--model', type=str, default='yolov8s.pt')
+        p.add_argument('--data', type=str, default='data/vista.yaml')
+        p.add_argument('--imgsz', type=int, default=640)
+        p.add_argument('--batch', type=int, default=16, help='Global batch (split across workers)')
+        if name == 'train':
+            p.add_argument('--workers', type=int, default=4, help='Data-parallel processes')
+            p.add_argument('--epochs', type=int, default=50)
+            p.add_argument('--name', type=str, default='cpu_ddp')
+        else:
+            p.add_argument('--max-workers', type=int, default=min(8, os.cpu_count() or 1))
+            p.add_argument('--epochs', type=int, default=SCALING_EPOCHS)
+            p.add_argument('--fraction', type=float, default=SCALING_FRACTION)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found - run generate_yaml.py first")
+        sys.exit(1)
+    base_args = {'data': args.data, 'imgsz': args.imgsz, 'batch': args.batch, 'workers': 0}
+    if args.command == 'train':
+        result = train_cpu_ddp(args.model, dict(base_args, epochs=args.epochs, project='runs/detect',
+                                                name=args.name, exist_ok=True), args.workers)
+        print(f"✅ Done: {result['save_dir']} (best: {result['best']})")
+    else:
+        scaling(args.model, base_args, args.max_workers, args.epochs, args.fraction)
+
+
+if __name__ == '__main__':
+    main()
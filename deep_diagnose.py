@@ -2,6 +2,8 @@ import json
 import os
 import glob
 
+from dataset_index import DatasetIndex
+
 # ADJUST PATH TO YOUR JSON
 JSON_PATH = 'data/raw_annotations/train_annotations.json'
 
@@ -47,24 +49,23 @@ for img_id, count in list(annotations_per_image.items())[:10]:
 # Check if the train label files exist
 print("\n--- Checking Generated Label Files ---")
 TRAIN_LABEL_DIR = 'data/labels/train/'
+index = DatasetIndex()
 if os.path.exists(TRAIN_LABEL_DIR):
-    label_files = glob.glob(os.path.join(TRAIN_LABEL_DIR, '*.txt'))
+    label_files = index.labels(TRAIN_LABEL_DIR)
     print(f"Total label files in train/: {len(label_files)}")
     
-    # Check first few label files for content
+    # Check first few label files for content (box counts come from the index)
     empty_labels = 0
-    for label_path in label_files[:10]:
-        size = os.path.getsize(label_path)
+    checked = list(label_files.items())[:10]
+    for name, (size, _, boxes, _) in checked:
         if size == 0:
             empty_labels += 1
-            print(f"  EMPTY: {os.path.basename(label_path)}")
+            print(f"  EMPTY: {name}")
         else:
-            with open(label_path) as f:
-                lines = f.readlines()
-            print(f"  ✓ {os.path.basename(label_path)}: {len(lines)} annotations ({size} bytes)")
+            print(f"  ✓ {name}: {boxes} annotations ({size} bytes)")
     
     if empty_labels > 0:
-        print(f"\n🚨 WARNING: {empty_labels} out of {len(label_files[:10])} checked label files are EMPTY!")
+        print(f"\n🚨 WARNING: {empty_labels} out of {len(checked)} checked label files are EMPTY!")
 else:
     print(f"Label directory does not exist: {TRAIN_LABEL_DIR}")
 
@@ -77,16 +78,17 @@ if os.path.exists(VAL_IMG_DIR):
     print(f"Total images in val/: {len(val_images)}")
     
     if os.path.exists(VAL_LABEL_DIR):
-        val_labels = glob.glob(os.path.join(VAL_LABEL_DIR, '*.txt'))
+        val_labels = index.labels(VAL_LABEL_DIR)
         print(f"Total label files in val/: {len(val_labels)}")
         
         # Check if val labels are empty
-        for label_path in val_labels:
-            size = os.path.getsize(label_path)
-            filename = os.path.basename(label_path)
+        for filename, (size, _, boxes, _) in val_labels.items():
             if size == 0:
                 print(f"  EMPTY: {filename}")
             else:
-                with open(label_path) as f:
-                    lines = f.readlines()
-                print(f"  ✓ {filename}: {len(lines)} annotations")
+                print(f"  ✓ {filename}: {boxes} annotations")
+
+try:
+    index.save()    # Next run only re-parses labels that changed
+except OSError:
+    pass  # Read-only data dir - still usable in memory
@@ -0,0 +1,246 @@
+"""
+Knowledge Distillation - Train a yolov8n student under a trained yolov8s/m teacher
+The student keeps the normal detection loss and additionally matches the teacher's
+  - neck features feeding the Detect head (1x1 adapters map student -> teacher channels)
+  - class logits (temperature-softened sigmoid, weighted by teacher confidence)
+  - box distributions (DFL bins, temperature-softened KL)
+The run ends with ONNX export and a CPU latency / val mAP report, student vs teacher.
+
+    python distill.py --teacher production --epochs 100
+"""
+
+import os
+import sys
+
+# --- CONFIGURATION ---
+DATA_YAML = 'data/vista.yaml'
+STUDENT = 'yolov8n.pt'
+TEACHER = 'production'        # Registry alias/name, or a weights path
+PROJECT = 'runs/distill'
+
+TEMPERATURE = 2.0
+ALPHA_CLS = 1.0               # Class-logit distillation weight
+ALPHA_BOX = 0.5               # Box-distribution distillation weight
+ALPHA_FEAT = 2.0              # Feature distillation weight
+
+
+class DistillLoss:
+    """
+    Detection loss + distillation terms. Installed as the training model's criterion
+    only; the EMA copy used for validation and checkpoints gets PaddedLoss.
+    """
+
+    def __init__(self, base, student_feats, teacher, teacher_feats, adapters, nc, reg_max,
+                 temperature=TEMPERATURE, alpha_cls=ALPHA_CLS, alpha_box=ALPHA_BOX, alpha_feat=ALPHA_FEAT):
+        import torch
+        import torch.nn.functional as F
+
+        self.torch, self.F = torch, F
+        self.base = base
+        self.student_feats = student_feats     # Filled by a pre-hook on the student's Detect head
+        self.teacher = teacher
+        self.teacher_feats = teacher_feats
+        self.adapters = adapters
+        self.nc, self.reg_max = nc, reg_max
+        self.t = temperature
+        self.alpha = (alpha_cls, alpha_box, alpha_feat)
+
+    def __call__(self, preds, batch):
+        torch, F = self.torch, self.F
+        loss, items = self.base(preds, batch)
+        student = preds[1] if isinstance(preds, tuple) else preds
+
+        with torch.no_grad():
+            out = self.teacher(batch['img'])
+            teacher = out[1] if isinstance(out, tuple) else out
+
+        kd_cls = kd_box = kd_feat = 0.0
+        t = self.t
+        for s_map, t_map in zip(student, teacher):
+            b, _, h, w = s_map.shape
+            s_box, s_cls = s_map.float().split((self.reg_max * 4, self.nc), 1)
+            t_box, t_cls = t_map.float().split((self.reg_max * 4, self.nc), 1)
+            # Teacher confidence focuses both terms on objects instead of background
+            weight = t_cls.sigmoid().amax(1).flatten(1)                              # (b, hw)
+            norm = weight.sum().clamp(min=1e-6)
+
+            cls = F.binary_cross_entropy_with_logits(s_cls / t, (t_cls / t).sigmoid(), reduction='none')
+            kd_cls = kd_cls + (cls.sum(1).flatten(1) * weight).sum() / norm * t * t
+
+            s_dist = s_box.view(b, 4, self.reg_max, h * w)
+            t_dist = t_box.view(b, 4, self.reg_max, h * w)
+            kl = F.kl_div(F.log_softmax(s_dist / t, 2), F.softmax(t_dist / t, 2), reduction='none')
+            kd_box = kd_box + (kl.sum(2).mean(1) * weight).sum() / norm * t * t
+
+        for adapter, s_feat, t_feat in zip(self.adapters, self.student_feats, self.teacher_feats):
+            s_feat = adapter(s_feat.float())
+            kd_feat = kd_feat + F.mse_loss(F.layer_norm(s_feat, s_feat.shape[1:]),
+                                           F.layer_norm(t_feat.float(), t_feat.shape[1:]))
+
+        a_cls, a_box, a_feat = self.alpha
+        kd = a_cls * kd_cls + a_box * kd_box + a_feat * kd_feat
+        batch_size = batch['img'].shape[0]
+        return loss + kd * batch_size, torch.cat((items, kd.detach().reshape(1)))
+
+
+class PaddedLoss:
+    """Plain detection loss with a zero kd_loss item, so validation losses line up with training"""
+
+    def __init__(self, base):
+        self.base = base
+
+    def __call__(self, preds, batch):
+        import torch
+
+        loss, items = self.base(preds, batch)
+        return loss, torch.cat((items, torch.zeros(1, device=items.device)))
+
+
+def distillation_trainer(teacher_weights, temperature=TEMPERATURE, alpha_cls=ALPHA_CLS,
+                         alpha_box=ALPHA_BOX, alpha_feat=ALPHA_FEAT, base=None):
+    """DetectionTrainer subclass that distills `teacher_weights` into the model being trained"""
+    import torch
+    from torch import nn
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.nn.tasks import attempt_load_one_weight
+    from ultralytics.utils.torch_utils import de_parallel
+
+    base = base or DetectionTrainer
+
+    def capture(store):
+        def hook(module, inputs):
+            store[:] = list(inputs[0])
+        return hook
+
+    class DistillationTrainer(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.add_callback('on_train_start', self._setup_distillation)
+
+        def get_validator(self):
+            validator = super().get_validator()
+            self.loss_names = (*self.loss_names, 'kd_loss')
+            return validator
+
+        def _setup_distillation(self, trainer):
+            student = de_parallel(self.model)
+            teacher, _ = attempt_load_one_weight(teacher_weights, device=self.device)
+            teacher = teacher.float().eval()
+            for p in teacher.parameters():
+                p.requires_grad_(False)
+
+            s_head, t_head = student.model[-1], teacher.model[-1]
+            if (s_head.nc, s_head.reg_max) != (t_head.nc, t_head.reg_max) or \
+                    not torch.equal(s_head.stride.cpu(), t_head.stride.cpu()):
+                raise ValueError(f"Teacher head (nc={t_head.nc}) does not match student (nc={s_head.nc}) - "
+                                 "distill from a teacher trained on the same data yaml")
+
+            s_feats, t_feats = [], []
+            s_head.register_forward_pre_hook(capture(s_feats))
+            t_head.register_forward_pre_hook(capture(t_feats))
+
+            # Channels entering each Detect level (from the first conv of the box branch)
+            s_ch = [seq[0].conv.in_channels for seq in s_head.cv2]
+            t_ch = [seq[0].conv.in_channels for seq in t_head.cv2]
+            adapters = nn.ModuleList(nn.Conv2d(sc, tc, 1, bias=False) for sc, tc in zip(s_ch, t_ch)).to(self.device)
+            # Adapters only exist for training; they are not part of the saved student
+            self.optimizer.add_param_group({'params': list(adapters.parameters()), 'weight_decay': 0.0,
+                                            'lr': self.optimizer.param_groups[0]['lr']})
+            for group in self.optimizer.param_groups:
+                group.setdefault('initial_lr', group['lr'])
+
+            student.criterion = DistillLoss(student.init_criterion(), s_feats, teacher, t_feats, adapters,
+                                            s_head.nc, s_head.reg_max, temperature, alpha_cls, alpha_box,
+                                            alpha_feat)
+            self.ema.ema.criterion = PaddedLoss(self.ema.ema.init_criterion())
+            self.distill_modules = (teacher, adapters)
+            print(f"🧑‍🏫 Distilling {teacher_weights} → student (T={temperature}, "
+                  f"cls {alpha_cls}, box {alpha_box}, feat {alpha_feat})")
+
+        def save_model(self):
+            # Checkpoints must not pickle the teacher (or this module's loss classes) via the criteria
+            detached = {}
+            for net in (de_parallel(self.model), self.ema.ema):
+                if 'criterion' in vars(net):
+                    detached[net] = vars(net).pop('criterion')
+            try:
+                super().save_model()
+            finally:
+                for net, criterion in detached.items():
+                    net.criterion = criterion
+
+    return DistillationTrainer
+
+
+def distill(teacher_ref=TEACHER, student=STUDENT, data_yaml=DATA_YAML, epochs=100, imgsz=640, batch=16,
+            device=None, name='nano_distilled', temperature=TEMPERATURE, alpha_cls=ALPHA_CLS,
+            alpha_box=ALPHA_BOX, alpha_feat=ALPHA_FEAT, register_as='distilled_nano'):
+    from ultralytics import YOLO
+    from model_registry import resolve_weights, register_model, record_export, record_benchmark
+    from model_report import measure, export_onnx, print_comparison, save_report, val_images
+
+    teacher_weights = resolve_weights(teacher_ref, default=teacher_ref)
+    if not os.path.exists(teacher_weights):
+        raise FileNotFoundError(f"Teacher not found: {teacher_ref}")
+
+    print("=" * 60)
+    print(f"🧪 DISTILLATION: {teacher_weights} → {student}")
+    print("=" * 60)
+    model = YOLO(student)
+    trainer = distillation_trainer(teacher_weights, temperature, alpha_cls, alpha_box, alpha_feat)
+    model.train(trainer=trainer, data=data_yaml, epochs=epochs, imgsz=imgsz, batch=batch, device=device,
+                workers=0, project=PROJECT, name=name, exist_ok=False, plots=True)
+    best = str(model.trainer.best)
+    save_dir = str(model.trainer.save_dir)
+
+    print("\n📦 Exporting student to ONNX...")
+    onnx_path = export_onnx(best, imgsz)
+    run_name = register_model(best, name=register_as, class_names=model.names)
+    record_export(run_name, 'onnx', onnx_path)
+
+    print("\n⏱️  Measuring teacher and student on CPU...")
+    images = val_images()
+    rows = {
+        'teacher': measure(teacher_weights, data_yaml, images, imgsz),
+        'student': measure(best, data_yaml, images, imgsz),
+        'student (onnx)': measure(onnx_path, data_yaml, images, imgsz, accuracy=False),
+    }
+    print_comparison(rows, reference='teacher', title="DISTILLED STUDENT vs TEACHER")
+    save_report(rows, os.path.join(save_dir, 'distill_report.json'))
+    record_benchmark(run_name, 'cpu_latency', rows['student']['latency'])
+    record_benchmark(run_name, 'vs_teacher', {'teacher': teacher_weights,
+                                              'teacher_map50': rows['teacher']['accuracy']['map50'],
+                                              'teacher_p50_ms': rows['teacher']['latency']['p50_ms']
+                                              if rows['teacher']['latency'] else None})
+    print(f"📚 Registered as '{run_name}' (onnx: {onnx_path})")
+    return best
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distill a trained detector into a nano student")
+    parser.add_argument('--teacher', type=str, default=TEACHER, help='Registry alias/name or weights path')
+    parser.add_argument('--student', type=str, default=STUDENT, help='Student init weights (default: yolov8n.pt)')
+    parser.add_argument('--data', type=str, default=DATA_YAML)
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch', type=int, default=16)
+    parser.add_argument('--device', type=str, default=None)
+    parser.add_argument('--name', type=str, default='nano_distilled')
+    parser.add_argument('--temperature', type=float, default=TEMPERATURE)
+    parser.add_argument('--alpha-cls', type=float, default=ALPHA_CLS)
+    parser.add_argument('--alpha-box', type=float, default=ALPHA_BOX)
+    parser.add_argument('--alpha-feat', type=float, default=ALPHA_FEAT)
+    parser.add_argument('--register-as', type=str, default='distilled_nano')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found - run generate_yaml.py first")
+        sys.exit(1)
+    distill(args.teacher, args.student, args.data, args.epochs, args.imgsz, args.batch, args.device,
+            args.name, args.temperature, args.alpha_cls, args.alpha_box, args.alpha_feat, args.register_as)
+
+
+if __name__ == '__main__':
+    main()
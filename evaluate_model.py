@@ -2,15 +2,18 @@
 Comprehensive Model Evaluation Script
 Evaluates trained model and provides detailed performance metrics
 """
-from ultralytics import YOLO
 import glob
 import os
 import sys
-import yaml
 from pathlib import Path
+from model_registry import resolve_weights, find_entry_by_weights, record_metrics, box_metrics
 
 def find_latest_model():
-    """Find the most recently trained model"""
+    """Resolve the 'production' model from the registry, else the newest best.pt"""
+    registered = resolve_weights('production')
+    if registered:
+        return registered
+    
     search_paths = [
         'runs/detect/RetailEye_Runs/*/weights/best.pt',
         'RetailEye_Runs/*/weights/best.pt'
@@ -25,8 +28,10 @@ def find_latest_model():
         return latest_model
     return None
 
-def evaluate_model(model_path, data_yaml='data/vista.yaml'):
-    """Run comprehensive evaluation"""
+def evaluate_model(model_path, data_yaml='data/vista.yaml', model=None):
+    """Run comprehensive evaluation (pass a loaded model to skip the load)"""
+    import yaml
+    
     print("="*60)
     print("🔬 MODEL EVALUATION")
     print("="*60)
@@ -39,8 +44,10 @@ def evaluate_model(model_path, data_yaml='data/vista.yaml'):
         print(f"❌ Data config not found: {data_yaml}")
         return False
     
-    print(f"📦 Loading model: {model_path}")
-    model = YOLO(model_path)
+    if model is None:
+        from ultralytics import YOLO
+        print(f"📦 Loading model: {model_path}")
+        model = YOLO(model_path)
     
     # Load data config
     with open(data_yaml) as f:
@@ -61,6 +68,11 @@ def evaluate_model(model_path, data_yaml='data/vista.yaml'):
     print(f"mAP@50:           {metrics.box.map50:.4f}")
     print(f"mAP@50-95:        {metrics.box.map:.4f}")
     
+    # Keep the registry's metrics current for registered models
+    entry = find_entry_by_weights(model_path)
+    if entry and record_metrics(entry['name'], box_metrics(metrics)):
+        print(f"📚 Metrics recorded in model registry ('{entry['name']}')")
+    
     # Per-class metrics
     if hasattr(metrics.box, 'maps') and metrics.box.maps is not None:
         print("\n" + "="*60)
@@ -153,6 +165,7 @@ def main():
     if not model_path:
         print("❌ No trained model found!")
         print("\nSearched locations:")
+        print("  - 'production' alias in the model registry (python model_registry.py list)")
         print("  - runs/detect/RetailEye_Runs/*/weights/best.pt")
         print("  - RetailEye_Runs/*/weights/best.pt")
         print("\n⚠️  Train a model first: python train_model.py")
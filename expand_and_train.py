@@ -7,7 +7,6 @@ import os
 import sys
 import subprocess
 from pathlib import Path
-import yaml
 
 
 def run_command(command, description):
@@ -181,23 +181,17 @@ class DatasetExpander:
         print("CURRENT DATASET STATISTICS")
         print("=" * 60)
         
+        from dataset_index import DatasetIndex
+
         splits = ['train', 'val', 'test']
         total_images = 0
         total_labels = 0
+        index = DatasetIndex(str(self.base_path), str(self.base_path / '.dataset_index.json'))
         
         for split in splits:
-            img_dir = self.images_dir / split
-            label_dir = self.labels_dir / split
-            
-            if img_dir.exists():
-                img_count = len(list(img_dir.glob("*.jpg")) + list(img_dir.glob("*.png")))
-            else:
-                img_count = 0
-            
-            if label_dir.exists():
-                label_count = len(list(label_dir.glob("*.txt")))
-            else:
-                label_count = 0
+            summary = index.summarize(self.images_dir / split, self.labels_dir / split)
+            img_count = summary['images']
+            label_count = summary['labels']
             
             print(f"\n{split.upper()}:")
             print(f"  Images: {img_count}")
@@ -213,7 +207,7 @@ class DatasetExpander:
         # Check unannotated
         unannotated_dir = self.images_dir / "train_unannotated"
         if unannotated_dir.exists():
-            unannotated_count = len(list(unannotated_dir.glob("*.jpg")) + list(unannotated_dir.glob("*.png")))
+            unannotated_count = len(index.images(unannotated_dir))
             print(f"\nUNANNOTATED:")
             print(f"  Images: {unannotated_count}")
         
@@ -221,6 +215,10 @@ class DatasetExpander:
         print(f"  Images: {total_images}")
         print(f"  Labels: {total_labels}")
         print("=" * 60)
+        try:
+            index.save()
+        except OSError:
+            pass  # Read-only data dir - counts above are still correct
 
 
 def main():
@@ -0,0 +1,315 @@
+"""
+Fast-Iteration Training - Screen training ideas in a fraction of a full run
+Early stages train at reduced resolution (320 -> 480) on a class-stratified subset of
+the training images, the last stage finishes at 640 on all of them. Each stage starts
+from the previous stage's weights. Results are logged so fast-mode mAP can be checked
+against full runs of the same config (rank correlation, mean gap, speed-up).
+
+    python fast_iterate.py run --set mosaic=0.5 --set mixup=0.1
+    python fast_iterate.py run --full            # also train the full recipe (calibration pair)
+    python fast_iterate.py report
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+from datetime import datetime
+
+import yaml
+
+from label_store import LabelStore
+from split_dataset import stratify
+
+# --- CONFIGURATION ---
+FAST_DIR = 'runs/fast'
+RESULTS_FILE = 'runs/fast/experiments.json'
+DEFAULT_PROFILE = 'profiles/augmented.yaml'
+SUBSET_FRACTION = 0.25
+# (imgsz, epochs, subset?) - the final stage always uses the full training set
+SCHEDULE = [(320, 4, True), (480, 3, True), (640, 3, False)]
+METRIC = 'metrics/mAP50(B)'
+
+
+# ============================================================
+# DATA
+# ============================================================
+
+def resolve_splits(data_yaml):
+    """(names, train images dir, val entry) from an ultralytics data yaml, as absolute paths"""
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+    root = os.path.abspath(data.get('path', os.path.dirname(data_yaml)))
+    train = os.path.join(root, data['train'])
+    val = os.path.join(root, data['val'])
+    return data['names'], train, val
+
+
+def stratified_subset(train_dir, fraction=SUBSET_FRACTION, seed=0):
+    """
+    Image paths of a class-stratified subset (same greedy stratification as
+    split_dataset.py: per-class box counts track `fraction`, augmented variants
+    stay with their source image).
+    """
+    labels_dir = os.path.join(os.path.dirname(os.path.dirname(train_dir)), 'labels',
+                              os.path.basename(os.path.normpath(train_dir)))
+    store = LabelStore.build(train_dir, labels_dir)
+    rows, totals, counts, _ = stratify(store, ratio=fraction, seed=seed)
+    paths = [os.path.join(train_dir, str(store.image_files[row])) for row in rows]
+    present = totals > 0
+    coverage = float((counts[present] > 0).mean()) if present.any() else 1.0
+    return paths, coverage, int((store.image_files != '').sum())
+
+
+def write_subset_yaml(out_dir, names, val, paths):
+    os.makedirs(out_dir, exist_ok=True)
+    list_path = os.path.abspath(os.path.join(out_dir, 'subset_train.txt'))
+    with open(list_path, 'w') as f:
+        f.write('\n'.join(paths) + '\n')
+    yaml_path = os.path.join(out_dir, 'subset.yaml')
+    with open(yaml_path, 'w') as f:
+        yaml.safe_dump({'train': list_path, 'val': val, 'names': names}, f, sort_keys=False)
+    return yaml_path
+
+
+def parse_schedule(text):
+    """'320:4,480:3,640:3' -> SCHEDULE format (all but the last stage on the subset)"""
+    stages = [tuple(int(v) for v in part.split(':')) for part in text.split(',')]
+    return [(size, epochs, i < len(stages) - 1) for i, (size, epochs) in enumerate(stages)]
+
+
+def parse_overrides(pairs):
+    """['mosaic=0.5', 'optimizer=SGD'] -> {'mosaic': 0.5, 'optimizer': 'SGD'}"""
+    return {k: yaml.safe_load(v) for k, v in (p.split('=', 1) for p in pairs or [])}
+
+
+def read_metric(run_dir, metric=METRIC):
+    """(final, best) value of a metric column in an ultralytics results.csv"""
+    path = os.path.join(run_dir, 'results.csv')
+    if not os.path.exists(path):
+        return None, None
+    with open(path) as f:
+        rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    values = [float(r[metric]) for r in rows if r.get(metric, '').strip()]
+    if not values:
+        return None, None
+    return values[-1], max(values)
+
+
+def relative_cost(stages, n_full):
+    """Training cost in full-resolution full-data image-epochs"""
+    return sum(epochs * n * (size / 640) ** 2 for size, epochs, n in stages) / max(n_full, 1)
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+def train_stage(weights, data_yaml, train_args, imgsz, epochs, project, name, first):
+    from ultralytics import YOLO
+
+    args = dict(train_args, data=data_yaml, imgsz=imgsz, epochs=epochs, project=project, name=name,
+                exist_ok=True, plots=False)
+    if not first:
+        args['warmup_epochs'] = 0     # Weights are already warm; only the first stage warms up
+    model = YOLO(weights)
+    model.train(**args)
+    return str(model.trainer.save_dir)
+
+
+def run_experiment(profile_path=DEFAULT_PROFILE, overrides=None, name=None, fraction=SUBSET_FRACTION,
+                   schedule=SCHEDULE, full=False, seed=0):
+    from train_runner import prepare
+
+    profile, hw, train_args, tuning = prepare(profile_path)
+    overrides = overrides or {}
+    train_args = dict(train_args, **overrides)
+    full_epochs = int(train_args.pop('epochs', 80))
+    for key in ('project', 'name', 'exist_ok', 'imgsz', 'data'):
+        train_args.pop(key, None)
+    name = name or datetime.now().strftime('%Y%m%d_%H%M%S')
+    out_dir = os.path.join(FAST_DIR, name)
+
+    names, train_dir, val = resolve_splits(profile['data'])
+    subset, coverage, n_full = stratified_subset(train_dir, fraction, seed)
+    subset_yaml = write_subset_yaml(out_dir, names, val, subset)
+
+    print("\n" + "=" * 60)
+    print(f"⚡ FAST ITERATION '{name}'")
+    print("=" * 60)
+    print(f"Subset: {len(subset)}/{n_full} images ({fraction:.0%}), {coverage:.0%} of classes present")
+    print("Stages: " + " → ".join(f"{s}px x{e} ({'subset' if sub else 'full'})" for s, e, sub in schedule))
+    if overrides:
+        print(f"Overrides: {overrides}")
+
+    weights = profile['model']
+    stages = []
+    start = time.time()
+    for i, (imgsz, epochs, on_subset) in enumerate(schedule):
+        print(f"\n▶ Stage {i + 1}/{len(schedule)}: {imgsz}px, {epochs} epoch(s), "
+              f"{'subset' if on_subset else 'full data'}")
+        run_dir = train_stage(weights, subset_yaml if on_subset else profile['data'], train_args, imgsz,
+                              epochs, out_dir, f"stage{i + 1}_{imgsz}", first=i == 0)
+        weights = os.path.join(run_dir, 'weights', 'last.pt')
+        stages.append({'imgsz': imgsz, 'epochs': epochs, 'images': len(subset) if on_subset else n_full,
+                       'run_dir': run_dir})
+    fast_seconds = time.time() - start
+    fast_final, fast_best = read_metric(stages[-1]['run_dir'])
+
+    record = {
+        'name': name, 'profile': profile_path, 'overrides': overrides, 'created': datetime.now().isoformat(timespec='seconds'),
+        'subset_fraction': fraction, 'class_coverage': coverage, 'stages': stages,
+        'fast_map50': fast_final, 'fast_seconds': fast_seconds,
+        'relative_cost': relative_cost([(s['imgsz'], s['epochs'], s['images']) for s in stages], n_full)
+                         / full_epochs,
+        'full_epochs': full_epochs, 'full_map50': None, 'full_seconds': None, 'full_run': None,
+    }
+
+    if full:
+        print(f"\n▶ Full run for calibration: 640px, {full_epochs} epochs, full data")
+        start = time.time()
+        run_dir = train_stage(profile['model'], profile['data'], train_args, 640, full_epochs,
+                              out_dir, 'full', first=True)
+        record.update(full_seconds=time.time() - start, full_run=run_dir, full_map50=read_metric(run_dir)[0])
+
+    save_record(record)
+    print(f"\n⚡ Fast-mode mAP50: {fast_final:.3f} in {fast_seconds / 60:.1f} min "
+          f"(~{record['relative_cost']:.0%} of a full run's image-epochs)")
+    if record['full_map50'] is not None:
+        print(f"🎯 Full-run mAP50: {record['full_map50']:.3f} in {record['full_seconds'] / 60:.1f} min")
+    print("👉 python fast_iterate.py report")
+    return record
+
+
+# ============================================================
+# RESULTS
+# ============================================================
+
+def load_records():
+    if not os.path.exists(RESULTS_FILE):
+        return []
+    with open(RESULTS_FILE) as f:
+        return json.load(f)
+
+
+def save_record(record):
+    records = [r for r in load_records() if r['name'] != record['name']] + [record]
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, 'w') as f:
+        json.dump(records, f, indent=2)
+
+
+def attach_full_run(name, run_dir):
+    """Record an existing full run (e.g. train_augmented.py output) as the calibration partner"""
+    records = {r['name']: r for r in load_records()}
+    if name not in records:
+        raise KeyError(f"No fast experiment named '{name}'")
+    final, _ = read_metric(run_dir)
+    if final is None:
+        raise FileNotFoundError(f"No {METRIC} in {run_dir}/results.csv")
+    record = dict(records[name], full_run=run_dir, full_map50=final)
+    save_record(record)
+    return record
+
+
+def rank_correlation(xs, ys):
+    """Spearman's rho (average ranks for ties)"""
+    def ranks(values):
+        order = sorted(range(len(values)), key=lambda i: values[i])
+        r = [0.0] * len(values)
+        i = 0
+        while i < len(order):
+            j = i
+            while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+                j += 1
+            for k in range(i, j + 1):
+                r[order[k]] = (i + j) / 2
+            i = j + 1
+        return r
+
+    rx, ry = ranks(xs), ranks(ys)
+    n = len(xs)
+    mx, my = sum(rx) / n, sum(ry) / n
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    var = (sum((a - mx) ** 2 for a in rx) * sum((b - my) ** 2 for b in ry)) ** 0.5
+    return cov / var if var else float('nan')
+
+
+def report():
+    records = load_records()
+    print("=" * 60)
+    print("⚡ FAST-ITERATION EXPERIMENTS")
+    print("=" * 60)
+    if not records:
+        print("No experiments yet - python fast_iterate.py run")
+        return
+    ranked = sorted(records, key=lambda r: -(r['fast_map50'] or 0))
+    print(f"   {'name':18s} {'fast':>6s} {'full':>6s} {'cost':>6s}  overrides")
+    for r in ranked:
+        full = f"{r['full_map50']:.3f}" if r['full_map50'] is not None else '   -  '
+        print(f"   {r['name']:18s} {r['fast_map50'] or 0:6.3f} {full:>6s} {r['relative_cost']:6.0%}  "
+              f"{json.dumps(r['overrides']) if r['overrides'] else '(profile defaults)'}")
+
+    pairs = [r for r in records if r['full_map50'] is not None and r['fast_map50'] is not None]
+    print(f"\nCalibration pairs (fast + full run of the same config): {len(pairs)}")
+    if not pairs:
+        print("   Run one config with --full, or attach a full run: python fast_iterate.py attach <name> <run_dir>")
+        return
+    gaps = [r['full_map50'] - r['fast_map50'] for r in pairs]
+    print(f"   Mean full - fast mAP50 gap: {sum(gaps) / len(gaps):+.3f} "
+          f"(max |gap| {max(abs(g) for g in gaps):.3f})")
+    timed = [r for r in pairs if r.get('full_seconds')]
+    if timed:
+        speedup = sum(r['full_seconds'] for r in timed) / sum(r['fast_seconds'] for r in timed)
+        print(f"   Wall-clock speed-up: {speedup:.1f}x")
+    if len(pairs) >= 3:
+        rho = rank_correlation([r['fast_map50'] for r in pairs], [r['full_map50'] for r in pairs])
+        best_fast = max(pairs, key=lambda r: r['fast_map50'])['name']
+        best_full = max(pairs, key=lambda r: r['full_map50'])['name']
+        print(f"   Rank correlation (Spearman): {rho:.2f} - "
+              f"{'fast mode ranks configs reliably' if rho >= 0.8 else 'treat fast-mode rankings with care'}")
+        print(f"   Best by fast mode: {best_fast} | best by full run: {best_full}")
+    else:
+        print("   Rank correlation needs at least 3 pairs")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Progressive-resolution, subset-based fast training")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='Run one fast experiment')
+    p.add_argument('--profile', type=str, default=DEFAULT_PROFILE, help=f'Base recipe (default: {DEFAULT_PROFILE})')
+    p.add_argument('--set', action='append', metavar='KEY=VALUE', help='Override a training argument')
+    p.add_argument('--name', type=str, default=None)
+    p.add_argument('--fraction', type=float, default=SUBSET_FRACTION, help='Subset share for the early stages')
+    p.add_argument('--schedule', type=str, default=None,
+                   help="imgsz:epochs stages, e.g. '320:4,480:3,640:3' (last stage uses all data)")
+    p.add_argument('--full', action='store_true', help='Also run the full recipe to calibrate fast mode')
+    p.add_argument('--seed', type=int, default=0, help='Subset selection seed')
+
+    sub.add_parser('report', help='Experiments and fast-vs-full agreement')
+
+    p = sub.add_parser('attach', help='Attach an existing full run to a fast experiment')
+    p.add_argument('name')
+    p.add_argument('run_dir')
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        report()
+    elif args.command == 'attach':
+        record = attach_full_run(args.name, args.run_dir)
+        print(f"✅ {args.name}: fast {record['fast_map50']:.3f} vs full {record['full_map50']:.3f}")
+    else:
+        if not os.path.exists(args.profile):
+            print(f"❌ Profile not found: {args.profile}")
+            sys.exit(1)
+        schedule = parse_schedule(args.schedule) if args.schedule else SCHEDULE
+        run_experiment(args.profile, parse_overrides(args.set), args.name, args.fraction, schedule,
+                       full=args.full, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,20 @@
-from ultralytics import YOLO
-import pandas as pd
 import glob
 import os
 import sys
-import yaml
+import time
+import pipeline_metrics as metrics
+from optimize_thresholds import load_thresholds, prediction_floor, accept_detection
+from model_registry import resolve_weights, cached_class_names
+from submission_writer import SubmissionWriter, run_key, raw_detections
 
 # 1. Auto-detect the latest trained model
 def find_latest_model():
-    """Find the most recently trained model"""
-    # Check both possible training output directories
+    """Resolve the 'production' model from the registry, else the newest best.pt"""
+    registered = resolve_weights('production')
+    if registered:
+        return registered
+    
+    # Not registered yet - check both possible training output directories
     search_paths = [
         'runs/detect/RetailEye_Runs/*/weights/best.pt',
         'RetailEye_Runs/*/weights/best.pt'
@@ -24,14 +30,14 @@ def find_latest_model():
         return latest_model
     return None
 
-def validate_model(model, data_yaml_path='data/vista.yaml'):
-    """Validate model before inference"""
+def validate_model(model_classes, data_yaml_path='data/vista.yaml'):
+    """Validate model class names (model.names or registry metadata) before inference"""
+    import yaml
+    
     print("\n" + "="*60)
     print("🔍 MODEL VALIDATION")
     print("="*60)
     
-    # Get model classes
-    model_classes = model.names
     print(f"Model has {len(model_classes)} classes")
     
     # Load expected classes from data.yaml
@@ -72,111 +78,154 @@ def validate_model(model, data_yaml_path='data/vista.yaml'):
     print("="*60 + "\n")
     return True
 
-model_path = find_latest_model()
+# 2. Settings
+TEST_DIR = 'data/images/test/*.jpg'
+OUTPUT_CSV = 'submissions/submission_v1.csv'
+CONF_THRES = 0.50  # STRICT! Only count if 50% sure.
+IOU_THRES = 0.5    # NMS: Remove duplicate boxes for the same item.
+WRITE_PARQUET = False  # Also write a .parquet sidecar (raw boxes, scores, latency; needs pyarrow)
 
-if model_path and os.path.exists(model_path):
-    print(f"✅ Loading trained model from {model_path}")
-    model = YOLO(model_path)
-    
-    # Validate the model
-    if not validate_model(model):
-        print("\n❌ ERROR: Model validation failed!")
-        print("The loaded model doesn't match your training data.")
-        print("Please check:")
-        print("  1. Training completed successfully (check mAP > 0)")
-        print("  2. Model path is correct")
-        print("  3. data/vista.yaml classes match training")
-        response = input("\nContinue anyway? Results will be WRONG! (yes/no): ")
-        if response.lower() != 'yes':
-            sys.exit(1)
-else:
+def load_trained_model(interactive=True):
+    """Find, validate and load the model (asks before falling back when interactive)"""
+    from ultralytics import YOLO
+    
+    model_path = find_latest_model()
+    
+    if model_path and os.path.exists(model_path):
+        # Registered models carry their class names - no need to load weights to check them
+        model_classes = cached_class_names(model_path)
+        model = None
+        if model_classes is None:
+            print(f"✅ Loading trained model from {model_path}")
+            model = YOLO(model_path)
+            model_classes = model.names
+        
+        # Validate the model
+        if not validate_model(model_classes):
+            print("\n❌ ERROR: Model validation failed!")
+            print("The loaded model doesn't match your training data.")
+            print("Please check:")
+            print("  1. Training completed successfully (check mAP > 0)")
+            print("  2. Model path is correct")
+            print("  3. data/vista.yaml classes match training")
+            if not interactive:
+                return None
+            response = input("\nContinue anyway? Results will be WRONG! (yes/no): ")
+            if response.lower() != 'yes':
+                sys.exit(1)
+        
+        if model is None:
+            print(f"✅ Loading trained model from {model_path}")
+            model = YOLO(model_path)
+        return model
+    
     print("\n❌ ERROR: No trained model found!")
     print("\nSearched for:")
+    print("  - 'production' alias in the model registry (python model_registry.py list)")
     print("  - runs/detect/RetailEye_Runs/*/weights/best.pt")
     print("  - RetailEye_Runs/*/weights/best.pt")
     print("\nYou must train a model first: python train_model.py")
+    if not interactive:
+        return None
     print("\nUsing pre-trained YOLOv8s would give WRONG results (COCO classes, not your classes)")
     response = input("\nUse pre-trained model anyway for demo? (yes/no): ")
     if response.lower() != 'yes':
         sys.exit(1)
     print("⚠️  Loading pre-trained YOLOv8s (results will be incorrect!)...")
-    model = YOLO('yolov8s.pt')
-
-# 2. Settings
-TEST_DIR = 'data/images/test/*.jpg'
-CONF_THRES = 0.50  # STRICT! Only count if 50% sure.
-IOU_THRES = 0.5    # NMS: Remove duplicate boxes for the same item.
-
-submission_rows = []
-
-print("🔍 Running Inference on Test Data...")
-images = glob.glob(TEST_DIR)
-
-if len(images) == 0:
-    print(f"❌ ERROR: No test images found in {TEST_DIR}")
-    sys.exit(1)
-
-print(f"Found {len(images)} test images\n")
-
-detection_stats = {'total': 0, 'empty': 0, 'with_objects': 0}
-class_counts = {}
+    return YOLO('yolov8s.pt')
 
-for img_file in images:
-    # Predict
-    results = model.predict(
-        img_file, 
-        conf=CONF_THRES, 
-        iou=IOU_THRES, 
-        verbose=False
-    )
-    
-    result = results[0]
-    
-    # Extract Class Names
-    detected = []
-    for box in result.boxes:
-        cls_id = int(box.cls[0])
-        cls_name = result.names[cls_id]
-        detected.append(cls_name)
-        class_counts[cls_name] = class_counts.get(cls_name, 0) + 1
-    
-    # Format: "item1 item2 item3"
-    prediction_str = " ".join(detected)
-    
-    # Statistics
-    detection_stats['total'] += len(detected)
-    if len(detected) == 0:
-        detection_stats['empty'] += 1
+def run_inference(model, output_csv=OUTPUT_CSV, parquet=WRITE_PARQUET):
+    """Predict every test image, stream the submission CSV and print statistics"""
+    # Tuned values from optimize_thresholds.py override the defaults above
+    thresholds = load_thresholds(default_conf=CONF_THRES, default_iou=IOU_THRES)
+    print(f"🎛️  Thresholds: conf={thresholds['conf']:.2f}, iou={thresholds['iou']:.2f}, "
+          f"{len(thresholds['class_conf'])} per-class overrides")
+    
+    print("🔍 Running Inference on Test Data...")
+    # Sorted, so an interrupted run's rows are a prefix of the list and can be resumed
+    images = sorted(glob.glob(TEST_DIR))
+    
+    if len(images) == 0:
+        print(f"❌ ERROR: No test images found in {TEST_DIR}")
+        return None
+    
+    print(f"Found {len(images)} test images\n")
+    
+    detection_stats = {'total': 0, 'empty': 0, 'with_objects': 0}
+    class_counts = {}
+    metrics.enable_from_env()
+    out = SubmissionWriter(output_csv, run_key(getattr(model, 'ckpt_path', None), thresholds), parquet=parquet)
+    start = out.resume_from([os.path.basename(p) for p in images])
+    
+    with out:
+        for i in range(start, len(images)):
+            img_file = images[i]
+            metrics.gauge('queue_depth', len(images) - i, lane='inference')
+            started = time.perf_counter()
+            # Predict
+            results = model.predict(
+                metrics.decode(img_file, lane='inference'), 
+                conf=prediction_floor(thresholds), 
+                iou=thresholds['iou'], 
+                verbose=False
+            )
+        
+            result = results[0]
+            metrics.observe_speed(result, lane='inference')
+        
+            # Extract Class Names
+            detected = []
+            for box in result.boxes:
+                cls_id = int(box.cls[0])
+                cls_name = result.names[cls_id]
+                if not accept_detection(cls_name, float(box.conf[0]), thresholds):
+                    continue
+                detected.append(cls_name)
+                class_counts[cls_name] = class_counts.get(cls_name, 0) + 1
+        
+            # Format: "item1 item2 item3"
+            prediction_str = " ".join(detected)
+        
+            # Statistics
+            detection_stats['total'] += len(detected)
+            if len(detected) == 0:
+                detection_stats['empty'] += 1
+            else:
+                detection_stats['with_objects'] += 1
+        
+            # Stream the row (flushed every FLUSH_EVERY images)
+            img_id = os.path.basename(img_file)
+            with metrics.timer('csv_write', lane='inference'):
+                out.write(img_id, prediction_str, raw_detections(result) if out.parquet else None,
+                          latency_ms=(time.perf_counter() - started) * 1e3)
+            metrics.inc('images', lane='inference')
+            metrics.inc('detections', len(detected), lane='inference')
+    metrics.gauge('queue_depth', 0, lane='inference')
+    
+    print("\n" + "="*60)
+    print("✅ INFERENCE COMPLETE!")
+    print("="*60)
+    print(f"Processed: {len(images) - start} images" + (f" ({start} resumed from the partial CSV)" if start else ""))
+    print(f"Total detections: {detection_stats['total']}")
+    print(f"Images with objects: {detection_stats['with_objects']}")
+    print(f"Images with no objects: {detection_stats['empty']}")
+    
+    if class_counts:
+        print("\nDetected classes:")
+        for cls_name, count in sorted(class_counts.items(), key=lambda x: x[1], reverse=True):
+            print(f"  {cls_name}: {count}")
     else:
-        detection_stats['with_objects'] += 1
+        print("\n⚠️  WARNING: NO objects detected in ANY image!")
+        print("   This suggests:")
+        print("   - Model was not trained properly (mAP = 0)")
+        print("   - Confidence threshold too high")
+        print("   - Test images very different from training images")
     
-    # Add to list
-    img_id = os.path.basename(img_file)
-    submission_rows.append({'ImageID': img_id, 'Label': prediction_str})
-
-# 3. Save CSV
-os.makedirs('submissions', exist_ok=True)
-df = pd.DataFrame(submission_rows)
-df.to_csv('submissions/submission_v1.csv', index=False)
-
-print("\n" + "="*60)
-print("✅ INFERENCE COMPLETE!")
-print("="*60)
-print(f"Processed: {len(df)} images")
-print(f"Total detections: {detection_stats['total']}")
-print(f"Images with objects: {detection_stats['with_objects']}")
-print(f"Images with no objects: {detection_stats['empty']}")
-
-if class_counts:
-    print("\nDetected classes:")
-    for cls_name, count in sorted(class_counts.items(), key=lambda x: x[1], reverse=True):
-        print(f"  {cls_name}: {count}")
-else:
-    print("\n⚠️  WARNING: NO objects detected in ANY image!")
-    print("   This suggests:")
-    print("   - Model was not trained properly (mAP = 0)")
-    print("   - Confidence threshold too high")
-    print("   - Test images very different from training images")
+    print(f"\n📁 Submission saved to: {output_csv}")
+    print("="*60)
+    
+    return dict(detection_stats, images=len(images), resumed=start, output_csv=output_csv)
 
-print(f"\n📁 Submission saved to: submissions/submission_v1.csv")
-print("="*60)
+if __name__ == '__main__':
+    if run_inference(load_trained_model()) is None:
+        sys.exit(1)
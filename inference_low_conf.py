@@ -4,12 +4,13 @@ Inference with LOW confidence threshold to see what the model detects
 from ultralytics import YOLO
 import glob
 import os
+from model_registry import resolve_weights
 
 print("\n" + "="*70)
 print("🔍 INFERENCE WITH LOW CONFIDENCE THRESHOLD")
 print("="*70)
 
-model_path = 'runs/detect/RetailEye_Runs/augmented_v1/weights/best.pt'
+model_path = resolve_weights('production', default='runs/detect/RetailEye_Runs/augmented_v1/weights/best.pt')
 
 if not os.path.exists(model_path):
     print(f"❌ Model not found: {model_path}")
@@ -0,0 +1,269 @@
+"""
+Label Store - All YOLO labels of a split compacted into flat NumPy columns
+Class histograms, box sizes, empty images and per-class image sets come from
+array ops instead of re-reading TXT lines (the TXT files stay the exchange format)
+"""
+
+import os
+
+import numpy as np
+
+from dataset_index import DatasetIndex, SPLITS
+
+# --- CONFIGURATION ---
+BASE_PATH = 'data'
+STORE_VERSION = 1
+
+# Box-area bins (fraction of the image) for size_distribution()
+AREA_BINS = [0.0, 0.001, 0.01, 0.05, 0.15, 0.4, 1.0]
+
+
+def default_store_path(labels_dir):
+    """data/labels/val -> data/labels/.val_store.npz"""
+    labels_dir = os.path.normpath(labels_dir)
+    return os.path.join(os.path.dirname(labels_dir), f".{os.path.basename(labels_dir)}_store.npz")
+
+
+def parse_label_rows(path):
+    """(cls int16 array, xywh float32 (n x 4) array) for one YOLO label file"""
+    cls, xywh = [], []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            cls.append(int(parts[0]))
+            xywh.append([float(v) for v in parts[1:]])
+    return (np.array(cls, dtype=np.int16),
+            np.array(xywh, dtype=np.float32).reshape(-1, 4))
+
+
+class LabelStore:
+    """
+    Columnar view of one images/labels split.
+    Image i owns boxes offsets[i]:offsets[i+1] of the cls / xywh columns.
+    """
+
+    def __init__(self, stems, image_files, offsets, cls, xywh, label_size, label_mtime):
+        self.stems = stems                # (n_images,) str - file stem
+        self.image_files = image_files    # (n_images,) str - image file name ('' if missing)
+        self.offsets = offsets            # (n_images + 1,) int64
+        self.cls = cls                    # (n_boxes,) int16
+        self.xywh = xywh                  # (n_boxes, 4) float32, normalized
+        self.label_size = label_size      # (n_images,) int64, -1 = no label file
+        self.label_mtime = label_mtime    # (n_images,) int64 ns
+        self._row = None
+        self.reparsed = 0
+
+    # --- Construction -----------------------------------------------------
+
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype=str), np.array([], dtype=str), np.zeros(1, dtype=np.int64),
+                   np.zeros(0, dtype=np.int16), np.zeros((0, 4), dtype=np.float32),
+                   np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved store (None if missing, corrupt or an old version)"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != STORE_VERSION:
+                    return None
+                return cls(data['stems'], data['image_files'], data['offsets'], data['cls'],
+                           data['xywh'], data['label_size'], data['label_mtime'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path):
+        """Write the store atomically"""
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, version=STORE_VERSION, stems=self.stems, image_files=self.image_files,
+                 offsets=self.offsets, cls=self.cls, xywh=self.xywh,
+                 label_size=self.label_size, label_mtime=self.label_mtime)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def build(cls, images_dir, labels_dir, store_path=None, index=None, save=True):
+        """
+        Build (or incrementally refresh) the store for one split.
+        Only label files whose size/mtime changed since the saved store are re-parsed.
+        """
+        store_path = store_path or default_store_path(labels_dir)
+        index = index or DatasetIndex()
+        images = index.images(images_dir)
+        labels = index.labels(labels_dir)
+
+        old = cls.load(store_path) or cls.empty()
+        old_rows = old.row_lookup()
+
+        image_by_stem = {os.path.splitext(name)[0]: name for name in images}
+        stems = sorted(set(image_by_stem) | {name[:-4] for name in labels})
+
+        cls_parts, xywh_parts = [], []
+        counts = np.zeros(len(stems), dtype=np.int64)
+        label_size = np.full(len(stems), -1, dtype=np.int64)
+        label_mtime = np.zeros(len(stems), dtype=np.int64)
+        reparsed = 0
+
+        for i, stem in enumerate(stems):
+            record = labels.get(stem + '.txt')
+            if record is None:
+                continue
+            label_size[i], label_mtime[i] = record[0], record[1]
+            j = old_rows.get(stem)
+            if j is not None and old.label_size[j] == record[0] and old.label_mtime[j] == record[1]:
+                start, end = old.offsets[j], old.offsets[j + 1]
+                box_cls, box_xywh = old.cls[start:end], old.xywh[start:end]
+            else:
+                box_cls, box_xywh = parse_label_rows(os.path.join(labels_dir, stem + '.txt'))
+                reparsed += 1
+            cls_parts.append(box_cls)
+            xywh_parts.append(box_xywh)
+            counts[i] = len(box_cls)
+
+        offsets = np.zeros(len(stems) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        store = cls(np.array(stems, dtype=str),
+                    np.array([image_by_stem.get(stem, '') for stem in stems], dtype=str),
+                    offsets,
+                    np.concatenate(cls_parts) if cls_parts else np.zeros(0, dtype=np.int16),
+                    np.concatenate(xywh_parts) if xywh_parts else np.zeros((0, 4), dtype=np.float32),
+                    label_size, label_mtime)
+        store.reparsed = reparsed
+        changed = (reparsed or not np.array_equal(store.stems, old.stems)
+                   or not np.array_equal(label_size, old.label_size))
+        if save and changed:
+            try:
+                store.save(store_path)
+            except OSError:
+                pass  # Read-only data dir - still usable in memory
+        return store
+
+    # --- Queries ----------------------------------------------------------
+
+    @property
+    def n_images(self):
+        return len(self.stems)
+
+    @property
+    def n_boxes(self):
+        return len(self.cls)
+
+    def row_lookup(self):
+        """{stem: row}"""
+        if self._row is None:
+            self._row = {str(stem): i for i, stem in enumerate(self.stems)}
+        return self._row
+
+    def boxes_per_image(self):
+        return np.diff(self.offsets)
+
+    def box_image(self):
+        """Image row of every box"""
+        return np.repeat(np.arange(self.n_images), self.boxes_per_image())
+
+    def class_histogram(self, num_classes=None):
+        """Box count per class id"""
+        if num_classes is None:
+            num_classes = int(self.cls.max()) + 1 if self.n_boxes else 0
+        return np.bincount(self.cls[self.cls >= 0], minlength=num_classes)
+
+    def image_class_counts(self, num_classes=None):
+        """(n_images x num_classes) box counts per image and class"""
+        if num_classes is None:
+            num_classes = int(self.cls.max()) + 1 if self.n_boxes else 0
+        keep = (self.cls >= 0) & (self.cls < num_classes)
+        flat = self.box_image()[keep] * num_classes + self.cls[keep]
+        counts = np.bincount(flat, minlength=self.n_images * num_classes)
+        return counts.reshape(self.n_images, num_classes)
+
+    def empty_images(self):
+        """Stems of images with no boxes (empty or missing label file)"""
+        return self.stems[self.boxes_per_image() == 0]
+
+    def unlabeled_images(self):
+        """Stems of images with no label file at all"""
+        return self.stems[self.label_size < 0]
+
+    def images_with_class(self, class_id):
+        """Stems of images containing at least one box of class_id"""
+        return np.unique(self.stems[self.box_image()[self.cls == class_id]])
+
+    def class_image_sets(self):
+        """{class_id: array of stems containing that class}"""
+        box_image = self.box_image()
+        return {int(c): np.unique(self.stems[box_image[self.cls == c]]) for c in np.unique(self.cls)}
+
+    def box_sizes(self, class_id=None):
+        """(w, h) arrays, optionally for one class"""
+        xywh = self.xywh if class_id is None else self.xywh[self.cls == class_id]
+        return xywh[:, 2], xywh[:, 3]
+
+    def size_distribution(self, bins=AREA_BINS, class_id=None):
+        """Box count per normalized-area bin"""
+        w, h = self.box_sizes(class_id)
+        return np.histogram(w * h, bins=bins)[0]
+
+    def select(self, classes=None, min_area=None, max_area=None):
+        """Boolean box mask for a class set and/or normalized-area range"""
+        mask = np.ones(self.n_boxes, dtype=bool)
+        if classes is not None:
+            mask &= np.isin(self.cls, list(classes))
+        area = self.xywh[:, 2] * self.xywh[:, 3]
+        if min_area is not None:
+            mask &= area >= min_area
+        if max_area is not None:
+            mask &= area <= max_area
+        return mask
+
+
+def load_split(split, base_path=BASE_PATH, index=None):
+    """LabelStore for data/images/<split> + data/labels/<split>"""
+    return LabelStore.build(os.path.join(base_path, 'images', split),
+                            os.path.join(base_path, 'labels', split), index=index)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build / query the columnar label store")
+    parser.add_argument('--split', nargs='*', default=SPLITS, help='Splits to build (default: all)')
+    parser.add_argument('--class-id', type=int, default=None, help='List images containing this class')
+    parser.add_argument('--top', type=int, default=10, help='Classes to show in the histogram')
+    args = parser.parse_args()
+
+    index = DatasetIndex()
+    for split in args.split:
+        store = load_split(split, index=index)
+        print("\n" + "=" * 60)
+        print(f"🧮 LABEL STORE: {split.upper()}")
+        print("=" * 60)
+        print(f"Images: {store.n_images} | Boxes: {store.n_boxes} | Re-parsed: {store.reparsed}")
+        print(f"Empty images: {len(store.empty_images())} "
+              f"(no label file: {len(store.unlabeled_images())})")
+        if not store.n_boxes:
+            continue
+
+        hist = store.class_histogram()
+        print(f"\nTop {args.top} classes by boxes:")
+        for c in np.argsort(-hist)[:args.top]:
+            if hist[c]:
+                print(f"  class {c:3d}: {hist[c]}")
+
+        print("\nBox area distribution (fraction of image):")
+        for lo, hi, n in zip(AREA_BINS[:-1], AREA_BINS[1:], store.size_distribution()):
+            print(f"  {lo:5.3f}-{hi:5.3f}: {n}")
+
+        if args.class_id is not None:
+            stems = store.images_with_class(args.class_id)
+            print(f"\nImages with class {args.class_id}: {len(stems)}")
+            for stem in stems[:args.top]:
+                print(f"  {stem}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
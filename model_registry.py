@@ -0,0 +1,290 @@
+"""
+Model Registry - One JSON index of trained models, their metadata and aliases
+Scripts resolve weights by alias ("production", "teacher") instead of scanning runs/
+"""
+
+import os
+import sys
+import json
+import glob
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+# --- CONFIGURATION ---
+REGISTRY_FILE = 'runs/model_registry.json'
+
+# Only used by `import-runs` (one-off migration of existing training output)
+RUN_PATTERNS = [
+    'runs/detect/RetailEye_Runs/*/weights/best.pt',
+    'RetailEye_Runs/*/weights/best.pt',
+]
+
+# In-process cache: (path, mtime) -> parsed registry
+_cache = {'key': None, 'registry': None}
+
+
+def _empty_registry():
+    return {'models': {}, 'aliases': {}}
+
+
+def load_registry(path=REGISTRY_FILE):
+    """Load the registry (cached until the file changes on disk)"""
+    if not os.path.exists(path):
+        return _empty_registry()
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if _cache['key'] != key:
+        with open(path) as f:
+            registry = json.load(f)
+        registry.setdefault('models', {})
+        registry.setdefault('aliases', {})
+        # JSON turns int class ids into strings - restore them
+        for entry in registry['models'].values():
+            if entry.get('class_names'):
+                entry['class_names'] = {int(k): v for k, v in entry['class_names'].items()}
+        _cache['key'] = key
+        _cache['registry'] = registry
+    return _cache['registry']
+
+
+def save_registry(registry, path=REGISTRY_FILE):
+    """Write the registry atomically (temp file + rename)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+    _cache['key'] = None
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """SHA-256 of a weights file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_run_name(weights_path):
+    """runs/detect/RetailEye_Runs/<run>/weights/best.pt -> <run>"""
+    return Path(weights_path).parent.parent.name
+
+
+def register_model(weights_path, name=None, alias=None, class_names=None, metrics=None,
+                   path=REGISTRY_FILE):
+    """
+    Add (or refresh) a model entry.
+    Pass class_names when the model is already loaded; otherwise the weights are
+    loaded once here so later scripts never have to.
+    """
+    if not os.path.exists(weights_path):
+        raise FileNotFoundError(f"Weights not found: {weights_path}")
+
+    name = name or default_run_name(weights_path)
+    if class_names is None:
+        from ultralytics import YOLO
+        class_names = YOLO(weights_path).names
+
+    registry = load_registry(path)
+    stat = os.stat(weights_path)
+    entry = registry['models'].get(name, {})
+    entry.update({
+        'weights': weights_path,
+        'sha256': file_sha256(weights_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'class_names': {int(k): v for k, v in dict(class_names).items()},
+        'registered': datetime.now().isoformat(timespec='seconds'),
+    })
+    entry.setdefault('metrics', {})
+    entry.setdefault('exports', {})
+    entry.setdefault('benchmarks', {})
+    if metrics:
+        entry['metrics'].update(metrics)
+    registry['models'][name] = entry
+    if alias:
+        registry['aliases'][alias] = name
+    save_registry(registry, path)
+    return name
+
+
+def set_alias(alias, name, path=REGISTRY_FILE):
+    """Point an alias ("production", "teacher", ...) at a registered model"""
+    registry = load_registry(path)
+    if name not in registry['models']:
+        raise KeyError(f"Model '{name}' is not registered")
+    registry['aliases'][alias] = name
+    save_registry(registry, path)
+
+
+def resolve(ref, path=REGISTRY_FILE):
+    """Look up a model entry by alias or run name (None if unknown)"""
+    registry = load_registry(path)
+    name = registry['aliases'].get(ref, ref)
+    entry = registry['models'].get(name)
+    if entry is None:
+        return None
+    return dict(entry, name=name)
+
+
+def resolve_weights(ref, default=None, path=REGISTRY_FILE):
+    """Weights path for an alias/run name, or `default` if it isn't registered"""
+    entry = resolve(ref, path)
+    if entry is None:
+        return default
+    return entry['weights']
+
+
+def find_entry_by_weights(weights_path, path=REGISTRY_FILE):
+    """Registry entry whose weights file is `weights_path` (None if not registered)"""
+    target = os.path.normpath(weights_path)
+    for name, entry in load_registry(path)['models'].items():
+        if os.path.normpath(entry['weights']) == target:
+            return dict(entry, name=name)
+    return None
+
+
+def cached_class_names(weights_path, path=REGISTRY_FILE):
+    """
+    Class names recorded at registration time, without loading the weights.
+    Returns None if the model isn't registered or the file changed since.
+    """
+    entry = find_entry_by_weights(weights_path, path)
+    if entry is None or not os.path.exists(weights_path):
+        return None
+    stat = os.stat(weights_path)
+    if stat.st_size != entry['size'] or stat.st_mtime != entry['mtime']:
+        print(f"⚠️  Registry entry '{entry['name']}' is stale (weights changed) - re-register it")
+        return None
+    return entry['class_names']
+
+
+def _update_entry(name, section, key, value, path=REGISTRY_FILE):
+    registry = load_registry(path)
+    if name not in registry['models']:
+        return False
+    if key is None:
+        registry['models'][name].setdefault(section, {}).update(value)
+    else:
+        registry['models'][name].setdefault(section, {})[key] = value
+    save_registry(registry, path)
+    return True
+
+
+def record_metrics(name, metrics, path=REGISTRY_FILE):
+    """Store val metrics (dict) for a registered model"""
+    return _update_entry(name, 'metrics', None, metrics, path)
+
+
+def record_export(name, kind, export_path, path=REGISTRY_FILE):
+    """Store an export artifact (e.g. kind='onnx' or 'int8') for a registered model"""
+    return _update_entry(name, 'exports', kind, export_path, path)
+
+
+def record_benchmark(name, key, result, path=REGISTRY_FILE):
+    """Store a latency/throughput benchmark result for a registered model"""
+    return _update_entry(name, 'benchmarks', key, result, path)
+
+
+def box_metrics(metrics):
+    """Flatten ultralytics val metrics into a JSON-friendly dict"""
+    return {
+        'precision': float(metrics.box.mp),
+        'recall': float(metrics.box.mr),
+        'map50': float(metrics.box.map50),
+        'map50_95': float(metrics.box.map),
+    }
+
+
+def list_models(path=REGISTRY_FILE):
+    """Print every registered model"""
+    registry = load_registry(path)
+    aliases_by_name = {}
+    for alias, name in registry['aliases'].items():
+        aliases_by_name.setdefault(name, []).append(alias)
+
+    print("\n" + "=" * 60)
+    print("📚 MODEL REGISTRY")
+    print("=" * 60)
+    if not registry['models']:
+        print("No models registered yet.")
+        print("  Run: python model_registry.py import-runs")
+    for name, entry in registry['models'].items():
+        tags = f"  [{', '.join(aliases_by_name[name])}]" if name in aliases_by_name else ''
+        map50 = entry.get('metrics', {}).get('map50')
+        map_str = f"mAP@50 {map50:.3f}" if map50 is not None else "no metrics"
+        print(f"\n{name}{tags}")
+        print(f"   {entry['weights']}")
+        print(f"   {len(entry.get('class_names', {}))} classes | {map_str} | sha256 {entry['sha256'][:12]}")
+        if entry.get('exports'):
+            print(f"   Exports: {', '.join(entry['exports'])}")
+    print("=" * 60)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the RetailEye model registry")
+    sub = parser.add_subparsers(dest='command')
+
+    p_reg = sub.add_parser('register', help='Register a weights file')
+    p_reg.add_argument('weights', type=str)
+    p_reg.add_argument('--name', type=str, default=None, help='Run name (default: run folder name)')
+    p_reg.add_argument('--alias', type=str, default=None, help='Also point this alias at it')
+    p_reg.add_argument('--val', action='store_true', help='Run validation and record metrics')
+
+    p_alias = sub.add_parser('alias', help='Point an alias at a registered model')
+    p_alias.add_argument('alias', type=str)
+    p_alias.add_argument('name', type=str)
+
+    p_show = sub.add_parser('show', help='Show one entry (alias or run name)')
+    p_show.add_argument('ref', type=str)
+
+    sub.add_parser('list', help='List registered models')
+    sub.add_parser('import-runs', help='Register every best.pt under runs/ (one-off)')
+
+    args = parser.parse_args()
+
+    if args.command == 'register':
+        metrics = None
+        class_names = None
+        if args.val:
+            from ultralytics import YOLO
+            model = YOLO(args.weights)
+            class_names = model.names
+            metrics = box_metrics(model.val(data='data/vista.yaml', workers=0))
+        name = register_model(args.weights, name=args.name, alias=args.alias,
+                              class_names=class_names, metrics=metrics)
+        print(f"✅ Registered '{name}'" + (f" as '{args.alias}'" if args.alias else ''))
+    elif args.command == 'alias':
+        try:
+            set_alias(args.alias, args.name)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            sys.exit(1)
+        print(f"✅ '{args.alias}' → {args.name}")
+    elif args.command == 'show':
+        entry = resolve(args.ref)
+        if entry is None:
+            print(f"❌ '{args.ref}' is not registered")
+            sys.exit(1)
+        print(json.dumps(entry, indent=2))
+    elif args.command == 'import-runs':
+        found = []
+        for pattern in RUN_PATTERNS:
+            found.extend(glob.glob(pattern))
+        print(f"🔍 Found {len(found)} trained model(s)")
+        for weights in sorted(found, key=os.path.getmtime):
+            name = register_model(weights)
+            print(f"   ✅ {name}: {weights}")
+        if found and 'production' not in load_registry()['aliases']:
+            latest = default_run_name(max(found, key=os.path.getmtime))
+            set_alias('production', latest)
+            print(f"🏷️  'production' → {latest} (newest run)")
+    else:
+        list_models()
+
+
+if __name__ == '__main__':
+    main()
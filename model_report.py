@@ -0,0 +1,149 @@
+"""
+Model Report - Size, CPU latency and accuracy of detector weights, side by side
+Shared by the edge-model tools (distill.py, ...): params/GFLOPs, per-image CPU latency
+on real val images, val mAP, and ONNX export.
+
+    python model_report.py production runs/distill/nano/weights/best.pt
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+
+# --- CONFIGURATION ---
+DATA_YAML = 'data/vista.yaml'
+VAL_IMAGES = 'data/images/val'
+LATENCY_IMAGES = 50      # Val images timed per model
+WARMUP = 5
+
+
+def val_images(images_dir=VAL_IMAGES, limit=LATENCY_IMAGES):
+    paths = sorted(glob.glob(os.path.join(images_dir, '*.jpg')) + glob.glob(os.path.join(images_dir, '*.png')))
+    return paths[:limit] if limit else paths
+
+
+def model_stats(weights, imgsz=640):
+    """Parameter count and GFLOPs at imgsz (GFLOPs is None without thop)"""
+    from ultralytics import YOLO
+    from ultralytics.utils.torch_utils import get_flops
+
+    net = YOLO(weights).model
+    params = sum(p.numel() for p in net.parameters())
+    try:
+        gflops = get_flops(net, imgsz) or None
+    except Exception:
+        gflops = None
+    return {'params': params, 'gflops': gflops}
+
+
+def cpu_latency(weights, images, imgsz=640, warmup=WARMUP):
+    """Per-image predict() latency on CPU, in ms (works for .pt and exported .onnx)"""
+    import numpy as np
+    from ultralytics import YOLO
+
+    model = YOLO(weights, task='detect')
+    for path in images[:warmup]:
+        model.predict(path, imgsz=imgsz, device='cpu', verbose=False)
+    times = []
+    for path in images:
+        start = time.perf_counter()
+        model.predict(path, imgsz=imgsz, device='cpu', verbose=False)
+        times.append((time.perf_counter() - start) * 1e3)
+    times = np.array(times)
+    return {'mean_ms': float(times.mean()), 'p50_ms': float(np.percentile(times, 50)),
+            'p90_ms': float(np.percentile(times, 90)), 'images': len(times)}
+
+
+def val_accuracy(weights, data_yaml=DATA_YAML, imgsz=640):
+    from ultralytics import YOLO
+    from model_registry import box_metrics
+
+    metrics = YOLO(weights, task='detect').val(data=data_yaml, split='val', imgsz=imgsz, device='cpu',
+                                               workers=0, plots=False, verbose=False)
+    return box_metrics(metrics)
+
+
+def export_onnx(weights, imgsz=640):
+    """ONNX export next to the weights; returns the .onnx path"""
+    from ultralytics import YOLO
+
+    return str(YOLO(weights).export(format='onnx', imgsz=imgsz, dynamic=False, simplify=True))
+
+
+def measure(weights, data_yaml=DATA_YAML, images=None, imgsz=640, accuracy=True):
+    """Everything the comparison table needs for one model"""
+    images = images if images is not None else val_images()
+    row = {'weights': weights, 'size_mb': os.path.getsize(weights) / 1024**2}
+    if weights.endswith('.pt'):
+        row.update(model_stats(weights, imgsz))
+    row['latency'] = cpu_latency(weights, images, imgsz) if images else None
+    if accuracy:
+        row['accuracy'] = val_accuracy(weights, data_yaml, imgsz)
+    return row
+
+
+def print_comparison(rows, reference=None, title="MODEL COMPARISON"):
+    """rows: {label: measure() dict}; ratios are relative to `reference` (default: first row)"""
+    reference = reference or next(iter(rows))
+    ref = rows[reference]
+    print("\n" + "=" * 60)
+    print(f"📏 {title}")
+    print("=" * 60)
+    print(f"   {'model':16s} {'params':>8s} {'GFLOPs':>7s} {'MB':>6s} {'p50 ms':>7s} {'speed':>6s} "
+          f"{'mAP50':>6s} {'Δ mAP50':>8s}")
+    for label, r in rows.items():
+        params = f"{r['params'] / 1e6:7.2f}M" if r.get('params') else f"{'-':>8s}"
+        gflops = f"{r['gflops']:7.1f}" if r.get('gflops') else f"{'-':>7s}"
+        lat = r['latency']['p50_ms'] if r.get('latency') else None
+        ref_lat = ref['latency']['p50_ms'] if ref.get('latency') else None
+        speed = f"{ref_lat / lat:5.1f}x" if lat and ref_lat else f"{'-':>6s}"
+        acc = r.get('accuracy', {}).get('map50')
+        ref_acc = ref.get('accuracy', {}).get('map50')
+        delta = f"{acc - ref_acc:+8.3f}" if acc is not None and ref_acc is not None else f"{'-':>8s}"
+        print(f"   {label:16s} {params} {gflops} {r['size_mb']:6.1f} "
+              f"{lat if lat else 0:7.1f} {speed} {acc if acc is not None else 0:6.3f} {delta}")
+    print(f"   (latency: CPU, one image per predict() call, {ref['latency']['images'] if ref.get('latency') else 0} "
+          f"val images; speed and Δ relative to {reference})")
+
+
+def save_report(rows, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(rows, f, indent=2)
+    print(f"💾 Report saved to {path}")
+
+
+def main():
+    import argparse
+    from model_registry import resolve_weights
+
+    parser = argparse.ArgumentParser(description="Compare detector weights: size, CPU latency, val mAP")
+    parser.add_argument('models', nargs='+', help='Weights paths or registry names/aliases (first = reference)')
+    parser.add_argument('--data', type=str, default=DATA_YAML)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--images', type=int, default=LATENCY_IMAGES, help='Val images to time')
+    parser.add_argument('--no-accuracy', action='store_true', help='Skip val mAP')
+    parser.add_argument('--out', type=str, default='runs/model_report.json')
+    args = parser.parse_args()
+
+    images = val_images(limit=args.images)
+    if not images:
+        print(f"⚠️  No images in {VAL_IMAGES} - latency is skipped")
+    rows = {}
+    for ref in args.models:
+        weights = resolve_weights(ref, default=ref)
+        if not os.path.exists(weights):
+            print(f"❌ Not found: {ref}")
+            sys.exit(1)
+        print(f"⏱️  Measuring {weights}...")
+        label = os.path.basename(os.path.dirname(os.path.dirname(weights)))
+        label = ref if not label or label in rows else label
+        rows[label] = measure(weights, args.data, images, args.imgsz, accuracy=not args.no_accuracy)
+    print_comparison(rows)
+    save_report(rows, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+Warm Model Worker - Keep torch/ultralytics imported and models loaded between actions
+quick_start.py and the pipeline scripts send commands here instead of spawning
+a fresh Python process (and re-loading the weights) for every inference/evaluation
+"""
+
+import os
+import sys
+import time
+import io
+import json
+import secrets
+import importlib
+import subprocess
+import contextlib
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+# --- CONFIGURATION ---
+HOST = '127.0.0.1'
+PORT = 6510
+AUTHKEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runs', '.warm_worker_key')
+MAX_MODELS = 3   # Loaded models kept resident (least recently used is dropped)
+# `python model_server.py run <action>`: worker command -> script it replaces
+ACTION_SCRIPTS = {
+    'inference': 'inference.py',
+    'submission': '3_submit.py',
+    'evaluate': 'evaluate_model.py',
+    'pseudo_label': '4_auto_expand.py',
+}
+
+
+# ============================================================
+# CLIENT SIDE (no torch import - cheap to call from any script)
+# ============================================================
+
+def authkey():
+    """Random per-install key (runs/.warm_worker_key, owner-only), created on first use"""
+    try:
+        with open(AUTHKEY_FILE, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(AUTHKEY_FILE), exist_ok=True)
+    key = secrets.token_hex(32).encode()
+    try:
+        fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return authkey()    # Another process created it first
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def _send(conn, message):
+    # JSON, not pickle: nothing that arrives on the socket is ever executed
+    conn.send_bytes(json.dumps(message, default=str).encode())
+
+
+def _recv(conn):
+    return json.loads(conn.recv_bytes().decode())
+
+
+def send_command(command, **kwargs):
+    """Send one command to the worker and return its reply dict"""
+    with Client((HOST, PORT), authkey=authkey()) as conn:
+        _send(conn, {'command': command, 'args': kwargs})
+        return _recv(conn)
+
+
+def server_available():
+    """True if a warm worker is listening"""
+    try:
+        return send_command('ping').get('ok', False)
+    except (ConnectionRefusedError, OSError, EOFError):
+        return False
+
+
+def run_remote(command, **kwargs):
+    """
+    Run a command in the warm worker and echo its console output here.
+    Returns the reply, or None if no worker is running (caller falls back to a subprocess).
+    """
+    try:
+        reply = send_command(command, **kwargs)
+    except (ConnectionRefusedError, OSError, EOFError):
+        return None
+    if reply.get('log'):
+        print(reply['log'], end='')
+    if not reply.get('ok'):
+        print(f"\n❌ Warm worker error: {reply.get('error')}")
+    return reply
+
+
+# ============================================================
+# SERVER SIDE
+# ============================================================
+
+def _fresh_module(name):
+    """Import a pipeline script, re-executing it so config/registry changes are picked up"""
+    if name in sys.modules:
+        return importlib.reload(sys.modules[name])
+    return importlib.import_module(name)
+
+
+class WarmModelPool:
+    def __init__(self, max_models=MAX_MODELS):
+        # Import the heavy frameworks ONCE for the lifetime of the worker
+        start = time.time()
+        import torch
+        from ultralytics import YOLO
+        self.torch = torch
+        self.YOLO = YOLO
+        self.import_seconds = time.time() - start
+        self.max_models = max_models
+        self.models = {}    # weights path -> model (insertion order = LRU order)
+        self.handled = 0
+
+    def get_model(self, weights_path):
+        """Load a model on first use, then serve it from memory"""
+        if weights_path in self.models:
+            self.models[weights_path] = self.models.pop(weights_path)
+            return self.models[weights_path]
+        if not os.path.exists(weights_path):
+            raise FileNotFoundError(f"Model not found: {weights_path}")
+        print(f"📦 Loading {weights_path}")
+        model = self.YOLO(weights_path)
+        self.models[weights_path] = model
+        while len(self.models) > self.max_models:
+            dropped = next(iter(self.models))
+            del self.models[dropped]
+            print(f"♻️  Dropped {dropped} from pool")
+        return model
+
+    def resolve(self, ref, default):
+        """Alias/run name from the model registry, else a literal path, else the default"""
+        from model_registry import resolve_weights
+        if ref:
+            return resolve_weights(ref, default=ref)
+        return default
+
+    # --- Commands ---------------------------------------------------------
+
+    def cmd_ping(self):
+        return {'pid': os.getpid(), 'models': list(self.models), 'handled': self.handled,
+                'import_seconds': self.import_seconds}
+
+    def cmd_predict(self, images, model=None, conf=0.25, iou=0.5):
+        """Raw predictions for a list of image paths"""
+        from model_registry import resolve_weights
+        import pipeline_metrics as metrics
+        weights = self.resolve(model, resolve_weights('production'))
+        yolo = self.get_model(weights)
+        out = {}
+        for i, img_path in enumerate(images):
+            metrics.gauge('queue_depth', len(images) - i, lane='server')
+            result = yolo.predict(metrics.decode(img_path, lane='server'), conf=conf, iou=iou, verbose=False)[0]
+            metrics.observe_speed(result, lane='server')
+            metrics.inc('images', lane='server')
+            out[img_path] = [
+                (result.names[int(c)], float(s), [float(v) for v in xywhn])
+                for c, s, xywhn in zip(result.boxes.cls, result.boxes.conf, result.boxes.xywhn)
+            ]
+        metrics.gauge('queue_depth', 0, lane='server')
+        return {'predictions': out}
+
+    def cmd_inference(self):
+        """Same as `python inference.py`, without the interactive prompts"""
+        inference = _fresh_module('inference')
+        weights = inference.find_latest_model()
+        if not weights:
+            raise FileNotFoundError("No trained model found (register one as 'production')")
+        if not inference.validate_model(self.get_model(weights).names):
+            raise ValueError("Model classes don't match data/vista.yaml")
+        return {'summary': inference.run_inference(self.get_model(weights))}
+
+    def cmd_submission(self):
+        """Same as `python 3_submit.py`"""
+        submit = _fresh_module('3_submit')
+        return {'output_csv': submit.generate_submission(self.get_model(submit.MODEL_PATH))}
+
+    def cmd_evaluate(self, model=None, data_yaml='data/vista.yaml'):
+        """Same as `python evaluate_model.py` (optionally for a given alias/path)"""
+        evaluate = _fresh_module('evaluate_model')
+        weights = self.resolve(model, evaluate.find_latest_model())
+        if not weights:
+            raise FileNotFoundError("No trained model found")
+        return {'success': evaluate.evaluate_model(weights, data_yaml, model=self.get_model(weights))}
+
+    def cmd_pseudo_label(self):
+        """Same as `python 4_auto_expand.py` (teacher stays loaded)"""
+        expand = _fresh_module('4_auto_expand')
+        return {'summary': expand.auto_label(self.get_model(expand.MODEL_PATH))}
+
+    def handle(self, request):
+        """Run one command, capturing its console output for the client"""
+        import pipeline_metrics as metrics
+        command = request.get('command')
+        handler = getattr(self, f"cmd_{command}", None)
+        if handler is None:
+            return {'ok': False, 'error': f"Unknown command: {command}"}
+
+        log = io.StringIO()
+        start = time.time()
+        metrics.gauge('inflight', 1, lane='server')
+        try:
+            with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log), \
+                    metrics.timer(f"cmd_{command}", lane='server'):
+                reply = handler(**request.get('args', {}))
+            reply['ok'] = True
+        except Exception as e:
+            reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            metrics.inc('errors', lane='server')
+        metrics.gauge('inflight', 0, lane='server')
+        metrics.inc('requests', lane='server')
+        reply['log'] = log.getvalue()
+        reply['seconds'] = time.time() - start
+        self.handled += 1
+        print(f"   [{command}] {'✅' if reply['ok'] else '❌'} {reply['seconds']:.2f}s")
+        return reply
+
+
+def serve(preload=None):
+    """Run the worker in the foreground until `stop` is sent"""
+    print("=" * 60)
+    print("🔥 RETAILEYE WARM MODEL WORKER")
+    print("=" * 60)
+    pool = WarmModelPool()
+    print(f"✅ torch + ultralytics imported in {pool.import_seconds:.1f}s")
+    import pipeline_metrics
+    pipeline_metrics.enable_from_env()
+    for ref in preload or []:
+        pool.get_model(pool.resolve(ref, ref))
+
+    with Listener((HOST, PORT), authkey=authkey()) as listener:
+        print(f"👂 Listening on {HOST}:{PORT} (Ctrl+C or `python model_server.py stop` to quit)")
+        while True:
+            try:
+                with listener.accept() as conn:
+                    request = _recv(conn)
+                    if not isinstance(request, dict):
+                        raise ValueError("request is not a JSON object")
+                    if request.get('command') == 'stop':
+                        _send(conn, {'ok': True})
+                        break
+                    _send(conn, pool.handle(request))
+            except (EOFError, OSError, AuthenticationError, ValueError) as e:
+                # A client that disconnects mid-request must not take the worker down
+                print(f"   ⚠️  Dropped connection: {e}")
+    print("👋 Worker stopped")
+
+
+def benchmark(image, model=None, repeats=3):
+    """Compare a cold subprocess action against the same action in the warm worker"""
+    from model_registry import resolve_weights, resolve, record_benchmark
+
+    weights = resolve_weights(model or 'production', default=model)
+    if not weights or not os.path.exists(weights):
+        print("❌ No model to benchmark (pass --model or register a 'production' model)")
+        return None
+    if not server_available():
+        print("❌ Warm worker is not running. Start it first: python model_server.py start")
+        return None
+
+    print("=" * 60)
+    print("⏱️  MENU-ACTION LATENCY: COLD SUBPROCESS vs WARM WORKER")
+    print("=" * 60)
+    print(f"Model: {weights}")
+    print(f"Image: {image}")
+
+    # Cold: what os.system("python inference.py")-style actions pay every time
+    cold_code = ("from ultralytics import YOLO; "
+                 f"YOLO({weights!r}).predict({image!r}, verbose=False)")
+    cold = []
+    for _ in range(repeats):
+        start = time.time()
+        subprocess.run([sys.executable, '-c', cold_code], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cold.append(time.time() - start)
+
+    # Warm: first call may load the model into the pool, so warm it up once
+    send_command('predict', images=[image], model=weights)
+    warm = []
+    for _ in range(repeats):
+        start = time.time()
+        send_command('predict', images=[image], model=weights)
+        warm.append(time.time() - start)
+
+    cold_ms = 1000 * min(cold)
+    warm_ms = 1000 * min(warm)
+    print(f"\nCold (new process + import + load + predict): {cold_ms:8.1f} ms")
+    print(f"Warm (RPC round trip + predict):              {warm_ms:8.1f} ms")
+    print(f"Speedup: {cold_ms / max(warm_ms, 1e-6):.1f}x")
+    print("=" * 60)
+
+    result = {'cold_ms': cold_ms, 'warm_ms': warm_ms, 'repeats': repeats}
+    entry = resolve(model or 'production')
+    if entry:
+        record_benchmark(entry['name'], 'warm_pool_action', result)
+    return result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Warm model worker for RetailEye scripts")
+    sub = parser.add_subparsers(dest='command')
+
+    p_start = sub.add_parser('start', help='Run the worker in the foreground')
+    p_start.add_argument('--preload', nargs='*', default=['production'],
+                         help="Aliases/paths to load at startup (default: production)")
+    sub.add_parser('status', help='Show whether a worker is running')
+    sub.add_parser('stop', help='Stop a running worker')
+    p_run = sub.add_parser('run', help='Run a pipeline action in the worker (falls back to the script)')
+    p_run.add_argument('action', choices=sorted(ACTION_SCRIPTS))
+    p_bench = sub.add_parser('bench', help='Benchmark cold vs warm action latency')
+    p_bench.add_argument('--image', type=str, required=True, help='Image to predict')
+    p_bench.add_argument('--model', type=str, default=None, help='Alias or weights path')
+    p_bench.add_argument('--repeats', type=int, default=3)
+
+    args = parser.parse_args()
+
+    if args.command == 'start':
+        # Pipeline scripts use repo-relative paths
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        from model_registry import resolve_weights
+        preload = [ref for ref in args.preload if resolve_weights(ref) or os.path.exists(ref)]
+        serve(preload)
+    elif args.command == 'status':
+        try:
+            info = send_command('ping')
+        except (ConnectionRefusedError, OSError, EOFError):
+            print("⚪ No warm worker running")
+            sys.exit(1)
+        print(f"🟢 Worker pid {info['pid']}: {info['handled']} commands served")
+        for weights in info['models']:
+            print(f"   📦 {weights}")
+    elif args.command == 'stop':
+        try:
+            send_command('stop')
+            print("✅ Worker stopped")
+        except (ConnectionRefusedError, OSError, EOFError):
+            print("⚪ No warm worker running")
+    elif args.command == 'run':
+        reply = run_remote(args.action)
+        if reply is None:
+            print(f"⚪ No warm worker running - running {ACTION_SCRIPTS[args.action]} instead")
+            repo = os.path.dirname(os.path.abspath(__file__))
+            sys.exit(subprocess.run([sys.executable, ACTION_SCRIPTS[args.action]], cwd=repo).returncode)
+        if not reply.get('ok'):
+            sys.exit(1)
+    elif args.command == 'bench':
+        if benchmark(args.image, model=args.model, repeats=args.repeats) is None:
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
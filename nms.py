@@ -0,0 +1,288 @@
+"""
+NMS - Vectorized NumPy non-maximum suppression for raw detector outputs
+Greedy (class-aware or agnostic), Soft-NMS (linear / gaussian) and Matrix-NMS, for one
+image or a whole batch stored as flat arrays (scores are sorted once per image). Usable
+from any script that post-processes raw outputs: postprocess_raw() takes the YOLOv8 head
+tensor directly, batched_nms() takes cached detections (optimize_thresholds.py).
+
+    python nms.py --boxes 10000 30000     # speed + agreement vs ultralytics' NMS
+"""
+
+import time
+
+import numpy as np
+
+# --- CONFIGURATION ---
+METHODS = ('greedy', 'soft', 'matrix')
+MAX_DET = 300
+MAX_CANDIDATES = 30000      # Highest-scoring boxes considered per image (ultralytics: max_nms)
+SOFT_SIGMA = 0.5            # Gaussian Soft-NMS decay
+MATRIX_SIGMA = 2.0          # Gaussian Matrix-NMS decay
+MATRIX_TOP_K = 2000         # Matrix-NMS builds a top_k x top_k IoU matrix
+DECAYED_MIN = 0.001         # Soft/Matrix-NMS drop boxes whose decayed score falls below this
+TILE = 256                  # Greedy NMS compares this many candidates at a time
+
+
+def box_iou(a, b):
+    """Pairwise IoU (len(a), len(b)) of xyxy boxes"""
+    w = np.minimum(a[:, 2, None], b[None, :, 2]) - np.maximum(a[:, 0, None], b[None, :, 0])
+    h = np.minimum(a[:, 3, None], b[None, :, 3]) - np.maximum(a[:, 1, None], b[None, :, 1])
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None] - inter + 1e-9)
+
+
+def _overlaps(a, b, ca, cb, iou_thresh):
+    """Boolean (len(a), len(b)): IoU above the threshold, and same class unless agnostic"""
+    over = box_iou(a, b) > iou_thresh
+    if ca is not None:
+        over &= ca[:, None] == cb[None]
+    return over
+
+
+# ============================================================
+# METHODS (inputs already sorted by descending score)
+# ============================================================
+
+def _greedy_sorted(boxes, classes, iou_thresh, max_det, tile=TILE):
+    """
+    Exact greedy NMS in score order, a tile at a time: a tile is first checked against
+    every box kept so far (one IoU matrix), then resolved internally. Stops as soon as
+    max_det boxes are kept, so at low conf most candidates are never compared at all.
+    """
+    keep = []
+    kept_boxes, kept_cls = boxes[:0], None if classes is None else classes[:0]
+    for start in range(0, len(boxes), tile):
+        b = boxes[start:start + tile]
+        c = None if classes is None else classes[start:start + tile]
+        idx = np.arange(len(b))
+        if len(kept_boxes):
+            idx = np.flatnonzero(~_overlaps(kept_boxes, b, kept_cls, c, iou_thresh).any(0))
+            if not idx.size:
+                continue
+        cb = None if c is None else c[idx]
+        over = np.triu(_overlaps(b[idx], b[idx], cb, cb, iou_thresh), k=1)
+        take = np.ones(len(idx), dtype=bool)
+        for i in np.flatnonzero(over.any(1)):     # Only rows that can suppress something
+            if take[i]:
+                take &= ~over[i]
+        idx = idx[take][:max_det - len(kept_boxes)]
+        keep.append(idx + start)
+        kept_boxes = np.concatenate((kept_boxes, b[idx]))
+        if c is not None:
+            kept_cls = np.concatenate((kept_cls, c[idx]))
+        if len(kept_boxes) >= max_det:
+            break
+    return np.concatenate(keep) if keep else np.zeros(0, dtype=np.int64)
+
+
+def _soft_sorted(boxes, scores, classes, iou_thresh, sigma, kernel, max_det):
+    """Soft-NMS: decay overlapping scores instead of dropping them; returns (positions, scores)"""
+    scores = scores.astype(np.float32, copy=True)
+    alive = np.arange(len(scores))
+    keep, kept_scores = [], []
+    while alive.size and len(keep) < max_det:
+        top = int(np.argmax(scores[alive]))
+        i = alive[top]
+        keep.append(i)
+        kept_scores.append(scores[i])
+        alive = np.delete(alive, top)
+        if not alive.size:
+            break
+        iou = box_iou(boxes[i:i + 1], boxes[alive])[0]
+        if classes is not None:
+            iou *= classes[alive] == classes[i]
+        if kernel == 'linear':
+            scores[alive] *= np.where(iou > iou_thresh, 1.0 - iou, 1.0)
+        else:
+            scores[alive] *= np.exp(-(iou * iou) / sigma)
+        alive = alive[scores[alive] >= DECAYED_MIN]
+    return np.array(keep, dtype=np.int64), np.array(kept_scores, dtype=np.float32)
+
+
+def _matrix_decay(boxes, sigma, kernel):
+    """Matrix-NMS (SOLOv2) decay factors of score-sorted boxes, all computed in parallel"""
+    iou = np.triu(box_iou(boxes, boxes), k=1)          # iou[i, j]: i scores higher than j
+    compensate = iou.max(axis=0)                       # How suppressed each box itself is
+    if kernel == 'linear':
+        decay = ((1.0 - iou) / (1.0 - compensate[:, None] + 1e-9)).min(axis=0)
+    else:
+        decay = np.exp(-sigma * (iou ** 2 - compensate[:, None] ** 2)).min(axis=0)
+    return np.minimum(decay, 1.0)
+
+
+def _matrix_sorted(boxes, scores, classes, sigma, kernel, max_det, top_k=MATRIX_TOP_K):
+    n = min(len(scores), top_k)
+    boxes, scores = boxes[:n], scores[:n]
+    if classes is None:
+        decay = _matrix_decay(boxes, sigma, kernel)
+    else:
+        # Boxes of different classes never decay each other: one small matrix per class
+        decay = np.ones(n, dtype=np.float32)
+        order = np.argsort(classes[:n], kind='stable')
+        for group in np.split(order, np.flatnonzero(np.diff(classes[:n][order])) + 1):
+            if len(group) > 1:
+                decay[group] = _matrix_decay(boxes[group], sigma, kernel)
+    decayed = scores * decay
+    keep = np.flatnonzero(decayed >= DECAYED_MIN)
+    keep = keep[np.argsort(-decayed[keep], kind='stable')][:max_det]
+    return keep, decayed[keep].astype(np.float32)
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+def nms_sorted(boxes, scores, classes=None, method='greedy', iou=0.5, max_det=MAX_DET,
+               sigma=None, kernel='gaussian'):
+    """
+    Suppress one image's boxes, already sorted by descending score. classes=None means
+    class-agnostic. Returns (kept positions, their scores) with the best detection first.
+    """
+    max_det = max_det or len(scores)
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    if method == 'greedy':
+        keep = _greedy_sorted(boxes, classes, iou, max_det)
+        return keep, scores[keep].astype(np.float32)
+    if method == 'soft':
+        return _soft_sorted(boxes, scores, classes, iou, sigma or SOFT_SIGMA, kernel, max_det)
+    if method == 'matrix':
+        return _matrix_sorted(boxes, scores, classes, sigma or MATRIX_SIGMA, kernel, max_det)
+    raise ValueError(f"Unknown NMS method '{method}' (use one of {METHODS})")
+
+
+def nms(boxes, scores, classes=None, method='greedy', iou=0.5, max_det=MAX_DET, agnostic=False, **kwargs):
+    """One image, any order: returns (kept indices, their scores), best first"""
+    order = np.argsort(-scores, kind='stable')
+    keep, kept_scores = nms_sorted(boxes[order], scores[order], None if agnostic or classes is None
+                                   else classes[order], method, iou, max_det, **kwargs)
+    return order[keep], kept_scores
+
+
+def batched_nms(img_idx, boxes, scores, classes=None, method='greedy', iou=0.5, max_det=None,
+                agnostic=False, **kwargs):
+    """
+    Many images in flat arrays (img_idx says which image a box belongs to). One lexsort
+    orders everything by image, then score; each image is then suppressed in place.
+    Returns (kept global indices, their scores), grouped by image, best first.
+    """
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    order = np.lexsort((-scores, img_idx))
+    bounds = np.flatnonzero(np.diff(img_idx[order])) + 1
+    use_classes = classes is not None and not agnostic
+    keep, kept_scores = [], []
+    for chunk in np.split(order, bounds):
+        k, s = nms_sorted(boxes[chunk], scores[chunk], classes[chunk] if use_classes else None,
+                          method, iou, max_det, **kwargs)
+        keep.append(chunk[k])
+        kept_scores.append(s)
+    return np.concatenate(keep), np.concatenate(kept_scores)
+
+
+def postprocess_raw(pred, conf=0.25, iou=0.45, method='greedy', agnostic=False, max_det=MAX_DET,
+                    max_candidates=MAX_CANDIDATES, **kwargs):
+    """
+    Raw YOLOv8 head output (batch, 4 + nc, anchors), boxes as xywh in input pixels, to one
+    (n, 6) array per image: x1, y1, x2, y2, score, class. Single label per box, like predict().
+    """
+    pred = np.asarray(pred)
+    out = []
+    for p in pred:
+        scores = p[4:].max(0)
+        candidates = np.flatnonzero(scores > conf)
+        if len(candidates) > max_candidates:
+            top = np.argpartition(-scores[candidates], max_candidates)[:max_candidates]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]   # The one sort
+
+        xy, wh = p[:2, candidates].T, p[2:4, candidates].T / 2
+        boxes = np.concatenate((xy - wh, xy + wh), axis=1)
+        cls = p[4:, candidates].argmax(0)
+        keep, kept_scores = nms_sorted(boxes, scores[candidates], None if agnostic else cls,
+                                       method, iou, max_det, **kwargs)
+        det = np.empty((len(keep), 6), dtype=np.float32)
+        det[:, :4] = boxes[keep]
+        det[:, 4] = kept_scores
+        det[:, 5] = cls[keep]
+        out.append(det)
+    return out
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def synthetic_head(candidates, nc=120, imgsz=640, seed=0):
+    """Raw head output with `candidates` boxes above conf=0.01, clustered like dense shelf rows"""
+    rng = np.random.default_rng(seed)
+    anchors = max(candidates, 8400)
+    pred = np.zeros((1, 4 + nc, anchors), dtype=np.float32)
+    centers = rng.uniform(20, imgsz - 20, (max(candidates // 20, 1), 2))
+    which = rng.integers(0, len(centers), anchors)
+    pred[0, :2] = (centers[which] + rng.normal(0, 6, (anchors, 2))).T
+    pred[0, 2:4] = rng.uniform(20, 60, (2, anchors))
+    pred[0, 4:] = rng.uniform(0, 0.005, (nc, anchors))
+    live = rng.choice(anchors, candidates, replace=False)
+    pred[0, 4 + rng.integers(0, nc, candidates), live] = rng.uniform(0.011, 1.0, candidates)
+    return pred
+
+
+def _time(fn, repeats):
+    fn()
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3, result
+
+
+def benchmark(sizes, conf=0.01, iou=0.5, repeats=5):
+    print("=" * 60)
+    print(f"⏱️  NMS BENCHMARK (conf={conf}, iou={iou}, max_det={MAX_DET}, best of {repeats})")
+    print("=" * 60)
+    try:
+        import torch
+        from ultralytics.utils.ops import non_max_suppression
+    except ImportError:
+        torch = None
+        print("ℹ️  torch/ultralytics not installed - NumPy methods only")
+
+    for n in sizes:
+        pred = synthetic_head(n)
+        print(f"\n▶ {n:,} candidate boxes")
+        rows = []
+        if torch is not None:
+            tensor = torch.from_numpy(pred)
+            ms, ref = _time(lambda: non_max_suppression(tensor, conf, iou, max_det=MAX_DET), repeats)
+            ref = ref[0].numpy()
+            rows.append(('ultralytics (torchvision)', ms, len(ref)))
+        for label, method, agnostic in (('numpy greedy', 'greedy', False), ('numpy greedy agnostic', 'greedy', True),
+                                        ('numpy soft-nms', 'soft', False), ('numpy matrix-nms', 'matrix', False)):
+            ms, out = _time(lambda: postprocess_raw(pred, conf, iou, method, agnostic), repeats)
+            rows.append((label, ms, len(out[0])))
+            if method == 'greedy' and not agnostic and torch is not None:
+                same = len(ref) == len(out[0]) and np.allclose(np.sort(ref[:, 4]), np.sort(out[0][:, 4]))
+                print(f"   {'✅' if same else '⚠️ '} greedy result {'matches' if same else 'differs from'} ultralytics")
+        for label, ms, kept in rows:
+            print(f"   {label:28s} {ms:8.2f} ms  ({kept} kept)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="NumPy NMS speed vs ultralytics' postprocess")
+    parser.add_argument('--boxes', type=int, nargs='+', default=[1000, 10000, 30000],
+                        help='Candidate boxes above the confidence floor')
+    parser.add_argument('--conf', type=float, default=0.01)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.boxes, args.conf, args.iou, args.repeats)
+
+
+if __name__ == '__main__':
+    main()
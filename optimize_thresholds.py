@@ -0,0 +1,347 @@
+"""
+Threshold Optimizer - Tune confidence/NMS thresholds for the submission CSV
+Runs the model ONCE on the labeled val split, caches the raw detections, then
+searches global + per-class confidence and NMS IoU against the label-string metric
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+from datetime import datetime
+
+import numpy as np
+import yaml
+
+from label_store import LabelStore
+from model_registry import resolve_weights
+from nms import batched_nms
+from score_submission import score_counts
+
+# --- CONFIGURATION ---
+MODEL_PATH      = resolve_weights('production', default='runs/detect/RetailEye_Runs/Student_Model_v2/weights/best.pt')
+DATA_YAML       = 'data/vista.yaml'
+VAL_IMG_DIR     = 'data/images/val/'
+VAL_LABEL_DIR   = 'data/labels/val/'
+CACHE_FILE      = 'runs/threshold_cache.npz'
+THRESHOLDS_FILE = 'thresholds.json'
+
+# --- RAW DETECTION SETTINGS ---
+# Collect everything above a low floor with NMS effectively disabled (IoU 1.0),
+# so every candidate IoU can be re-applied from the cache later.
+CONF_FLOOR = 0.01
+RAW_IOU    = 1.0
+MAX_DET    = 1000
+
+# --- SEARCH SPACE ---
+CONF_GRID = np.round(np.arange(0.05, 0.951, 0.01), 2)
+IOU_GRID  = np.round(np.arange(0.30, 0.801, 0.05), 2)
+MIN_CLASS_SUPPORT = 5   # Classes with fewer GT boxes keep the global threshold
+COORD_SWEEPS = 3        # Per-class coordinate ascent passes
+
+# Hand-picked values used when no thresholds.json exists
+DEFAULT_CONF = 0.50
+DEFAULT_IOU  = 0.60
+
+
+def load_thresholds(path=THRESHOLDS_FILE, default_conf=DEFAULT_CONF, default_iou=DEFAULT_IOU):
+    """Load tuned thresholds, falling back to the hand-picked defaults"""
+    thresholds = {'conf': default_conf, 'iou': default_iou, 'class_conf': {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        thresholds['conf'] = float(saved.get('conf', default_conf))
+        thresholds['iou'] = float(saved.get('iou', default_iou))
+        thresholds['class_conf'] = {k: float(v) for k, v in saved.get('class_conf', {}).items()}
+    return thresholds
+
+
+def prediction_floor(thresholds):
+    """Lowest confidence any class accepts (pass this as conf= to predict)"""
+    return min([thresholds['conf']] + list(thresholds['class_conf'].values()))
+
+
+def accept_detection(cls_name, conf, thresholds):
+    """Apply the per-class confidence threshold to one detection"""
+    return conf >= thresholds['class_conf'].get(cls_name, thresholds['conf'])
+
+
+def load_label_groups(data_yaml=DATA_YAML):
+    """
+    Map class ids to label-string groups.
+    The submission only sees class NAMES, so ids sharing a name are scored together.
+    """
+    with open(data_yaml) as f:
+        names = yaml.safe_load(f).get('names', {})
+    if isinstance(names, list):
+        names = dict(enumerate(names))
+
+    num_classes = max(names) + 1 if names else 0
+    labels = sorted(set(names.values()))
+    label_idx = {name: i for i, name in enumerate(labels)}
+    class_to_group = np.full(num_classes, -1, dtype=np.int64)
+    for cls_id, name in names.items():
+        class_to_group[cls_id] = label_idx[name]
+    return labels, class_to_group
+
+
+def load_ground_truth(image_names, class_to_group, num_groups,
+                      img_dir=VAL_IMG_DIR, label_dir=VAL_LABEL_DIR):
+    """Per-image label counts (n_images x n_groups) from the columnar label store"""
+    store = LabelStore.build(img_dir, label_dir)
+    per_class = store.image_class_counts(len(class_to_group))
+
+    # Sum class columns into their label groups, then pick rows in image_names order
+    valid = class_to_group >= 0
+    per_group = np.zeros((store.n_images, num_groups), dtype=np.int64)
+    np.add.at(per_group.T, class_to_group[valid], per_class[:, valid].T)
+
+    gt = np.zeros((len(image_names), num_groups), dtype=np.int64)
+    rows = store.row_lookup()
+    for i, img_name in enumerate(image_names):
+        row = rows.get(os.path.splitext(img_name)[0])
+        if row is not None:
+            gt[i] = per_group[row]
+    return gt
+
+
+def collect_raw_detections(model_path, image_paths):
+    """Run the model once over the val images and return flat detection arrays"""
+    from ultralytics import YOLO
+
+    print(f"🤖 Loading model: {model_path}")
+    model = YOLO(model_path)
+
+    img_idx, boxes, scores, classes = [], [], [], []
+    start = time.time()
+    for i, img_path in enumerate(image_paths):
+        if i % 100 == 0:
+            print(f"   Processing image {i}/{len(image_paths)}...")
+        result = model.predict(img_path, conf=CONF_FLOOR, iou=RAW_IOU, max_det=MAX_DET, verbose=False)[0]
+        n = len(result.boxes)
+        if n == 0:
+            continue
+        img_idx.append(np.full(n, i, dtype=np.int64))
+        boxes.append(result.boxes.xyxy.cpu().numpy().astype(np.float32))
+        scores.append(result.boxes.conf.cpu().numpy().astype(np.float32))
+        classes.append(result.boxes.cls.cpu().numpy().astype(np.int64))
+
+    print(f"✅ Raw pass done in {time.time() - start:.1f}s")
+    if not img_idx:
+        return (np.zeros(0, np.int64), np.zeros((0, 4), np.float32),
+                np.zeros(0, np.float32), np.zeros(0, np.int64))
+    return np.concatenate(img_idx), np.concatenate(boxes), np.concatenate(scores), np.concatenate(classes)
+
+
+def load_or_build_cache(model_path, image_paths, refresh=False):
+    """Reuse cached raw detections unless the model or image list changed"""
+    image_names = [os.path.basename(p) for p in image_paths]
+    model_mtime = os.path.getmtime(model_path)
+
+    if not refresh and os.path.exists(CACHE_FILE):
+        cache = np.load(CACHE_FILE, allow_pickle=False)
+        if (str(cache['model_path']) == model_path
+                and float(cache['model_mtime']) == model_mtime
+                and list(cache['image_names']) == image_names):
+            print(f"♻️  Using cached raw detections: {CACHE_FILE}")
+            return cache['img_idx'], cache['boxes'], cache['scores'], cache['classes']
+        print("🔄 Cache is stale (model or val images changed) - rebuilding...")
+
+    img_idx, boxes, scores, classes = collect_raw_detections(model_path, image_paths)
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    np.savez(CACHE_FILE, img_idx=img_idx, boxes=boxes, scores=scores, classes=classes,
+             model_path=np.array(model_path), model_mtime=np.array(model_mtime),
+             image_names=np.array(image_names))
+    print(f"💾 Cached {len(scores)} raw detections to {CACHE_FILE}")
+    return img_idx, boxes, scores, classes
+
+
+def apply_nms(img_idx, boxes, scores, classes, iou_thresh):
+    """
+    Class-aware NMS over the whole cache at one IoU (no max_det cap - every box counts).
+    Greedy NMS commutes with a confidence cut (a box can only be suppressed by a
+    higher-scoring one), so every confidence threshold can be applied afterwards.
+    """
+    keep, _ = batched_nms(img_idx, boxes, scores, classes, iou=iou_thresh)
+    return keep
+
+
+def build_count_tables(det_img, det_group, det_score, gt, grid):
+    """
+    TP/FP per (label group, conf threshold), evaluated for the whole grid at once.
+    Label-string scoring = multiset match: TP = sum over images of min(pred, gt).
+    """
+    num_groups = gt.shape[1]
+    tp = np.zeros((num_groups, len(grid)), dtype=np.int64)
+    fp = np.zeros((num_groups, len(grid)), dtype=np.int64)
+
+    # Number of grid thresholds each detection passes
+    passes = np.searchsorted(grid, det_score, side='right')
+
+    for g in np.unique(det_group):
+        sel = det_group == g
+        imgs, inv = np.unique(det_img[sel], return_inverse=True)
+        hist = np.zeros((len(imgs), len(grid) + 1), dtype=np.int64)
+        np.add.at(hist, (inv, passes[sel]), 1)
+        # pred[i, t] = detections in image i with score >= grid[t]
+        pred = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        matched = np.minimum(pred, gt[imgs, g][:, None]).sum(axis=0)
+        tp[g] = matched
+        fp[g] = pred.sum(axis=0) - matched
+    return tp, fp
+
+
+def f1_score(tp, fp, fn):
+    """Micro F1 from label counts (works element-wise on arrays)"""
+    tp, fp, fn = np.asarray(tp), np.asarray(fp), np.asarray(fn)
+    denom = 2 * tp + fp + fn
+    return np.where(denom > 0, 2 * tp / np.maximum(denom, 1), 1.0)
+
+
+def search_class_thresholds(tp, fp, gt_totals, grid, min_support=MIN_CLASS_SUPPORT):
+    """Global threshold first, then per-class coordinate ascent on micro F1"""
+    fn_all = gt_totals[:, None] - tp
+    global_f1 = f1_score(tp.sum(axis=0), fp.sum(axis=0), fn_all.sum(axis=0))
+    best_global = int(np.argmax(global_f1))
+    evaluated = len(grid)
+
+    choice = np.full(tp.shape[0], best_global, dtype=np.int64)
+    rows = np.arange(tp.shape[0])
+    tunable = np.flatnonzero(gt_totals >= min_support)
+
+    for _ in range(COORD_SWEEPS):
+        changed = False
+        for g in tunable:
+            tp_rest = tp[rows, choice].sum() - tp[g, choice[g]]
+            fp_rest = fp[rows, choice].sum() - fp[g, choice[g]]
+            fn_rest = fn_all[rows, choice].sum() - fn_all[g, choice[g]]
+            f1 = f1_score(tp_rest + tp[g], fp_rest + fp[g], fn_rest + fn_all[g])
+            evaluated += len(grid)
+            best = int(np.argmax(f1))
+            if f1[best] > f1[choice[g]] + 1e-12:
+                choice[g] = best
+                changed = True
+        if not changed:
+            break
+
+    totals = (tp[rows, choice].sum(), fp[rows, choice].sum(), fn_all[rows, choice].sum())
+    return best_global, float(global_f1[best_global]), choice, totals, evaluated
+
+
+def optimize(model_path=MODEL_PATH, refresh=False, min_support=MIN_CLASS_SUPPORT):
+    """Search thresholds from the cached raw detections and save them"""
+    print("=" * 60)
+    print("🎛️  THRESHOLD OPTIMIZER")
+    print("=" * 60)
+
+    if not os.path.exists(model_path):
+        print(f"❌ Error: Model not found at {model_path}. Did you run training?")
+        return None
+    if not os.path.exists(DATA_YAML):
+        print(f"❌ Data config not found: {DATA_YAML}")
+        return None
+
+    image_paths = sorted(glob.glob(os.path.join(VAL_IMG_DIR, '*.jpg')))
+    if not image_paths:
+        print(f"❌ No validation images found in {VAL_IMG_DIR}")
+        return None
+
+    labels, class_to_group = load_label_groups()
+    image_names = [os.path.basename(p) for p in image_paths]
+    gt = load_ground_truth(image_names, class_to_group, len(labels))
+    gt_totals = gt.sum(axis=0)
+    print(f"📊 Val split: {len(image_names)} images, {int(gt_totals.sum())} labels, {len(labels)} classes")
+    if gt_totals.sum() == 0:
+        print("❌ All validation labels are EMPTY - nothing to tune against!")
+        return None
+
+    img_idx, boxes, scores, classes = load_or_build_cache(model_path, image_paths, refresh)
+
+    # Drop detections whose class id the yaml doesn't know (same safety check as 3_submit.py)
+    known = (classes < len(class_to_group))
+    known[known] = class_to_group[classes[known]] >= 0
+    img_idx, boxes, scores, classes = img_idx[known], boxes[known], scores[known], classes[known]
+    groups = class_to_group[classes] if len(classes) else classes
+
+    print(f"\n🔍 Searching {len(IOU_GRID)} IoU values x {len(CONF_GRID)} conf values "
+          f"(+ per-class refinement)...")
+    start = time.time()
+    best = None
+    evaluated = 0
+    for iou in IOU_GRID:
+        keep = apply_nms(img_idx, boxes, scores, classes, iou)
+        tp, fp = build_count_tables(img_idx[keep], groups[keep], scores[keep], gt, CONF_GRID)
+        g_idx, g_f1, choice, totals, n = search_class_thresholds(tp, fp, gt_totals, CONF_GRID, min_support)
+        evaluated += n
+        f1 = float(f1_score(*totals))
+        print(f"   IoU {iou:.2f}: global conf {CONF_GRID[g_idx]:.2f} → F1 {g_f1:.4f} | per-class F1 {f1:.4f}")
+        if best is None or f1 > best['f1']:
+            best = {'iou': float(iou), 'global_idx': g_idx, 'global_f1': g_f1,
+                    'choice': choice, 'totals': totals, 'f1': f1}
+    elapsed = time.time() - start
+
+    global_conf = float(CONF_GRID[best['global_idx']])
+    class_conf = {labels[g]: float(CONF_GRID[c]) for g, c in enumerate(best['choice'])
+                  if c != best['global_idx']}
+
+    # Re-score the winner with the submission scorer so both tools report the same numbers
+    keep = apply_nms(img_idx, boxes, scores, classes, best['iou'])
+    accepted = scores[keep] >= CONF_GRID[best['choice']][groups[keep]]
+    pred = np.zeros_like(gt)
+    np.add.at(pred, (img_idx[keep][accepted], groups[keep][accepted]), 1)
+    report = score_counts(pred, gt)
+
+    thresholds = {
+        'conf': global_conf,
+        'iou': best['iou'],
+        'class_conf': class_conf,
+        'metric': {
+            'f1': round(report['f1'], 6),
+            'global_only_f1': round(best['global_f1'], 6),
+            'precision': round(report['precision'], 6),
+            'recall': round(report['recall'], 6),
+            'accuracy': round(report['accuracy'], 6),
+        },
+        'model': model_path,
+        'val_images': len(image_names),
+        'created': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(THRESHOLDS_FILE, 'w') as f:
+        json.dump(thresholds, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("🏆 BEST THRESHOLDS")
+    print("=" * 60)
+    print(f"Evaluated {evaluated} candidates in {elapsed:.2f}s")
+    print(f"Global conf:  {global_conf:.2f}")
+    print(f"NMS IoU:      {best['iou']:.2f}")
+    print(f"Per-class overrides: {len(class_conf)}")
+    print(f"F1 (global only): {best['global_f1']:.4f}")
+    print(f"F1 (per-class):   {report['f1']:.4f}")
+    print(f"Precision: {report['precision']:.4f}  Recall: {report['recall']:.4f}  "
+          f"Exact-match acc: {report['accuracy']:.4f}")
+    print(f"\n💾 Saved to {THRESHOLDS_FILE} (loaded by 3_submit.py and inference.py)")
+    print("=" * 60)
+    return thresholds
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tune conf/IoU thresholds on the val split")
+    parser.add_argument('--model', type=str, default=MODEL_PATH,
+                        help=f'Model weights (default: {MODEL_PATH})')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore the raw detection cache and re-run the model')
+    parser.add_argument('--min-support', type=int, default=MIN_CLASS_SUPPORT,
+                        help=f'Min GT boxes before a class gets its own threshold (default: {MIN_CLASS_SUPPORT})')
+
+    args = parser.parse_args()
+
+    if optimize(args.model, refresh=args.refresh, min_support=args.min_support) is None:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""
+Pipeline Metrics - Stage timers, counters and queue gauges for the inference hot path
+Disabled by default: every call is then a global check and a return. Enable with
+environment variables (or metrics.enable()) and the same numbers are served as
+Prometheus text on a local port and/or appended as periodic JSON lines.
+
+    RETAILEYE_METRICS_PORT=9108 RETAILEYE_METRICS_JSONL=runs/metrics.jsonl python inference.py
+    curl -s localhost:9108/metrics
+    python pipeline_metrics.py runs/metrics.jsonl      # latest snapshot
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+# --- CONFIGURATION ---
+PREFIX = 'retaileye'
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+WINDOW = 1024          # Recent samples per series kept for JSON percentiles
+INTERVAL = 10.0        # Seconds between JSON lines
+
+_registry = None       # None = disabled (the fast path)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+def _series_order(item):
+    (name, lane), _ = item
+    return name, lane or ''
+
+
+class _Timer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _registry.observe(self.key, (time.perf_counter() - self.start) * 1e3)
+        return False
+
+
+class Registry:
+    """Thread-safe store; series are keyed by (name, lane)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}   # key -> [bucket counts..., +Inf count, sum_ms, recent deque]
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    def observe(self, key, ms):
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [[0] * (len(BUCKETS_MS) + 1), 0.0, deque(maxlen=WINDOW)]
+            buckets = h[0]
+            for i, bound in enumerate(BUCKETS_MS):
+                if ms <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            h[1] += ms
+            h[2].append(ms)
+
+    def inc(self, key, value=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, key, value):
+        with self.lock:
+            self.gauges[key] = value
+
+    # --- Exporters --------------------------------------------------------
+
+    def prometheus(self):
+        """Text exposition format 0.0.4"""
+        def labels(lane, **extra):
+            pairs = ([('lane', lane)] if lane else []) + list(extra.items())
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+
+        with self.lock:
+            histograms = {k: (list(h[0]), h[1]) for k, h in self.histograms.items()}
+            counters, gauges = dict(self.counters), dict(self.gauges)
+
+        lines = [f"# TYPE {PREFIX}_stage_seconds histogram"]
+        for (stage, lane), (buckets, total_ms) in sorted(histograms.items(), key=_series_order):
+            cumulative = 0
+            for bound, n in zip(BUCKETS_MS + ('+Inf',), buckets):
+                cumulative += n
+                le = bound if bound == '+Inf' else f"{bound / 1e3:g}"
+                lines.append(f"{PREFIX}_stage_seconds_bucket{labels(lane, stage=stage, le=le)} {cumulative}")
+            lines.append(f"{PREFIX}_stage_seconds_sum{labels(lane, stage=stage)} {total_ms / 1e3:.6f}")
+            lines.append(f"{PREFIX}_stage_seconds_count{labels(lane, stage=stage)} {cumulative}")
+        for name in sorted({n for n, _ in counters}):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines += [f"{PREFIX}_{name}_total{labels(lane)} {v}"
+                      for (n, lane), v in sorted(counters.items(), key=_series_order) if n == name]
+        for name in sorted({n for n, _ in gauges}):
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines += [f"{PREFIX}_{name}{labels(lane)} {v}"
+                      for (n, lane), v in sorted(gauges.items(), key=_series_order) if n == name]
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self, previous=None):
+        """JSON-friendly view: per-stage count/mean/p50/p95/max over the recent window, rates since `previous`"""
+        with self.lock:
+            stages = {}
+            for (stage, lane), (buckets, total_ms, recent) in self.histograms.items():
+                recent = sorted(recent)
+                count = sum(buckets)
+                stages[f"{lane}/{stage}" if lane else stage] = {
+                    'count': count, 'mean_ms': total_ms / count,
+                    'p50_ms': recent[len(recent) // 2],
+                    'p95_ms': recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                    'max_ms': recent[-1]}
+            counters = {f"{lane}/{n}" if lane else n: v for (n, lane), v in self.counters.items()}
+            gauges = {f"{lane}/{n}" if lane else n: v for (n, lane), v in self.gauges.items()}
+        snap = {'ts': time.time(), 'uptime_s': time.time() - self.started,
+                'stages': stages, 'counters': counters, 'gauges': gauges}
+        if previous:
+            dt = snap['ts'] - previous['ts']
+            snap['rates_per_s'] = {k: (v - previous['counters'].get(k, 0)) / dt
+                                   for k, v in counters.items() if dt > 0}
+        return snap
+
+
+# ============================================================
+# PUBLIC API (cheap no-ops while disabled)
+# ============================================================
+
+def enabled():
+    return _registry is not None
+
+
+def timer(stage, lane=None):
+    """with metrics.timer('decode'): ...  - records wall ms of the block"""
+    if _registry is None:
+        return _NULL
+    return _Timer((stage, lane))
+
+
+def observe(stage, ms, lane=None):
+    """Record a duration measured elsewhere (e.g. ultralytics' result.speed)"""
+    if _registry is not None:
+        _registry.observe((stage, lane), ms)
+
+
+def inc(name, value=1, lane=None):
+    if _registry is not None:
+        _registry.inc((name, lane), value)
+
+
+def gauge(name, value, lane=None):
+    if _registry is not None:
+        _registry.set((name, lane), value)
+
+
+def decode(path, lane=None):
+    """
+    Source for model.predict(): the path itself while disabled, else the image decoded
+    here under a 'decode' timer (so decode is split out of ultralytics' preprocess)
+    """
+    if _registry is None:
+        return path
+    import cv2
+    with timer('decode', lane):
+        img = cv2.imread(path)
+    return path if img is None else img
+
+
+def observe_speed(result, lane=None):
+    """ultralytics Results.speed (ms): preprocess, inference and postprocess (= NMS)"""
+    if _registry is not None:
+        speed = result.speed
+        _registry.observe(('preprocess', lane), speed.get('preprocess') or 0.0)
+        _registry.observe(('inference', lane), speed.get('inference') or 0.0)
+        _registry.observe(('nms', lane), speed.get('postprocess') or 0.0)
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+
+def _serve_prometheus(registry, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+class _JsonlWriter:
+    def __init__(self, registry, path, interval):
+        self.registry, self.path, self.interval = registry, path, interval
+        self.previous = None
+        self.stop = threading.Event()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        threading.Thread(target=self._loop, name='metrics-jsonl', daemon=True).start()
+
+    def write(self):
+        snap = self.registry.snapshot(self.previous)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snap) + '\n')
+        self.previous = snap
+
+    def _loop(self):
+        while not self.stop.wait(self.interval):
+            self.write()
+
+    def close(self):
+        self.stop.set()
+        self.write()
+
+
+def enable(port=None, jsonl=None, interval=INTERVAL):
+    """Turn metrics on (idempotent); optionally serve Prometheus text and/or write JSON lines"""
+    global _registry
+    if _registry is not None:
+        return _registry
+    registry = Registry()
+    if port:
+        try:
+            _serve_prometheus(registry, int(port))
+            print(f"📈 Metrics: http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"⚠️  Metrics port {port} unavailable ({e}) - Prometheus export disabled")
+    if jsonl:
+        writer = _JsonlWriter(registry, jsonl, interval)
+        atexit.register(writer.close)
+        print(f"📈 Metrics: JSON lines every {interval:g}s → {jsonl}")
+    _registry = registry
+    return registry
+
+
+def enable_from_env():
+    """RETAILEYE_METRICS_PORT / RETAILEYE_METRICS_JSONL / RETAILEYE_METRICS_INTERVAL; no-op if neither is set"""
+    port = os.environ.get('RETAILEYE_METRICS_PORT')
+    jsonl = os.environ.get('RETAILEYE_METRICS_JSONL')
+    if not (port or jsonl):
+        return None
+    return enable(port, jsonl, float(os.environ.get('RETAILEYE_METRICS_INTERVAL', INTERVAL)))
+
+
+def overhead(calls=200000):
+    """Per-call cost of a timed block, disabled vs enabled (ns)"""
+    global _registry
+    saved = _registry
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    loop = time.perf_counter() - start
+    results = {}
+    for label, registry in (('disabled', None), ('enabled', Registry())):
+        _registry = registry
+        start = time.perf_counter()
+        for _ in range(calls):
+            with timer('noop'):
+                pass
+        results[label] = (time.perf_counter() - start - loop) / calls * 1e9
+    _registry = saved
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pipeline metrics: overhead check and JSON-lines summary")
+    parser.add_argument('jsonl', nargs='?', help='Summarize the last line of a metrics JSONL file')
+    args = parser.parse_args()
+
+    if not args.jsonl:
+        cost = overhead()
+        print(f"⏱️  timer() overhead: {cost['disabled']:.0f} ns disabled, {cost['enabled']:.0f} ns enabled")
+        return
+    if not os.path.exists(args.jsonl):
+        print(f"❌ {args.jsonl} not found")
+        sys.exit(1)
+    with open(args.jsonl) as f:
+        lines = f.read().splitlines()
+    if not lines:
+        print(f"❌ {args.jsonl} is empty")
+        sys.exit(1)
+    snap = json.loads(lines[-1])
+    print("=" * 60)
+    print(f"📈 METRICS ({len(lines)} snapshots, uptime {snap['uptime_s']:.0f}s)")
+    print("=" * 60)
+    print(f"   {'stage':28s} {'count':>8s} {'mean':>8s} {'p50':>8s} {'p95':>8s}  (ms)")
+    for name, s in sorted(snap['stages'].items()):
+        print(f"   {name:28s} {s['count']:8d} {s['mean_ms']:8.2f} {s['p50_ms']:8.2f} {s['p95_ms']:8.2f}")
+    for name, v in sorted(snap['counters'].items()):
+        rate = snap.get('rates_per_s', {}).get(name)
+        print(f"   {name:28s} {v:>8}" + (f"  ({rate:.1f}/s)" if rate is not None else ""))
+    for name, v in sorted(snap['gauges'].items()):
+        print(f"   {name:28s} {v:>8}  (gauge)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Training Profiler - Where does each training step's time go?
+Splits every step into dataloader wait, host-to-device copy, forward, backward and
+optimizer (+EMA), times each augmentation of the real train pipeline per image, and
+writes a per-epoch breakdown (profile.json) plus a Chrome trace (trace.json, open in
+chrome://tracing or https://ui.perfetto.dev). Works on CPU.
+"""
+
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+PROFILE_EPOCHS = 2           # Short run: epoch 1 includes warm-up, epoch 2 is steady state
+PROFILE_PROJECT = 'runs/profile'
+AUGMENT_SAMPLES = 32         # Images pushed through the augmentation pipeline one transform at a time
+TRACE_MAX_EVENTS = 200_000   # Stop adding trace events past this (summaries keep counting)
+
+STAGES = ('data_wait', 'h2d', 'forward', 'backward', 'optimizer', 'other')
+STAGE_LABELS = {
+    'data_wait': 'dataloader wait',
+    'h2d': 'host->device',
+    'forward': 'forward + loss',
+    'backward': 'backward',
+    'optimizer': 'optimizer + EMA',
+    'other': 'loop overhead',
+}
+
+
+class Timeline:
+    """Per-step stage timings, per-epoch totals and Chrome trace events"""
+
+    def __init__(self, sync=None):
+        self.sync = sync or (lambda: None)
+        self.origin = time.perf_counter()
+        self.events = []
+        self.epochs = []
+        self._step = None
+        self._reset_epoch()
+
+    def _reset_epoch(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.steps = 0
+        self.images = 0
+
+    def now(self):
+        """Timestamp after pending GPU work finishes (a no-op on CPU)"""
+        self.sync()
+        return time.perf_counter()
+
+    def trace(self, name, start, end, tid=1, pid=1, **args):
+        if len(self.events) < TRACE_MAX_EVENTS:
+            self.events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                                'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+                                'args': args})
+
+    # --- steps ---
+
+    def begin_step(self, start, images):
+        self._step = {'start': start, 'stages': {}, 'images': images}
+
+    def add(self, stage, start, end):
+        if self._step is not None:
+            self._step['stages'][stage] = self._step['stages'].get(stage, 0.0) + end - start
+            self.trace(STAGE_LABELS[stage], start, end)
+
+    @contextmanager
+    def span(self, stage):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add(stage, start, self.now())
+
+    def end_step(self):
+        if self._step is None:
+            return
+        end = self.now()
+        stages = self._step['stages']
+        stages['other'] = max(0.0, end - self._step['start'] - sum(stages.values()))
+        for stage, seconds in stages.items():
+            self.totals[stage] += seconds
+        self.trace(f"step {self.steps}", self._step['start'], end, tid=0,
+                   **{k: round(v * 1e3, 3) for k, v in stages.items()})
+        self.steps += 1
+        self.images += self._step['images']
+        self._step = None
+
+    # --- epochs ---
+
+    def end_epoch(self, epoch, validation=None):
+        """Close the epoch and return its summary dict"""
+        step_time = sum(self.totals.values())
+        summary = {
+            'epoch': epoch,
+            'steps': self.steps,
+            'images': self.images,
+            'train_seconds': step_time,
+            'images_per_sec': self.images / step_time if step_time else 0.0,
+            'stages': {k: {'seconds': v, 'share': v / step_time if step_time else 0.0,
+                           'ms_per_step': v / self.steps * 1e3 if self.steps else 0.0}
+                       for k, v in self.totals.items()},
+            'validation_seconds': validation,
+        }
+        self.epochs.append(summary)
+        self._reset_epoch()
+        return summary
+
+    def chrome_trace(self):
+        meta = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'training loop'}},
+                {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'steps'}},
+                {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'stages'}},
+                {'name': 'process_name', 'ph': 'M', 'pid': 2, 'args': {'name': 'augmentation (1 process)'}}]
+        return {'traceEvents': meta + self.events, 'displayTimeUnit': 'ms'}
+
+
+class TimedLoader:
+    """Wraps the train dataloader; time blocked in next() is the dataloader wait"""
+
+    def __init__(self, loader, timeline):
+        self.loader = loader
+        self.timeline = timeline
+
+    def __iter__(self):
+        iterator = iter(self.loader)
+        while True:
+            start = self.timeline.now()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return
+            end = time.perf_counter()
+            self.timeline.begin_step(start, len(batch['img']))
+            self.timeline.add('data_wait', start, end)
+            yield batch
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+# ============================================================
+# AUGMENTATION COST
+# ============================================================
+
+def _flatten(transform):
+    """Compose trees -> flat list of leaf transforms"""
+    inner = getattr(transform, 'transforms', None)
+    if isinstance(inner, list):
+        return [leaf for t in inner for leaf in _flatten(t)]
+    return [transform]
+
+
+def profile_augmentations(dataset, samples=AUGMENT_SAMPLES, timeline=None):
+    """
+    Mean ms per image for image load (decode + resize) and each transform, run in
+    this process exactly as a dataloader worker would. Mosaic/MixUp include the extra
+    images they load and pre-process.
+    """
+    transforms = _flatten(dataset.transforms)
+    costs = {'load_image': 0.0}
+    order = ['load_image']
+    n = min(samples, len(dataset))
+    for i in range(n):
+        index = (i * len(dataset)) // max(n, 1)
+        start = time.perf_counter()
+        labels = dataset.get_image_and_label(index)
+        end = time.perf_counter()
+        costs['load_image'] += end - start
+        if timeline:
+            timeline.trace('load_image', start, end, pid=2, tid=0, sample=i)
+        for t in transforms:
+            name = type(t).__name__
+            if name not in costs:
+                costs[name] = 0.0
+                order.append(name)
+            start = time.perf_counter()
+            labels = t(labels)
+            end = time.perf_counter()
+            costs[name] += end - start
+            if timeline:
+                timeline.trace(name, start, end, pid=2, tid=0, sample=i)
+    total = sum(costs.values())
+    return {'samples': n,
+            'ms_per_image': total / max(n, 1) * 1e3,
+            'transforms': [{'name': k, 'ms_per_image': costs[k] / max(n, 1) * 1e3,
+                            'share': costs[k] / total if total else 0.0} for k in order]}
+
+
+# ============================================================
+# PROFILED TRAINER
+# ============================================================
+
+def profiled_trainer(base=None, augment_samples=AUGMENT_SAMPLES):
+    """
+    Trainer subclass (of `base`, default DetectionTrainer) that records stage timings.
+    Compose with rebalance.py: profiled_trainer(rebalanced_trainer()).
+    """
+    import torch
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    base = base or DetectionTrainer
+
+    class ProfiledTrainer(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            sync = torch.cuda.synchronize if self.device.type == 'cuda' else None
+            self.timeline = Timeline(sync)
+            self.augment_profile = None
+            self._val_start = None
+            self.add_callback('on_train_start', self._profile_start)
+            self.add_callback('on_train_batch_end', self._profile_step_end)
+            self.add_callback('on_train_epoch_end', self._profile_epoch_end)
+            self.add_callback('on_fit_epoch_end', self._profile_validation_end)
+            self.add_callback('on_train_end', self._profile_save)
+
+        def get_dataloader(self, dataset_path, batch_size=16, rank=0, mode='train'):
+            loader = super().get_dataloader(dataset_path, batch_size, rank, mode)
+            return TimedLoader(loader, self.timeline) if mode == 'train' else loader
+
+        def preprocess_batch(self, batch):
+            with self.timeline.span('h2d'):
+                return super().preprocess_batch(batch)
+
+        def optimizer_step(self):
+            # Backward ran between the end of forward and here
+            self.timeline.add('backward', self._forward_end, self.timeline.now())
+            self._forward_end = None
+            with self.timeline.span('optimizer'):
+                super().optimizer_step()
+
+        # --- callbacks ---
+
+        def _profile_start(self, trainer):
+            self._forward_end = None
+
+            def pre_forward(module, inputs):
+                self._forward_start = self.timeline.now()
+
+            def post_forward(module, inputs, output):
+                if module.training:
+                    self._forward_end = self.timeline.now()
+                    self.timeline.add('forward', self._forward_start, self._forward_end)
+
+            self.model.register_forward_pre_hook(pre_forward)
+            self.model.register_forward_hook(post_forward)
+
+            print(f"\n⏱️  Timing the augmentation pipeline on {augment_samples} images...")
+            self.augment_profile = profile_augmentations(self.train_loader.dataset, augment_samples,
+                                                         self.timeline)
+            print_augmentations(self.augment_profile)
+
+        def _profile_step_end(self, trainer):
+            # No optimizer step this iteration (gradient accumulation): backward ends here
+            if self._forward_end is not None:
+                self.timeline.add('backward', self._forward_end, self.timeline.now())
+                self._forward_end = None
+            self.timeline.end_step()
+
+        def _profile_epoch_end(self, trainer):
+            self._val_start = time.perf_counter()
+
+        def _profile_validation_end(self, trainer):
+            end = time.perf_counter()
+            validation = end - self._val_start if self._val_start else None
+            if self._val_start:
+                self.timeline.trace('validation + checkpoint', self._val_start, end, tid=0)
+            print_epoch(self.timeline.end_epoch(self.epoch + 1, validation))
+
+        def _profile_save(self, trainer):
+            report = build_report(self.timeline, self.augment_profile, self.args)
+            save_profile(report, self.timeline, str(self.save_dir))
+
+    return ProfiledTrainer
+
+
+# ============================================================
+# REPORT
+# ============================================================
+
+def _bar(share, width=30):
+    return '█' * int(round(share * width))
+
+
+def print_augmentations(profile):
+    print(f"   {'stage':22s} {'ms/image':>9s}  share")
+    for t in profile['transforms']:
+        print(f"   {t['name']:22s} {t['ms_per_image']:9.2f}  {t['share']:5.1%} {_bar(t['share'], 20)}")
+    print(f"   {'total':22s} {profile['ms_per_image']:9.2f}")
+
+
+def print_epoch(summary):
+    print("\n" + "=" * 60)
+    print(f"⏱️  EPOCH {summary['epoch']} PROFILE: {summary['steps']} steps, "
+          f"{summary['images_per_sec']:.1f} img/s")
+    print("=" * 60)
+    for stage in STAGES:
+        s = summary['stages'][stage]
+        print(f"   {STAGE_LABELS[stage]:16s} {s['seconds']:8.2f}s {s['ms_per_step']:8.1f} ms/step "
+              f"{s['share']:6.1%} {_bar(s['share'])}")
+    if summary['validation_seconds'] is not None:
+        print(f"   {'validation':16s} {summary['validation_seconds']:8.2f}s (not in step time)")
+
+
+def diagnose(epochs, augment, workers):
+    """Which stage to fix first, with the knob that usually fixes it"""
+    if not epochs:
+        return ["No complete epoch was profiled"]
+    # The last epoch is past warm-up (cudnn autotune, first-batch worker start-up)
+    stages = epochs[-1]['stages']
+    share = {k: v['share'] for k, v in stages.items()}
+    compute = share['forward'] + share['backward']
+    top = max(STAGES, key=lambda k: share[k])
+    findings = [f"Biggest stage: {STAGE_LABELS[top]} ({share[top]:.0%} of step time)"]
+
+    if share['data_wait'] >= 0.3:
+        findings.append(f"Input-bound: the model waits on the dataloader {share['data_wait']:.0%} of the time "
+                        f"(workers={workers})")
+        if augment:
+            worst = max(augment['transforms'], key=lambda t: t['ms_per_image'])
+            findings.append(f"Costliest per-image stage: {worst['name']} "
+                            f"({worst['ms_per_image']:.1f} ms, {worst['share']:.0%} of loader CPU time)")
+            if worst['name'] == 'load_image':
+                findings.append("→ JPEG decode dominates: cache='ram' or cache='disk', or more workers")
+            elif worst['name'] in ('Mosaic', 'MixUp', 'CopyPaste', 'RandomPerspective'):
+                findings.append(f"→ Raise workers, or lower the {worst['name']} probability/strength")
+            else:
+                findings.append("→ Raise workers (each worker runs the whole pipeline)")
+        else:
+            findings.append("→ Raise workers or enable cache")
+    elif compute >= 0.6:
+        findings.append(f"Compute-bound: forward+backward take {compute:.0%} of step time "
+                        "→ smaller imgsz/model, larger GPU batch, or AMP on GPU")
+    if share['optimizer'] >= 0.15:
+        findings.append(f"Optimizer + EMA take {share['optimizer']:.0%} → try a larger batch or nbs/accumulate")
+    if share['h2d'] >= 0.1:
+        findings.append(f"Host->device copies take {share['h2d']:.0%} → pin_memory / fewer, larger batches")
+    if share['other'] >= 0.15:
+        findings.append(f"Loop overhead {share['other']:.0%} (logging, progress bar, callbacks)")
+    return findings
+
+
+def build_report(timeline, augment, args):
+    workers = getattr(args, 'workers', None)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {k: getattr(args, k, None) for k in
+                     ('model', 'data', 'imgsz', 'batch', 'workers', 'device', 'cache', 'mosaic', 'mixup')},
+        'epochs': timeline.epochs,
+        'augmentations': augment,
+        'diagnosis': diagnose(timeline.epochs, augment, workers),
+    }
+
+
+def save_profile(report, timeline, save_dir):
+    os.makedirs(save_dir, exist_ok=True)
+    profile_path = os.path.join(save_dir, 'profile.json')
+    trace_path = os.path.join(save_dir, 'trace.json')
+    with open(profile_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    with open(trace_path, 'w') as f:
+        json.dump(timeline.chrome_trace(), f)
+
+    print("\n" + "=" * 60)
+    print("🔎 WHAT TO FIX")
+    print("=" * 60)
+    for line in report['diagnosis']:
+        print(f"   {line}")
+    print(f"\n💾 Breakdown: {profile_path}")
+    print(f"💾 Chrome trace: {trace_path} (chrome://tracing or ui.perfetto.dev)")
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+def profile_training(model_name, config, trainer=None, epochs=PROFILE_EPOCHS, fraction=None,
+                     device=None, augment_samples=AUGMENT_SAMPLES):
+    """
+    Short profiled run of a training recipe.
+    `config` is the kwargs the script passes to model.train(); `trainer` its trainer class.
+    Output goes to runs/profile/<name> so real runs and checkpoints are untouched.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    config = dict(config, epochs=epochs, project=PROFILE_PROJECT,
+                  name=os.path.basename(str(config.get('name', 'train'))), exist_ok=True,
+                  plots=False, save_period=-1)
+    if fraction:
+        config['fraction'] = fraction
+    if device is not None:
+        config['device'] = device
+    elif not torch.cuda.is_available():
+        config['device'] = 'cpu'    # Scripts hard-code device=0; profiling must also work without a GPU
+
+    print("=" * 60)
+    print(f"⏱️  PROFILING {model_name}: {epochs} epoch(s) on {config.get('device', 'auto')}, "
+          f"workers={config.get('workers')}")
+    print("=" * 60)
+    model = YOLO(model_name)
+    model.train(trainer=profiled_trainer(trainer, augment_samples), **config)
+    return str(model.trainer.save_dir)
+
+
+def add_profile_arguments(parser):
+    """--profile options shared by the training scripts"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', action='store_true',
+                       help='Short profiled run: per-stage step times, augmentation costs, Chrome trace')
+    group.add_argument('--profile-epochs', type=int, default=PROFILE_EPOCHS)
+    group.add_argument('--profile-fraction', type=float, default=None,
+                       help='Profile on this fraction of the train set (e.g. 0.1)')
+    group.add_argument('--profile-device', type=str, default=None, help="e.g. cpu (default: the script's device, or cpu without CUDA)")
+    return parser
+
+
+def run_profile_from_args(model_name, config, trainer, args):
+    return profile_training(model_name, config, trainer=trainer, epochs=args.profile_epochs,
+                            fraction=args.profile_fraction, device=args.profile_device)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile training: data loading vs compute")
+    parser.add_argument('--model', type=str, default='yolov8s.pt')
+    parser.add_argument('--data', type=str, default='data/vista.yaml')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--mosaic', type=float, default=1.0)
+    parser.add_argument('--mixup', type=float, default=0.15)
+    parser.add_argument('--epochs', type=int, default=PROFILE_EPOCHS)
+    parser.add_argument('--fraction', type=float, default=None, help='Fraction of the train set to use')
+    parser.add_argument('--device', type=str, default='cpu')
+    parser.add_argument('--samples', type=int, default=AUGMENT_SAMPLES, help='Images for the augmentation timing')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found - run generate_yaml.py first")
+        sys.exit(1)
+
+    config = {'data': args.data, 'imgsz': args.imgsz, 'batch': args.batch, 'workers': args.workers,
+              'mosaic': args.mosaic, 'mixup': args.mixup, 'name': 'standalone'}
+    profile_training(args.model, config, epochs=args.epochs, fraction=args.fraction,
+                     device=args.device, augment_samples=args.samples)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+Structured Pruning - Remove conv channels from a trained detector, fine-tune, export
+Prunable channels are the ones with no residual/concat coupling: the hidden channels of
+every C2f bottleneck and the two intermediate convs of each Detect branch. Channels are
+ranked by |BN gamma| x norm of the weights that consume them, removed in blocks of 8
+(lowest importance first, globally) until the FLOPs target is met, then the model is
+fine-tuned on the usual data and compared with the original.
+
+    python prune.py runs/detect/RetailEye_Runs/v1_mosaic_strategy --target 0.3
+"""
+
+import os
+import sys
+
+# --- CONFIGURATION ---
+DATA_YAML = 'data/vista.yaml'
+PROJECT = 'runs/prune'
+TARGET = 0.30               # Fraction of conv FLOPs to remove
+BLOCK = 8                   # Channels removed at a time (keeps widths SIMD-friendly)
+MIN_KEEP = 0.25             # Never shrink a layer below this share of its channels
+FINETUNE_EPOCHS = 10
+FINETUNE_LR = 0.002
+
+
+def resolve_best(ref):
+    """Run directory, weights file, or registry name/alias -> weights path"""
+    from model_registry import resolve_weights
+
+    if os.path.isdir(ref):
+        return os.path.join(ref, 'weights', 'best.pt')
+    return resolve_weights(ref, default=ref)
+
+
+# ============================================================
+# ANALYSIS
+# ============================================================
+
+def prunable_pairs(model):
+    """(producer Conv block, consumer nn.Conv2d, name) for every independently prunable channel set"""
+    from ultralytics.nn.modules.block import Bottleneck
+    from ultralytics.nn.modules.head import Detect
+
+    pairs = []
+    for name, m in model.named_modules():
+        if isinstance(m, Bottleneck) and m.cv1.conv.groups == 1 and m.cv2.conv.groups == 1:
+            pairs.append((m.cv1, m.cv2.conv, f"{name}.cv1"))
+        elif isinstance(m, Detect):
+            for branch in ('cv2', 'cv3'):
+                for level, seq in enumerate(getattr(m, branch)):
+                    pairs.append((seq[0], seq[1].conv, f"{name}.{branch}.{level}.0"))
+                    pairs.append((seq[1], seq[2], f"{name}.{branch}.{level}.1"))
+    return pairs
+
+
+def conv_flops(model, imgsz):
+    """Conv FLOPs (2 x MACs) of one imgsz x imgsz forward, and the output area of every conv"""
+    import torch
+    from torch import nn
+
+    area, handles = {}, []
+
+    def hook(module, inputs, output):
+        area[module] = output.shape[2] * output.shape[3]
+
+    for m in model.modules():
+        if isinstance(m, nn.Conv2d):
+            handles.append(m.register_forward_hook(hook))
+    p = next(model.parameters())
+    with torch.no_grad():
+        model.eval()(torch.zeros(1, 3, imgsz, imgsz, device=p.device, dtype=p.dtype))
+    for h in handles:
+        h.remove()
+    total = sum(2 * a * m.kernel_size[0] * m.kernel_size[1] * m.in_channels // m.groups * m.out_channels
+                for m, a in area.items())
+    return total, area
+
+
+def channel_importance(producer, consumer):
+    """|gamma| of the producer's BN x L2 norm of the consumer weights reading each channel"""
+    gamma = producer.bn.weight.detach().abs()
+    reads = consumer.weight.detach().transpose(0, 1).flatten(1).norm(dim=1)
+    score = gamma * reads
+    return score / score.mean().clamp(min=1e-12)      # Comparable across layers
+
+
+def plan_pruning(model, imgsz=640, target=TARGET, block=BLOCK, min_keep=MIN_KEEP):
+    """
+    Greedy global plan: repeatedly drop the block of `block` channels with the lowest mean
+    importance until `target` of the conv FLOPs are gone. Returns ({name: kept indices}, stats).
+    """
+    import torch
+
+    total, area = conv_flops(model, imgsz)
+    pairs = prunable_pairs(model)
+    chans = {}                                       # Current (in, out) of every conv we touch
+    for producer, consumer, _ in pairs:
+        for conv in (producer.conv, consumer):
+            chans[conv] = [conv.in_channels, conv.out_channels]
+
+    state = []
+    for producer, consumer, name in pairs:
+        score = channel_importance(producer, consumer)
+        n = score.numel()
+        state.append({'name': name, 'producer': producer.conv, 'consumer': consumer,
+                      'order': torch.argsort(score).tolist(), 'score': score,
+                      'removed': 0, 'floor': max(block, int(n * min_keep)), 'n': n})
+
+    def per_channel_saving(s):
+        p, c = s['producer'], s['consumer']
+        kp = p.kernel_size[0] * p.kernel_size[1]
+        kc = c.kernel_size[0] * c.kernel_size[1]
+        return 2 * (area[p] * kp * chans[p][0] + area[c] * kc * chans[c][1])
+
+    def next_block(s):
+        idx = s['order'][s['removed']:s['removed'] + block]
+        return float(s['score'][idx].mean())
+
+    saved, goal = 0, target * total
+    while saved < goal:
+        candidates = [s for s in state if s['n'] - s['removed'] - block >= s['floor']]
+        if not candidates:
+            break
+        s = min(candidates, key=next_block)
+        saved += block * per_channel_saving(s)
+        s['removed'] += block
+        chans[s['producer']][1] -= block
+        chans[s['consumer']][0] -= block
+
+    keep = {s['name']: sorted(s['order'][s['removed']:]) for s in state}
+    stats = {'flops_before': total, 'flops_removed_est': saved, 'target': target,
+             'reached': saved >= goal,
+             'layers': {s['name']: [s['n'], s['n'] - s['removed']] for s in state if s['removed']}}
+    return keep, stats
+
+
+# ============================================================
+# SURGERY
+# ============================================================
+
+def _slice_out(conv_block, idx):
+    """Keep output channels `idx` of an ultralytics Conv (conv + BN)"""
+    from torch import nn
+
+    conv, bn = conv_block.conv, conv_block.bn
+    conv.weight = nn.Parameter(conv.weight.data[idx].clone())
+    if conv.bias is not None:
+        conv.bias = nn.Parameter(conv.bias.data[idx].clone())
+    conv.out_channels = len(idx)
+    bn.weight = nn.Parameter(bn.weight.data[idx].clone())
+    bn.bias = nn.Parameter(bn.bias.data[idx].clone())
+    bn.running_mean = bn.running_mean[idx].clone()
+    bn.running_var = bn.running_var[idx].clone()
+    bn.num_features = len(idx)
+
+
+def _slice_in(conv, idx):
+    from torch import nn
+
+    conv.weight = nn.Parameter(conv.weight.data[:, idx].clone())
+    conv.in_channels = len(idx)
+
+
+def apply_pruning(model, keep):
+    """Physically remove channels in place according to plan_pruning()'s `keep`"""
+    import torch
+
+    for producer, consumer, name in prunable_pairs(model):
+        idx = keep.get(name)
+        if idx is None or len(idx) == producer.conv.out_channels:
+            continue
+        idx = torch.tensor(idx, device=producer.conv.weight.device)
+        _slice_out(producer, idx)
+        _slice_in(consumer, idx)
+    return model
+
+
+def prune_weights(weights, out_path, imgsz=640, target=TARGET):
+    """Prune a trained checkpoint and save it in ultralytics checkpoint format"""
+    from copy import deepcopy
+
+    import torch
+    from ultralytics.nn.tasks import attempt_load_one_weight
+
+    model, ckpt = attempt_load_one_weight(weights, device='cpu')
+    model = model.float()
+    keep, stats = plan_pruning(model, imgsz, target)
+    apply_pruning(model, keep)
+    stats['flops_after'], _ = conv_flops(model, imgsz)
+
+    ckpt = dict(ckpt, model=deepcopy(model).half(), ema=None, optimizer=None, epoch=-1,
+                pruning={'source': weights, 'target': target, 'layers': stats['layers']})
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    torch.save(ckpt, out_path)
+    return stats
+
+
+def pruned_trainer(base=None):
+    """
+    Trainer that fine-tunes the given model object as-is. The stock get_model() rebuilds the
+    network from its yaml and copies matching weights, which would silently undo the pruning.
+    """
+    from torch import nn
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    base = base or DetectionTrainer
+
+    class PrunedTrainer(base):
+        def get_model(self, cfg=None, weights=None, verbose=True):
+            if not isinstance(weights, nn.Module):
+                return super().get_model(cfg, weights, verbose)
+            if weights.nc != self.data['nc']:
+                raise ValueError(f"Pruned model has {weights.nc} classes, {self.args.data} has {self.data['nc']}")
+            for p in weights.parameters():
+                p.requires_grad_(True)
+            return weights.float()
+
+    return PrunedTrainer
+
+
+# ============================================================
+# PIPELINE
+# ============================================================
+
+def print_plan(stats):
+    before, after = stats['flops_before'], stats['flops_after']
+    print(f"\n✂️  Pruned {len(stats['layers'])} layer(s): {before / 1e9:.1f} → {after / 1e9:.1f} GFLOPs "
+          f"({1 - after / before:.0%} removed, target {stats['target']:.0%})")
+    if not stats['reached']:
+        print(f"⚠️  Target not reachable with MIN_KEEP={MIN_KEEP:.0%} - every prunable layer is at its floor")
+    for name, (n, kept) in sorted(stats['layers'].items(), key=lambda kv: kv[1][1] / kv[1][0]):
+        print(f"   {name:28s} {n:4d} → {kept:4d}  ({kept / n:.0%})")
+
+
+def prune(ref, target=TARGET, data_yaml=DATA_YAML, epochs=FINETUNE_EPOCHS, imgsz=640, batch=16,
+          device=None, name=None, register_as='pruned'):
+    from ultralytics import YOLO
+    from model_registry import register_model, record_export, record_benchmark
+    from model_report import measure, export_onnx, print_comparison, save_report, val_images
+
+    weights = resolve_best(ref)
+    if not os.path.exists(weights):
+        raise FileNotFoundError(f"Weights not found: {ref}")
+    name = name or f"{os.path.basename(os.path.dirname(os.path.dirname(weights))) or 'model'}_p{int(target * 100)}"
+    out_dir = os.path.join(PROJECT, name)
+
+    print("=" * 60)
+    print(f"✂️  STRUCTURED PRUNING: {weights} (target -{target:.0%} FLOPs)")
+    print("=" * 60)
+    images = val_images()
+    rows = {'original': measure(weights, data_yaml, images, imgsz)}
+
+    pruned_path = os.path.join(out_dir, 'pruned.pt')
+    stats = prune_weights(weights, pruned_path, imgsz, target)
+    print_plan(stats)
+    rows['pruned'] = measure(pruned_path, data_yaml, images, imgsz)
+
+    final = pruned_path
+    if epochs > 0:
+        print(f"\n🔧 Fine-tuning for {epochs} epoch(s)...")
+        model = YOLO(pruned_path)
+        model.train(trainer=pruned_trainer(), data=data_yaml, epochs=epochs, imgsz=imgsz, batch=batch,
+                    device=device, lr0=FINETUNE_LR, warmup_epochs=0, workers=0, project=PROJECT,
+                    name=f"{name}_ft", exist_ok=False, plots=True)
+        final = str(model.trainer.best)
+        rows['pruned + ft'] = measure(final, data_yaml, images, imgsz)
+
+    print("\n📦 Exporting pruned model to ONNX...")
+    onnx_path = export_onnx(final, imgsz)
+    rows['pruned (onnx)'] = measure(onnx_path, data_yaml, images, imgsz, accuracy=False)
+    print_comparison(rows, reference='original', title="PRUNED vs ORIGINAL")
+
+    save_report(dict(rows, pruning=stats), os.path.join(out_dir, 'prune_report.json'))
+    run_name = register_model(final, name=register_as)
+    record_export(run_name, 'onnx', onnx_path)
+    record_benchmark(run_name, 'cpu_latency', rows['pruned + ft' if epochs > 0 else 'pruned']['latency'])
+    record_benchmark(run_name, 'pruning', {'source': weights, 'target': target,
+                                           'gflops_before': stats['flops_before'] / 1e9,
+                                           'gflops_after': stats['flops_after'] / 1e9})
+    print(f"📚 Registered as '{run_name}' (onnx: {onnx_path})")
+    return final
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Structured channel pruning + fine-tune of a trained detector")
+    parser.add_argument('model', help='Run directory, best.pt path, or registry name/alias')
+    parser.add_argument('--target', type=float, default=TARGET, help='Fraction of conv FLOPs to remove')
+    parser.add_argument('--data', type=str, default=DATA_YAML)
+    parser.add_argument('--epochs', type=int, default=FINETUNE_EPOCHS, help='Fine-tune epochs (0 = skip)')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch', type=int, default=16)
+    parser.add_argument('--device', type=str, default=None)
+    parser.add_argument('--name', type=str, default=None)
+    parser.add_argument('--register-as', type=str, default='pruned')
+    parser.add_argument('--plan-only', action='store_true', help='Print the pruning plan and exit')
+    args = parser.parse_args()
+
+    if not 0 < args.target < 1:
+        print("❌ --target must be between 0 and 1")
+        sys.exit(1)
+    if args.plan_only:
+        from ultralytics.nn.tasks import attempt_load_one_weight
+
+        model, _ = attempt_load_one_weight(resolve_best(args.model), device='cpu')
+        model = model.float()
+        _, stats = plan_pruning(model, args.imgsz, args.target)
+        stats['flops_after'] = stats['flops_before'] - stats['flops_removed_est']
+        print_plan(stats)
+        return
+    if not os.path.exists(args.data):
+        print(f"❌ {args.data} not found - run generate_yaml.py first")
+        sys.exit(1)
+    prune(args.model, args.target, args.data, args.epochs, args.imgsz, args.batch, args.device,
+          args.name, args.register_as)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,20 +7,15 @@ import sys
 from pathlib import Path
 
 
-def count_files(directory, extension):
-    """Count files with specific extension"""
-    path = Path(directory)
-    if not path.exists():
-        return 0
-    return len(list(path.glob(f"*.{extension}")))
-
-
 def display_status():
     """Display current dataset status"""
-    train_imgs = count_files("data/images/train", "jpg") + count_files("data/images/train", "png")
-    train_lbls = count_files("data/labels/train", "txt")
-    val_imgs = count_files("data/images/val", "jpg") + count_files("data/images/val", "png")
-    val_lbls = count_files("data/labels/val", "txt")
+    from dataset_index import get_index
+
+    index = get_index(splits=['train', 'val'])
+    train = index.split_summary('train')
+    val = index.split_summary('val')
+    train_imgs, train_lbls = train['images'], train['labels']
+    val_imgs, val_lbls = val['images'], val['labels']
     
     print("\n" + "=" * 60)
     print("📊 CURRENT DATASET STATUS")
@@ -209,7 +204,12 @@ def show_help():
     print("   - EXPANSION_GUIDE.md (Dataset expansion)")
     print("   - runs/detect/RetailEye_Runs/ (Training results)")
     
-    print("\n6. COMMON ISSUES:")
+    print("\n6. FASTER MENU ACTIONS:")
+    print("   Keep models loaded in a second terminal:")
+    print("   python model_server.py start")
+    print("   Inference (Option 5) then skips the torch import and model load")
+    
+    print("\n7. COMMON ISSUES:")
     print("   • Out of memory → Reduce batch size in script")
     print("   • mAP = 0 → Need more data or longer training")
     print("   • Slow training → Normal on CPU, use GPU if possible")
@@ -238,7 +238,10 @@ def main():
             
             elif choice == "5":
                 print("\n🔍 Running inference on test images...")
-                os.system("python inference.py")
+                # Use the warm worker if one is running (no torch import / model load)
+                from model_server import run_remote
+                if run_remote('inference') is None:
+                    os.system("python inference.py")
                 input("\nPress Enter to continue...")
             
             elif choice == "6":
@@ -263,4 +266,9 @@ def main():
 if __name__ == "__main__":
     # Change to script directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    main()
+    
+    # Non-interactive status view (cheap enough to run at boot)
+    if "--status" in sys.argv[1:]:
+        display_status()
+    else:
+        main()
@@ -0,0 +1,160 @@
+"""
+Class-Rebalancing Sampler - Repeat-factor sampling for long-tail SKUs
+Per-image sampling weights are computed once from the label store and cached;
+training draws images with those weights instead of uniformly, so rare classes are
+seen more often without duplicating files on disk (augment_dataset.py --multiplier)
+"""
+
+import os
+
+import numpy as np
+
+from label_store import LabelStore
+
+# --- CONFIGURATION ---
+REPEAT_THRESHOLD = 0.1   # Classes in fewer than this fraction of images get repeated
+MAX_REPEAT = 10.0        # Cap on any single image's repeat factor
+
+
+def repeat_factors(store, threshold=REPEAT_THRESHOLD, max_repeat=MAX_REPEAT):
+    """
+    LVIS-style repeat factors.
+    r_c = max(1, sqrt(threshold / f_c)), with f_c the fraction of images containing
+    class c; each image takes the max r_c over the classes it contains.
+    """
+    if store.n_images == 0:
+        return np.zeros(0, dtype=np.float64)
+    present = store.image_class_counts() > 0
+    freq = present.sum(axis=0) / store.n_images
+    class_r = np.where(freq > 0, np.maximum(1.0, np.sqrt(threshold / np.maximum(freq, 1e-12))), 1.0)
+    class_r = np.minimum(class_r, max_repeat)
+    # Max over present classes; background images keep 1.0
+    return np.where(present, class_r[None, :], 1.0).max(axis=1, initial=1.0)
+
+
+def cache_path(labels_dir, threshold):
+    labels_dir = os.path.normpath(labels_dir)
+    return os.path.join(os.path.dirname(labels_dir),
+                        f".{os.path.basename(labels_dir)}_repeat_{threshold:g}.npz")
+
+
+def load_weights(images_dir, labels_dir, threshold=REPEAT_THRESHOLD):
+    """
+    {stem: repeat factor} for one split, cached next to the labels.
+    The cache is reused while no label file changed (size/mtime signature).
+    """
+    store = LabelStore.build(images_dir, labels_dir)
+    signature = np.array([store.n_images, int(store.label_size.sum()), int(store.label_mtime.sum())],
+                         dtype=np.int64)
+    path = cache_path(labels_dir, threshold)
+    factors = None
+    if os.path.exists(path):
+        try:
+            with np.load(path) as cached:
+                if np.array_equal(cached['signature'], signature):
+                    factors = cached['factors']
+        except (OSError, ValueError, KeyError):
+            pass
+    if factors is None:
+        factors = repeat_factors(store, threshold)
+        try:
+            np.savez(path, signature=signature, factors=factors)
+        except OSError:
+            pass
+    return {str(stem): float(f) for stem, f in zip(store.stems, factors)}
+
+
+def weights_for_files(im_files, threshold=REPEAT_THRESHOLD):
+    """Sampling weight for each image path, in the order the training dataset lists them"""
+    weights = np.ones(len(im_files), dtype=np.float64)
+    by_dir = {}
+    for i, path in enumerate(im_files):
+        by_dir.setdefault(os.path.dirname(path), []).append(i)
+    for images_dir, indices in by_dir.items():
+        # ultralytics convention: .../images/<split> -> .../labels/<split>
+        sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+        labels_dir = sb.join((images_dir + os.sep).rsplit(sa, 1)).rstrip(os.sep)
+        stem_weights = load_weights(images_dir, labels_dir, threshold)
+        for i in indices:
+            stem = os.path.splitext(os.path.basename(im_files[i]))[0]
+            weights[i] = stem_weights.get(stem, 1.0)
+    return weights
+
+
+def rebalanced_trainer(threshold=REPEAT_THRESHOLD):
+    """
+    DetectionTrainer subclass whose train loader samples images by repeat factor.
+    Pass it as model.train(trainer=rebalanced_trainer(), ...).
+    """
+    import torch
+    from torch.utils.data import WeightedRandomSampler
+    from ultralytics.data.build import InfiniteDataLoader, seed_worker
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils.torch_utils import torch_distributed_zero_first
+
+    class RebalancedTrainer(DetectionTrainer):
+        def get_dataloader(self, dataset_path, batch_size=16, rank=0, mode='train'):
+            if mode != 'train' or rank != -1 or self.args.rect:
+                if mode == 'train':
+                    print("⚠️  Rebalanced sampling needs single-process, non-rect training - using uniform")
+                return super().get_dataloader(dataset_path, batch_size, rank, mode)
+
+            with torch_distributed_zero_first(rank):
+                dataset = self.build_dataset(dataset_path, mode, batch_size)
+            weights = weights_for_files(dataset.im_files, threshold)
+            print(f"⚖️  Repeat-factor sampling: {int((weights > 1).sum())}/{len(weights)} images "
+                  f"up-weighted (max x{weights.max():.1f})")
+
+            sampler = WeightedRandomSampler(torch.as_tensor(weights, dtype=torch.double),
+                                            num_samples=len(weights), replacement=True)
+            workers = min(os.cpu_count() or 1, self.args.workers)
+            generator = torch.Generator()
+            generator.manual_seed(6148914691236517205 + self.args.seed)
+            return InfiniteDataLoader(dataset, batch_size=batch_size, shuffle=False, sampler=sampler,
+                                      num_workers=workers, pin_memory=torch.cuda.is_available(),
+                                      collate_fn=getattr(dataset, 'collate_fn', None),
+                                      worker_init_fn=seed_worker, generator=generator)
+
+    return RebalancedTrainer
+
+
+def exposure_report(images_dir, labels_dir, threshold=REPEAT_THRESHOLD, top=10):
+    """Expected boxes per epoch for each class: uniform vs repeat-factor sampling"""
+    store = LabelStore.build(images_dir, labels_dir)
+    counts = store.image_class_counts()
+    factors = repeat_factors(store, threshold)
+    uniform = counts.sum(axis=0).astype(np.float64)
+    weighted = (counts * (factors / factors.mean())[:, None]).sum(axis=0)
+
+    print("=" * 60)
+    print("⚖️  REPEAT-FACTOR SAMPLING")
+    print("=" * 60)
+    print(f"Images: {store.n_images} | threshold {threshold:g} | "
+          f"{int((factors > 1).sum())} images up-weighted (max x{factors.max(initial=1.0):.1f})")
+    present = np.flatnonzero(uniform > 0)
+    if len(present):
+        rarest = present[np.argsort(uniform[present])][:top]
+        print(f"\nRarest {len(rarest)} classes - boxes seen per epoch:")
+        for c in rarest:
+            print(f"  class {c:3d}: {uniform[c]:7.0f} → {weighted[c]:7.1f}  (x{weighted[c] / uniform[c]:.2f})")
+        ratio = uniform[present].max() / uniform[present].min()
+        ratio_w = weighted[present].max() / weighted[present].min()
+        print(f"\nMost/least frequent class ratio: {ratio:.1f} → {ratio_w:.1f}")
+    print("=" * 60)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect repeat-factor sampling weights")
+    parser.add_argument('--split', type=str, default='train')
+    parser.add_argument('--threshold', type=float, default=REPEAT_THRESHOLD,
+                        help=f'Image-frequency threshold (default: {REPEAT_THRESHOLD})')
+    args = parser.parse_args()
+
+    exposure_report(os.path.join('data', 'images', args.split),
+                    os.path.join('data', 'labels', args.split), args.threshold)
+
+
+if __name__ == '__main__':
+    main()
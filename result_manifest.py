@@ -0,0 +1,113 @@
+"""
+Result Manifest - Per-image submission results from the last run, keyed by file fingerprint
+Incremental runs diff the test directory against it (name, size, mtime; SHA-256 only when
+size/mtime moved) and infer just the new or changed images - everything else is reused.
+Results are tied to the weights + thresholds (run_key) that produced them. Runs that
+write the Parquet sidecar also keep each image's raw detections + latency, so reused
+rows carry the same data as freshly inferred ones.
+"""
+
+import os
+import json
+
+from model_registry import file_sha256
+
+# --- CONFIGURATION ---
+MANIFEST_VERSION = 1
+
+
+def default_manifest_path(csv_path):
+    """submissions/final_submission.csv -> submissions/.final_submission.manifest.json"""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path), f".{stem}.manifest.json")
+
+
+class ResultManifest:
+    def __init__(self, path, run_key):
+        self.path = path
+        self.run_key = json.loads(json.dumps(run_key))
+        self.images = {}        # name -> [size, mtime_ns, sha256, label(, {detections, latency_ms})]
+        self.reusable = set()   # Names whose stored label is still valid for this run
+        self.stats = {'new': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # Corrupt manifest - full run
+        if saved.get('version') != MANIFEST_VERSION:
+            return
+        if saved.get('run_key') != self.run_key:
+            print("ℹ️  Stored results come from other weights/thresholds - re-inferring everything")
+            return
+        self.images = saved.get('images', {})
+
+    def save(self):
+        """Write the manifest atomically"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'run_key': self.run_key, 'images': self.images},
+                      f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    # --- Diff -------------------------------------------------------------
+
+    def diff(self, image_paths, need_raw=False):
+        """
+        Mark which images can reuse their stored result. Same size + mtime is trusted;
+        same size with a new mtime (copied/touched) is confirmed by hash. Images no
+        longer present are dropped. With need_raw (Parquet sidecar), results stored
+        without raw detections are re-inferred too. Returns the paths that still need inference.
+        """
+        todo, seen = [], set()
+        for path in image_paths:
+            name = os.path.basename(path)
+            seen.add(name)
+            record = self.images.get(name)
+            if record is None:
+                self.stats['new'] += 1
+                todo.append(path)
+                continue
+            st = os.stat(path)
+            if need_raw and (len(record) < 5 or record[4] is None):
+                self.stats['changed'] += 1      # Stored by a CSV-only run - no boxes to reuse
+                todo.append(path)
+                continue
+            if record[0] == st.st_size and record[1] == st.st_mtime_ns:
+                self.reusable.add(name)
+            elif record[0] == st.st_size and record[2] == file_sha256(path):
+                record[1] = st.st_mtime_ns
+                self.reusable.add(name)
+            else:
+                self.stats['changed'] += 1
+                todo.append(path)
+                continue
+            self.stats['unchanged'] += 1
+
+        removed = [name for name in self.images if name not in seen]
+        for name in removed:
+            del self.images[name]
+        self.stats['removed'] = len(removed)
+        return todo
+
+    def label(self, name):
+        """Stored label string, or None when the image has to be inferred"""
+        return self.images[name][3] if name in self.reusable else None
+
+    def raw(self, name):
+        """(detections, latency_ms) stored with a reusable result, or (None, None)"""
+        record = self.images.get(name) if name in self.reusable else None
+        if record is None or len(record) < 5 or record[4] is None:
+            return None, None
+        return record[4]['detections'], record[4]['latency_ms']
+
+    def record(self, path, label, detections=None, latency_ms=None):
+        """Store a fresh result (hashing the image it came from), with its raw detections if given"""
+        st = os.stat(path)
+        raw = None if detections is None else {'detections': detections, 'latency_ms': latency_ms}
+        self.images[os.path.basename(path)] = [st.st_size, st.st_mtime_ns, file_sha256(path), label, raw]
@@ -0,0 +1,254 @@
+"""
+Local Submission Scorer - Score ImageID,Label CSVs before uploading
+Compares multiset label counts per image against held-out ground truth
+"""
+
+import os
+import sys
+import csv
+import json
+from collections import Counter
+
+import numpy as np
+import yaml
+
+from label_store import LabelStore
+
+# --- CONFIGURATION ---
+DATA_YAML     = 'data/vista.yaml'
+VAL_IMG_DIR   = 'data/images/val/'
+VAL_LABEL_DIR = 'data/labels/val/'
+
+
+def read_submission(csv_path):
+    """Read an ImageID,Label CSV into {image_id: Counter(label -> count)}"""
+    rows = {}
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            label = row.get('Label') or ''
+            rows[row['ImageID']] = Counter(label.split())
+    return rows
+
+
+def load_ground_truth(img_dir=VAL_IMG_DIR, label_dir=VAL_LABEL_DIR, data_yaml=DATA_YAML):
+    """Build the same {image_id: Counter} view from the label store + vista.yaml names"""
+    with open(data_yaml) as f:
+        names = yaml.safe_load(f).get('names', {})
+    if isinstance(names, list):
+        names = dict(enumerate(names))
+
+    store = LabelStore.build(img_dir, label_dir)
+    per_class = store.image_class_counts(max(names) + 1 if names else 0)
+    gt = {}
+    for img_id, counts_row in zip(store.image_files, per_class):
+        if not img_id:
+            continue  # Label file without an image
+        counts = Counter()
+        for cls_id in np.flatnonzero(counts_row):
+            if int(cls_id) in names:
+                counts[names[int(cls_id)]] += int(counts_row[cls_id])
+        gt[str(img_id)] = counts
+    return gt
+
+
+def to_matrix(rows, image_ids, labels):
+    """
+    Encode {image_id: Counter} as an (n_images x n_labels) count matrix.
+    Encode once, then call score_counts() as often as needed.
+    Labels not in `labels` are counted in an extra trailing column (always false positives).
+    """
+    label_idx = {name: i for i, name in enumerate(labels)}
+    matrix = np.zeros((len(image_ids), len(labels) + 1), dtype=np.int64)
+    for i, img_id in enumerate(image_ids):
+        for name, count in rows.get(img_id, {}).items():
+            matrix[i, label_idx.get(name, len(labels))] += count
+    return matrix
+
+
+def score_counts(pred, gt, labels=None):
+    """
+    Score count matrices (n_images x n_labels).
+    TP per image/label = min(pred, gt); an image is exact when every count matches.
+    """
+    pred = np.asarray(pred)
+    gt = np.asarray(gt)
+    unknown = np.zeros(pred.shape[0], dtype=np.int64)
+    if labels is not None and pred.shape[1] == len(labels) + 1:
+        # Trailing unknown-label column from to_matrix(): pure false positives
+        unknown = pred[:, -1]
+        pred = pred[:, :-1]
+        gt = gt[:, :-1]
+
+    tp = np.minimum(pred, gt)
+    tp_c = tp.sum(axis=0)
+    fp_c = pred.sum(axis=0) - tp_c
+    fn_c = gt.sum(axis=0) - tp_c
+
+    tp_all = int(tp_c.sum())
+    fp_all = int(fp_c.sum() + unknown.sum())
+    fn_all = int(fn_c.sum())
+
+    precision_c = tp_c / np.maximum(tp_c + fp_c, 1)
+    recall_c = tp_c / np.maximum(tp_c + fn_c, 1)
+    f1_c = 2 * tp_c / np.maximum(2 * tp_c + fp_c + fn_c, 1)
+    present = (gt.sum(axis=0) + pred.sum(axis=0)) > 0
+
+    exact = ((pred == gt).all(axis=1) & (unknown == 0))
+
+    report = {
+        'images': int(pred.shape[0]),
+        'tp': tp_all,
+        'fp': fp_all,
+        'fn': fn_all,
+        'precision': tp_all / max(tp_all + fp_all, 1),
+        'recall': tp_all / max(tp_all + fn_all, 1),
+        'f1': 2 * tp_all / max(2 * tp_all + fp_all + fn_all, 1),
+        'macro_f1': float(f1_c[present].mean()) if present.any() else 0.0,
+        'accuracy': float(exact.mean()) if len(exact) else 0.0,
+    }
+    if labels is not None:
+        report['per_class'] = {
+            labels[c]: {
+                'tp': int(tp_c[c]), 'fp': int(fp_c[c]), 'fn': int(fn_c[c]),
+                'precision': float(precision_c[c]), 'recall': float(recall_c[c]), 'f1': float(f1_c[c]),
+            }
+            for c in np.flatnonzero(present)
+        }
+    return report
+
+
+def score(pred_rows, gt_rows):
+    """Score parsed submission rows against ground truth rows"""
+    image_ids = sorted(gt_rows)
+    labels = sorted({name for counts in gt_rows.values() for name in counts}
+                    | {name for counts in pred_rows.values() for name in counts})
+    report = score_counts(to_matrix(pred_rows, image_ids, labels),
+                          to_matrix(gt_rows, image_ids, labels), labels)
+    report['missing_images'] = sum(1 for img_id in gt_rows if img_id not in pred_rows)
+    report['extra_images'] = sum(1 for img_id in pred_rows if img_id not in gt_rows)
+    return report
+
+
+def diff_submissions(rows_a, rows_b, gt_rows=None):
+    """Image-by-image differences between two submissions"""
+    changes = []
+    for img_id in sorted(set(rows_a) | set(rows_b)):
+        a = rows_a.get(img_id, Counter())
+        b = rows_b.get(img_id, Counter())
+        if a == b:
+            continue
+        change = {'image': img_id, 'added': dict(b - a), 'removed': dict(a - b)}
+        if gt_rows is not None and img_id in gt_rows:
+            truth = gt_rows[img_id]
+            # Change in matched labels (TP) for this image: > 0 means B is better
+            change['tp_delta'] = sum((b & truth).values()) - sum((a & truth).values())
+            change['fp_delta'] = sum((b - truth).values()) - sum((a - truth).values())
+        changes.append(change)
+    return changes
+
+
+def print_report(report, top=20):
+    """Pretty-print a score report"""
+    print("\n" + "=" * 60)
+    print("📈 SUBMISSION SCORE")
+    print("=" * 60)
+    print(f"Images scored:    {report['images']}")
+    if report.get('missing_images'):
+        print(f"⚠️  Missing from CSV (scored as empty): {report['missing_images']}")
+    if report.get('extra_images'):
+        print(f"⚠️  In CSV but not in ground truth (ignored): {report['extra_images']}")
+    print(f"Precision:        {report['precision']:.4f}")
+    print(f"Recall:           {report['recall']:.4f}")
+    print(f"F1 (micro):       {report['f1']:.4f}")
+    print(f"F1 (macro):       {report['macro_f1']:.4f}")
+    print(f"Exact-match acc:  {report['accuracy']:.4f}")
+
+    per_class = report.get('per_class', {})
+    if per_class:
+        print("\n" + "=" * 60)
+        print(f"📊 PER-CLASS (worst {min(top, len(per_class))} by F1)")
+        print("=" * 60)
+        worst = sorted(per_class.items(), key=lambda kv: (kv[1]['f1'], -kv[1]['fn']))[:top]
+        for name, m in worst:
+            print(f"  {name:25s}: F1 {m['f1']:.3f}  P {m['precision']:.3f}  R {m['recall']:.3f}  "
+                  f"(tp {m['tp']}, fp {m['fp']}, fn {m['fn']})")
+    print("=" * 60)
+
+
+def print_diff(changes, name_a, name_b, top=20):
+    """Pretty-print image-by-image differences"""
+    print("\n" + "=" * 60)
+    print(f"🔀 DIFF: {name_a} → {name_b}")
+    print("=" * 60)
+    print(f"Images that changed: {len(changes)}")
+    if changes and 'tp_delta' in changes[0]:
+        better = sum(1 for c in changes if c.get('tp_delta', 0) - c.get('fp_delta', 0) > 0)
+        worse = sum(1 for c in changes if c.get('tp_delta', 0) - c.get('fp_delta', 0) < 0)
+        print(f"  Better in B: {better}   Worse in B: {worse}")
+        changes = sorted(changes, key=lambda c: c.get('tp_delta', 0) - c.get('fp_delta', 0))
+    for c in changes[:top]:
+        added = ' '.join(f"+{v} {k}" for k, v in c['added'].items())
+        removed = ' '.join(f"-{v} {k}" for k, v in c['removed'].items())
+        delta = f"  (TP {c['tp_delta']:+d}, FP {c['fp_delta']:+d})" if 'tp_delta' in c else ''
+        print(f"  {c['image']}: {' '.join(filter(None, [added, removed]))}{delta}")
+    if len(changes) > top:
+        print(f"  ... and {len(changes) - top} more")
+    print("=" * 60)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score a submission CSV against local ground truth")
+    parser.add_argument('submission', type=str, help='ImageID,Label CSV to score')
+    parser.add_argument('--gt', type=str, default=None,
+                        help='Ground-truth CSV in the same format (default: val labels + vista.yaml)')
+    parser.add_argument('--diff', type=str, default=None,
+                        help='Second submission to compare image by image')
+    parser.add_argument('--top', type=int, default=20,
+                        help='Rows to show in per-class / diff listings (default: 20)')
+    parser.add_argument('--json', type=str, default=None,
+                        help='Also write the report(s) to this JSON file')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.submission):
+        print(f"❌ Submission not found: {args.submission}")
+        sys.exit(1)
+
+    if args.gt:
+        gt_rows = read_submission(args.gt)
+    elif os.path.exists(DATA_YAML):
+        gt_rows = load_ground_truth()
+    else:
+        print(f"❌ No ground truth: pass --gt or create {DATA_YAML}")
+        sys.exit(1)
+
+    if not gt_rows:
+        print("❌ Ground truth is empty!")
+        sys.exit(1)
+
+    pred_rows = read_submission(args.submission)
+    report = score(pred_rows, gt_rows)
+    print_report(report, top=args.top)
+    output = {'submission': args.submission, 'report': report}
+
+    if args.diff:
+        other_rows = read_submission(args.diff)
+        other_report = score(other_rows, gt_rows)
+        print(f"\n📄 {args.diff}: F1 {other_report['f1']:.4f} "
+              f"({other_report['f1'] - report['f1']:+.4f}), "
+              f"accuracy {other_report['accuracy']:.4f} "
+              f"({other_report['accuracy'] - report['accuracy']:+.4f})")
+        changes = diff_submissions(pred_rows, other_rows, gt_rows)
+        print_diff(changes, args.submission, args.diff, top=args.top)
+        output['diff'] = {'submission': args.diff, 'report': other_report, 'changes': changes}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\n💾 Report saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,19 @@
+"""
+Stratified Train/Val Splitter - Class-balanced, augmentation-aware validation split
+Labels are loaded once from the columnar label store, `_aug_` variants stay in the
+same split as their source image, copy-paste images are pinned to train, and groups
+are assigned greedily (rarest classes first) so per-class box counts in val track the
+target ratio
+"""
+
 import os
+import json
 import shutil
 import random
-import glob
+
+import numpy as np
+
+from label_store import LabelStore
 
 # Setup
 TRAIN_IMG = 'data/images/train/'
@@ -9,32 +21,209 @@ TRAIN_LBL = 'data/labels/train/'
 VAL_IMG   = 'data/images/val/'
 VAL_LBL   = 'data/labels/val/'
 
-def split():
-    # Make val folders
-    os.makedirs(VAL_IMG, exist_ok=True)
-    os.makedirs(VAL_LBL, exist_ok=True)
-    
-    # Get all labeled images
-    all_labels = glob.glob(os.path.join(TRAIN_LBL, "*.txt"))
-    
-    # Calculate 20%
-    num_val = int(len(all_labels) * 0.2)
-    val_files = random.sample(all_labels, num_val)
-    
-    print(f"Moving {num_val} items to Validation...")
-    
-    for lbl_path in val_files:
-        basename = os.path.basename(lbl_path)
-        img_name = basename.replace('.txt', '.jpg')
-        
-        src_img = os.path.join(TRAIN_IMG, img_name)
-        
-        # Move both
-        if os.path.exists(src_img):
-            shutil.move(src_img, os.path.join(VAL_IMG, img_name))
-            shutil.move(lbl_path, os.path.join(VAL_LBL, basename))
+VAL_RATIO = 0.2
+IMAGE_SLACK = 0.1         # Val may exceed its image target by this fraction
+AUG_MARKER = '_aug_'      # augment_dataset.py names variants <source>_aug_<n>
+CP_PREFIX = 'cp_'         # copy_paste.py names synthetic images cp_<seed>_<n> (always train)
+MANIFEST_FILE = 'data/split_manifest.json'
+
+
+def source_stem(stem):
+    """photo_aug_3 -> photo (variants are grouped with their source)"""
+    return stem.split(AUG_MARKER, 1)[0]
+
+
+def synthetic_rows(store):
+    """Boolean mask of copy-paste images (their crops come from train, so they stay there)"""
+    return np.char.startswith(store.stems.astype(str), CP_PREFIX)
+
+
+def build_groups(store, pin_synthetic=False):
+    """
+    Group labeled images by source stem (copy-paste images are left out with pin_synthetic).
+    Returns (group names, row lists, CSR class counts: indptr, class ids, counts).
+    """
+    usable = (store.image_files != '') & (store.label_size >= 0)
+    if pin_synthetic:
+        usable &= ~synthetic_rows(store)
+    group_of = {}
+    rows = []
+    for row in np.flatnonzero(usable):
+        key = source_stem(str(store.stems[row]))
+        if key not in group_of:
+            group_of[key] = len(rows)
+            rows.append([])
+        rows[group_of[key]].append(int(row))
+    names = list(group_of)
+
+    # Per-group class counts, computed once with NumPy and stored sparsely
+    row_group = np.full(store.n_images, -1, dtype=np.int64)
+    for g, members in enumerate(rows):
+        row_group[members] = g
+    box_group = row_group[store.box_image()]
+    keep = (box_group >= 0) & (store.cls >= 0)
+    num_classes = int(store.cls.max()) + 1 if store.n_boxes else 0
+    flat = box_group[keep] * max(num_classes, 1) + store.cls[keep]
+    keys, counts = np.unique(flat, return_counts=True)
+    group_ids = keys // max(num_classes, 1)
+    class_ids = keys % max(num_classes, 1)
+    indptr = np.searchsorted(group_ids, np.arange(len(names) + 1))
+    return names, rows, (indptr, class_ids, counts), num_classes
+
+
+def stratify(store, ratio=VAL_RATIO, seed=42, pin_synthetic=False):
+    """
+    Greedy iterative stratification over augmentation groups.
+    Returns (val rows, per-class box totals, per-class val box counts, number of groups).
+    """
+    names, rows, (indptr, class_ids, counts), num_classes = build_groups(store, pin_synthetic)
+    rng = random.Random(seed)
+
+    totals = np.bincount(class_ids, weights=counts, minlength=num_classes).astype(np.int64)
+    target = ratio * totals
+    # Deviations on rare classes cost more: one box of a 10-box class is 10%
+    weight = 1.0 / np.maximum(totals, 1)
+
+    group_sizes = np.array([len(r) for r in rows], dtype=np.int64)
+    image_target = ratio * group_sizes.sum()
+    image_cap = image_target * (1 + IMAGE_SLACK)
+    val_images = 0
+
+    # Rarest class in each group decides its turn (rare classes are placed first)
+    rarest = np.full(len(names), np.inf)
+    for g in range(len(names)):
+        cls = class_ids[indptr[g]:indptr[g + 1]]
+        if len(cls):
+            rarest[g] = totals[cls].min()
+    order = list(range(len(names)))
+    rng.shuffle(order)
+    order.sort(key=lambda g: (rarest[g], -group_sizes[g]))
+
+    # Each group goes to whichever split it brings closer to its per-class target
+    need = {'val': target.copy(), 'train': totals - target}
+    in_val = np.zeros(len(names), dtype=bool)
+    for g in order:
+        cls = class_ids[indptr[g]:indptr[g + 1]]
+        cnt = counts[indptr[g]:indptr[g + 1]]
+        if len(cls) == 0:
+            continue  # Empty-label groups only fill the image quota below
+        cost = {split: (weight[cls] * (np.abs(need[split][cls] - cnt) - np.abs(need[split][cls]))).sum()
+                for split in need}
+        if cost['val'] < cost['train'] and val_images + group_sizes[g] <= image_cap:
+            split = 'val'
+            in_val[g] = True
+            val_images += group_sizes[g]
+        else:
+            split = 'train'
+        need[split][cls] -= cnt
 
+    # Top up the image quota with background (no-box) groups
+    for g in order:
+        if val_images >= image_target:
+            break
+        if not in_val[g] and indptr[g] == indptr[g + 1] and val_images + group_sizes[g] <= image_cap:
+            in_val[g] = True
+            val_images += group_sizes[g]
+
+    val_counts = np.round(target - need['val']).astype(np.int64)
+    val_rows = [row for g in np.flatnonzero(in_val) for row in rows[g]]
+    return sorted(val_rows), totals, val_counts, len(names)
+
+
+def plan_moves(store, val_rows, mode, out_dir=None):
+    """(src, dst) pairs for every file that changes place"""
+    val_rows = set(val_rows)
+    usable = np.flatnonzero((store.image_files != '') & (store.label_size >= 0))
+    moves = []
+    for row in usable:
+        image, stem = str(store.image_files[row]), str(store.stems[row])
+        split = 'val' if row in val_rows else 'train'
+        if mode == 'move':
+            if split == 'val':
+                moves.append((os.path.join(TRAIN_IMG, image), os.path.join(VAL_IMG, image)))
+                moves.append((os.path.join(TRAIN_LBL, stem + '.txt'), os.path.join(VAL_LBL, stem + '.txt')))
+        else:
+            moves.append((os.path.join(TRAIN_IMG, image), os.path.join(out_dir, 'images', split, image)))
+            moves.append((os.path.join(TRAIN_LBL, stem + '.txt'),
+                          os.path.join(out_dir, 'labels', split, stem + '.txt')))
+    return moves
+
+
+def apply_moves(moves, mode):
+    """Check the whole batch for conflicts first, then move/link everything"""
+    conflicts = [dst for _, dst in moves if os.path.exists(dst)]
+    if conflicts:
+        raise FileExistsError(f"{len(conflicts)} destination file(s) already exist, e.g. {conflicts[0]}")
+    for dst_dir in {os.path.dirname(dst) for _, dst in moves}:
+        os.makedirs(dst_dir, exist_ok=True)
+    for src, dst in moves:
+        if mode == 'move':
+            os.replace(src, dst)
+        else:
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)  # Different filesystem - fall back to a copy
+
+
+def split(ratio=VAL_RATIO, seed=42, mode='move', out_dir=None, dry_run=False):
+    store = LabelStore.build(TRAIN_IMG, TRAIN_LBL)
+    val_rows, totals, val_counts, n_groups = stratify(store, ratio=ratio, seed=seed, pin_synthetic=True)
+    usable = (store.image_files != '') & (store.label_size >= 0)
+    n_pinned = int((usable & synthetic_rows(store)).sum())
+    n_usable = int(usable.sum()) - n_pinned
+
+    present = totals > 0
+    achieved = val_counts[present] / totals[present]
+    print("=" * 60)
+    print("🎯 STRATIFIED SPLIT")
+    print("=" * 60)
+    print(f"Labeled images: {n_usable} in {n_groups} source groups")
+    if n_pinned:
+        print(f"Copy-paste images: {n_pinned} (kept in train)")
+        print("⚠️  They were made before this split - regenerate them so no val image lent them crops")
+    print(f"Validation: {len(val_rows)} images ({len(val_rows) / max(n_usable, 1):.1%}, target {ratio:.0%})")
+    if present.any():
+        print(f"Per-class val box ratio: mean {achieved.mean():.3f}, "
+              f"min {achieved.min():.3f}, max {achieved.max():.3f} "
+              f"(mean abs error {np.abs(achieved - ratio).mean():.3f})")
+        missing = np.flatnonzero(present & (val_counts == 0) & (totals >= 1 / ratio))
+        if len(missing):
+            print(f"⚠️  {len(missing)} class(es) with enough boxes got none in val: {missing.tolist()[:10]}")
+
+    moves = plan_moves(store, val_rows, mode, out_dir)
+    if dry_run:
+        print(f"\n(dry run) Would {mode} {len(moves)} files")
+        return val_rows
+
+    print(f"\n{'Moving' if mode == 'move' else 'Linking'} {len(moves)} files...")
+    apply_moves(moves, mode)
+
+    os.makedirs(os.path.dirname(MANIFEST_FILE) or '.', exist_ok=True)
+    with open(MANIFEST_FILE, 'w') as f:
+        json.dump({'ratio': ratio, 'seed': seed, 'mode': mode, 'out_dir': out_dir,
+                   'val': [str(store.stems[row]) for row in val_rows]}, f, indent=2)
+    print(f"💾 Split manifest: {MANIFEST_FILE}")
     print("✅ Split Complete.")
+    return val_rows
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Class-balanced, augmentation-aware train/val split")
+    parser.add_argument('--ratio', type=float, default=VAL_RATIO, help='Validation fraction (default: 0.2)')
+    parser.add_argument('--seed', type=int, default=42, help='Tie-break seed')
+    parser.add_argument('--mode', choices=['move', 'link'], default='move',
+                        help='move: train -> val in place; link: hard-link both splits into --out')
+    parser.add_argument('--out', type=str, default='data/split',
+                        help='Output dataset root for --mode link')
+    parser.add_argument('--dry-run', action='store_true', help='Report the split without touching files')
+    args = parser.parse_args()
+
+    split(ratio=args.ratio, seed=args.seed, mode=args.mode,
+          out_dir=args.out if args.mode == 'link' else None, dry_run=args.dry_run)
+
 
 if __name__ == '__main__':
-    split()
+    main()
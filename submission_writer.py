@@ -0,0 +1,251 @@
+"""
+Submission Writer - Stream ImageID,Label rows to disk while images are predicted
+Rows go to <csv>.partial and are flushed every FLUSH_EVERY images: a crash loses at
+most one batch, and the next run with the same model + thresholds resumes after the
+last flushed image. The CSV appears under its real name only once the run completes.
+Optional Parquet sidecar (pyarrow) keeps raw boxes, scores and per-image latency.
+Memory stays constant: nothing but the current batch is held.
+"""
+
+import csv
+import glob
+import json
+import os
+import shutil
+
+# --- CONFIGURATION ---
+FLUSH_EVERY = 100               # Rows between flushes (= rows per Parquet part)
+HEADER = ['ImageID', 'Label']
+
+
+def sidecar_path(csv_path):
+    """submissions/final_submission.csv -> submissions/final_submission.parquet"""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def run_key(weights, thresholds, **settings):
+    """What a partial output depends on: the weights file (path, size, mtime), thresholds, settings"""
+    stat = os.stat(weights) if weights and os.path.exists(weights) else None
+    key = {'weights': weights, 'weights_size': stat and stat.st_size,
+           'weights_mtime_ns': stat and stat.st_mtime_ns, 'thresholds': thresholds, **settings}
+    return json.loads(json.dumps(key))          # Compare like the JSON copy on disk
+
+
+def raw_detections(result):
+    """Every box an ultralytics result holds (before per-class thresholds) as plain lists"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return {'boxes': [], 'scores': [], 'classes': []}
+    return {'boxes': boxes.xyxy.tolist(), 'scores': boxes.conf.tolist(),
+            'classes': [int(c) for c in boxes.cls.tolist()]}
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('image_id', pa.string()),
+        ('label', pa.string()),
+        ('latency_ms', pa.float32()),
+        ('boxes', pa.list_(pa.list_(pa.float32(), 4))),     # xyxy, input pixels
+        ('scores', pa.list_(pa.float32())),
+        ('classes', pa.list_(pa.int32())),
+    ])
+
+
+def _count_rows(path):
+    """Data rows in a partial CSV, dropping a half-written last line first"""
+    with open(path, 'rb+') as f:
+        data_end = f.seek(0, os.SEEK_END)
+        if data_end:
+            f.seek(max(data_end - 1, 0))
+            if f.read(1) != b'\n':
+                # Find the last complete line and cut everything after it
+                pos = data_end
+                while pos > 0:
+                    step = min(65536, pos)
+                    f.seek(pos - step)
+                    chunk = f.read(step)
+                    cut = chunk.rfind(b'\n')
+                    if cut >= 0:
+                        data_end = pos - step + cut + 1
+                        break
+                    pos -= step
+                else:
+                    data_end = 0
+                f.truncate(data_end)
+    rows, last_id = 0, None
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        if next(reader, None) != HEADER:
+            return None, None
+        for row in reader:
+            rows, last_id = rows + 1, row[0]
+    return rows, last_id
+
+
+def _truncate_rows(path, keep):
+    """Keep the header and the first `keep` data rows of a CSV"""
+    with open(path, 'rb+') as f:
+        for _ in range(keep + 1):
+            f.readline()
+        f.truncate(f.tell())
+
+
+class SubmissionWriter:
+    """
+    with SubmissionWriter(csv_path, run_key={...}) as out:
+        for image_id in image_ids[out.resume_from(image_ids):]:
+            out.write(image_id, label, raw_detections(result), latency_ms)
+    The CSV is finalised on a clean exit; after an exception the partial file is
+    flushed and left for the next run to resume. on_flush() runs after every flush,
+    so state kept alongside the rows (e.g. the result manifest) is exactly as durable.
+    """
+
+    def __init__(self, path, run_key=None, parquet=False, flush_every=FLUSH_EVERY, resume=True,
+                 on_flush=None):
+        self.path = path
+        self.partial = path + '.partial'
+        self.meta_path = self.partial + '.json'
+        self.parts_dir = self.partial + '.parts'
+        self.run_key = json.loads(json.dumps(run_key or {}))
+        self.flush_every = flush_every
+        self.on_flush = on_flush
+        self.parquet = parquet and self._pyarrow_available()
+        self.rows, self.last_id = 0, None
+        self._pending = []
+        self._file = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if not (resume and self._resume()):
+            self._reset()
+        self._open()
+
+    @staticmethod
+    def _pyarrow_available():
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+            return True
+        except ImportError:
+            print("⚠️  pyarrow not installed - skipping the Parquet sidecar (pip install pyarrow)")
+            return False
+
+    # --- Partial state ----------------------------------------------------
+
+    def _meta(self):
+        return {'output': os.path.basename(self.path), 'run_key': self.run_key, 'parquet': self.parquet}
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.parts_dir, 'part-*.parquet')))
+
+    def _resume(self):
+        """Pick up a partial run of the same job; False when there is nothing usable"""
+        if not (os.path.exists(self.partial) and os.path.exists(self.meta_path)):
+            return False
+        try:
+            with open(self.meta_path) as f:
+                if json.load(f) != self._meta():
+                    print("ℹ️  Partial output is from another model/thresholds - starting over")
+                    return False
+        except (OSError, ValueError):
+            return False
+        rows, last_id = _count_rows(self.partial)
+        if rows is None:
+            return False
+        if self.parquet:
+            # The CSV is always flushed first, so it can only be ahead of the sidecar
+            import pyarrow.parquet as pq
+            sidecar_rows = sum(pq.ParquetFile(p).metadata.num_rows for p in self._parts())
+            if sidecar_rows < rows:
+                _truncate_rows(self.partial, sidecar_rows)
+                rows, last_id = _count_rows(self.partial)
+        self.rows, self.last_id = rows, last_id
+        if rows:
+            print(f"♻️  Resuming {self.partial}: {rows} images already written")
+        return True
+
+    def _reset(self):
+        for path in (self.partial, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        self.rows, self.last_id = 0, None
+        with open(self.meta_path, 'w') as f:
+            json.dump(self._meta(), f, indent=2)
+
+    def _open(self):
+        fresh = not os.path.exists(self.partial)
+        self._file = open(self.partial, 'a', newline='', encoding='utf-8')
+        self._csv = csv.writer(self._file, lineterminator='\n')
+        if fresh:
+            self._csv.writerow(HEADER)
+
+    def resume_from(self, image_ids):
+        """
+        Index of the first image still to predict. The rows already written must be a
+        prefix of image_ids (checked through the last written ID), else start over.
+        """
+        if self.rows and (self.rows > len(image_ids) or image_ids[self.rows - 1] != self.last_id):
+            print("⚠️  Partial output doesn't match the current image list - starting over")
+            self._file.close()
+            self._reset()
+            self._open()
+        return self.rows
+
+    # --- Writing ----------------------------------------------------------
+
+    def write(self, image_id, label, detections=None, latency_ms=None):
+        self._csv.writerow([image_id, label])
+        self.rows, self.last_id = self.rows + 1, image_id
+        if self.parquet:
+            detections = detections or {}
+            self._pending.append({
+                'image_id': image_id, 'label': label, 'latency_ms': latency_ms,
+                'boxes': detections.get('boxes', []), 'scores': detections.get('scores', []),
+                'classes': detections.get('classes', []),
+            })
+        if self.rows % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        """Make every row written so far durable (CSV first, then its Parquet part)"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._pending:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            os.makedirs(self.parts_dir, exist_ok=True)
+            part = os.path.join(self.parts_dir, f"part-{self.rows:012d}.parquet")
+            table = pa.Table.from_pylist(self._pending, schema=_parquet_schema())
+            pq.write_table(table, part + '.tmp')
+            os.replace(part + '.tmp', part)
+            self._pending = []
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def close(self):
+        """Finalise: move the CSV into place and merge the Parquet parts into one file"""
+        self.flush()
+        self._file.close()
+        if self.parquet:
+            import pyarrow.parquet as pq
+            target = sidecar_path(self.path)
+            with pq.ParquetWriter(target + '.tmp', _parquet_schema()) as writer:
+                for part in self._parts():                  # One part in memory at a time
+                    writer.write_table(pq.read_table(part))
+            os.replace(target + '.tmp', target)
+        os.replace(self.partial, self.path)
+        os.remove(self.meta_path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.flush()
+            self._file.close()
+            print(f"💾 Kept {self.rows} finished images in {self.partial} - re-run to resume")
+        return False
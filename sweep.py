@@ -0,0 +1,422 @@
+"""
+Hyperparameter Sweep - Parallel short trials with early pruning
+Samples lr0 / mosaic / mixup / imgsz / augmentation strengths around the
+expand_and_train.py recommendations, runs several trials at once (one process each),
+and stops losing trials early on intermediate val mAP (ASHA or median stopping).
+Every report lands in a SQLite file you can query directly:
+
+    sqlite3 runs/sweep/sweeps.db "SELECT trial, status, best_metric FROM trials ORDER BY best_metric DESC"
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import subprocess
+from datetime import datetime
+
+import yaml
+
+# --- CONFIGURATION ---
+SWEEP_DIR = 'runs/sweep'
+SWEEP_DB = 'runs/sweep/sweeps.db'
+DATA_YAML = 'data/vista.yaml'
+MODEL = 'yolov8n.pt'               # Small model: trials rank configs, they don't ship
+METRIC = 'metrics/mAP50(B)'
+
+N_TRIALS = 24
+MAX_EPOCHS = 27                    # Epoch budget of a trial that is never pruned
+MIN_EPOCHS = 3                     # First ASHA rung
+ETA = 3                            # ASHA: keep the top 1/ETA at each rung (rungs 3, 9, 27)
+MIN_REPORTS = 3                    # Never prune on fewer scores than this at a rung/epoch
+POLL_SECONDS = 2.0
+
+# name: (kind, args...) - kind is uniform, log (log-uniform) or choice
+SEARCH_SPACE = {
+    'lr0': ('log', 1e-4, 1e-2),
+    'mosaic': ('uniform', 0.5, 1.0),
+    'mixup': ('uniform', 0.0, 0.3),
+    'imgsz': ('choice', [416, 512, 640]),
+    'hsv_s': ('uniform', 0.3, 0.9),
+    'hsv_v': ('uniform', 0.2, 0.6),
+    'degrees': ('uniform', 0.0, 15.0),
+    'translate': ('uniform', 0.05, 0.2),
+    'scale': ('uniform', 0.3, 0.7),
+    'fliplr': ('uniform', 0.0, 0.5),
+}
+
+
+# ============================================================
+# RESULTS DATABASE
+# ============================================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    sweep TEXT PRIMARY KEY, created TEXT, config TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    sweep TEXT, trial INTEGER, params TEXT, status TEXT,
+    best_metric REAL, best_epoch INTEGER, epochs_run INTEGER DEFAULT 0,
+    started TEXT, finished TEXT, seconds REAL, save_dir TEXT, error TEXT,
+    PRIMARY KEY (sweep, trial)
+);
+CREATE TABLE IF NOT EXISTS reports (
+    sweep TEXT, trial INTEGER, epoch INTEGER, metric REAL, elapsed REAL,
+    PRIMARY KEY (sweep, trial, epoch)
+);
+"""
+
+
+def connect(path=SWEEP_DB):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    db = sqlite3.connect(path, timeout=60)
+    db.row_factory = sqlite3.Row
+    db.execute('PRAGMA journal_mode=WAL')   # Trials write concurrently
+    db.executescript(SCHEMA)
+    return db
+
+
+def update_trial(db, sweep, trial, **fields):
+    columns = ', '.join(f"{k} = ?" for k in fields)
+    with db:
+        db.execute(f"UPDATE trials SET {columns} WHERE sweep = ? AND trial = ?",
+                   (*fields.values(), sweep, trial))
+
+
+def load_config(db, sweep):
+    row = db.execute("SELECT config FROM sweeps WHERE sweep = ?", (sweep,)).fetchone()
+    if row is None:
+        raise KeyError(f"Unknown sweep: {sweep}")
+    return json.loads(row['config'])
+
+
+# ============================================================
+# SEARCH SPACE
+# ============================================================
+
+def load_space(path=None):
+    """SEARCH_SPACE, or a YAML file of `name: [kind, args...]`"""
+    if not path:
+        return SEARCH_SPACE
+    with open(path) as f:
+        return {k: tuple(v) for k, v in yaml.safe_load(f).items()}
+
+
+def sample(space, rng):
+    params = {}
+    for name, (kind, *args) in space.items():
+        if kind == 'uniform':
+            params[name] = round(rng.uniform(*args), 4)
+        elif kind == 'log':
+            params[name] = float(f"{math.exp(rng.uniform(math.log(args[0]), math.log(args[1]))):.3g}")
+        elif kind == 'choice':
+            params[name] = rng.choice(args[0])
+        else:
+            raise ValueError(f"Unknown kind '{kind}' for {name} (uniform, log, choice)")
+    return params
+
+
+# ============================================================
+# PRUNERS
+# ============================================================
+
+def asha_rungs(min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    rungs = []
+    epoch = min_epochs
+    while epoch < max_epochs:
+        rungs.append(epoch)
+        epoch *= eta
+    return rungs
+
+
+def should_prune(db, sweep, trial, epoch, metric, config):
+    """
+    ASHA (stopping variant): at each rung a trial continues only if it is in the top
+    1/eta of all scores recorded at that rung so far.
+    Median: from the first rung on, stop if below the median of other trials at this epoch.
+    """
+    pruner = config['pruner']
+    if pruner == 'none':
+        return False
+    if pruner == 'asha':
+        if epoch not in config['rungs']:
+            return False
+        scores = [r['metric'] for r in db.execute(
+            "SELECT metric FROM reports WHERE sweep = ? AND epoch = ?", (sweep, epoch))]
+        if len(scores) < config['min_reports']:
+            return False
+        keep = max(1, len(scores) // config['eta'])
+        return metric < sorted(scores, reverse=True)[keep - 1]
+
+    # median stopping
+    if epoch < config['min_epochs']:
+        return False
+    others = [r['metric'] for r in db.execute(
+        "SELECT metric FROM reports WHERE sweep = ? AND epoch = ? AND trial != ?", (sweep, epoch, trial))]
+    if len(others) < config['min_reports']:
+        return False
+    others.sort()
+    mid = len(others) // 2
+    median = others[mid] if len(others) % 2 else (others[mid - 1] + others[mid]) / 2
+    return metric < median
+
+
+# ============================================================
+# TRIAL (runs in its own process)
+# ============================================================
+
+def run_trial(sweep, trial, device='cpu', db_path=SWEEP_DB):
+    from ultralytics import YOLO
+
+    db = connect(db_path)
+    config = load_config(db, sweep)
+    row = db.execute("SELECT params FROM trials WHERE sweep = ? AND trial = ?", (sweep, trial)).fetchone()
+    params = json.loads(row['params'])
+    start = time.time()
+    update_trial(db, sweep, trial, status='running', started=datetime.now().isoformat(timespec='seconds'))
+    state = {'pruned': False}
+
+    def on_fit_epoch_end(trainer):
+        epoch = trainer.epoch + 1
+        metric = float(trainer.metrics.get(config['metric'], 0.0))
+        with db:
+            db.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+                       (sweep, trial, epoch, metric, time.time() - start))
+        best = db.execute("SELECT MAX(metric) AS m, epoch FROM reports WHERE sweep = ? AND trial = ?",
+                          (sweep, trial)).fetchone()
+        update_trial(db, sweep, trial, epochs_run=epoch, best_metric=best['m'], best_epoch=best['epoch'])
+        if should_prune(db, sweep, trial, epoch, metric, config):
+            print(f"✂️  Trial {trial} pruned at epoch {epoch} ({metric:.3f})")
+            state['pruned'] = True
+            trainer.stop = True
+
+    model = YOLO(config['model'])
+    model.add_callback('on_fit_epoch_end', on_fit_epoch_end)
+    train_args = dict(config['base'], **params)
+    model.train(data=config['data'], epochs=config['max_epochs'], device=device,
+                workers=config['workers'], project=os.path.join(SWEEP_DIR, sweep), name=f"trial_{trial:03d}",
+                exist_ok=True, plots=False, save_period=-1, verbose=False, **train_args)
+
+    update_trial(db, sweep, trial, status='pruned' if state['pruned'] else 'completed',
+                 finished=datetime.now().isoformat(timespec='seconds'), seconds=time.time() - start,
+                 save_dir=str(model.trainer.save_dir))
+
+
+# ============================================================
+# DRIVER
+# ============================================================
+
+def default_devices():
+    """One slot per GPU, else CPU slots of ~4 cores each"""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return [str(i) for i in range(torch.cuda.device_count())]
+    except ImportError:
+        pass
+    return ['cpu'] * max(1, (os.cpu_count() or 1) // 4)
+
+
+def create_sweep(db, sweep, space, n_trials, pruner, seed, devices, workers, model, data):
+    from expand_and_train import count_dataset_files, get_recommended_training_params
+
+    train_images, _ = count_dataset_files('train')
+    base = get_recommended_training_params(train_images)
+    base = {k: v for k, v in base.items() if k not in ('comment', 'epochs', 'patience')}
+    config = {
+        'model': model, 'data': data, 'metric': METRIC, 'pruner': pruner, 'seed': seed,
+        'max_epochs': MAX_EPOCHS, 'min_epochs': MIN_EPOCHS, 'eta': ETA, 'min_reports': MIN_REPORTS,
+        'rungs': asha_rungs(), 'base': base, 'space': space, 'workers': workers,
+        'devices': devices,
+    }
+    rng = random.Random(seed)
+    # Trial 0 is the current rule-of-thumb config, so the sweep always has a baseline
+    trials = [{k: base[k] for k in space if k in base}]
+    trials += [sample(space, rng) for _ in range(n_trials - 1)]
+    with db:
+        db.execute("INSERT INTO sweeps VALUES (?, ?, ?)",
+                   (sweep, datetime.now().isoformat(timespec='seconds'), json.dumps(config)))
+        db.executemany("INSERT INTO trials (sweep, trial, params, status) VALUES (?, ?, ?, 'queued')",
+                       [(sweep, i, json.dumps(p)) for i, p in enumerate(trials)])
+    return config
+
+
+def launch(sweep, trial, device, threads, db_path):
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+    log_dir = os.path.join(SWEEP_DIR, sweep)
+    os.makedirs(log_dir, exist_ok=True)
+    log = open(os.path.join(log_dir, f"trial_{trial:03d}.log"), 'w')
+    cmd = [sys.executable, os.path.abspath(__file__), '_trial', sweep, str(trial), '--db', db_path]
+    if device == 'cpu':
+        cmd += ['--device', 'cpu']
+    else:
+        env['CUDA_VISIBLE_DEVICES'] = device   # Each trial sees exactly one GPU, as device 0
+        cmd += ['--device', '0']
+    proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+    proc.log = log
+    return proc
+
+
+def run_sweep(sweep, db_path=SWEEP_DB):
+    """Keep one trial running per device slot until the queue is empty (resumable)"""
+    db = connect(db_path)
+    config = load_config(db, sweep)
+    slots = config['devices']
+    threads = max(1, (os.cpu_count() or 1) // len(slots))
+    # Trials left 'running' by an interrupted driver start over
+    with db:
+        db.execute("UPDATE trials SET status = 'queued' WHERE sweep = ? AND status = 'running'", (sweep,))
+    queue = [r['trial'] for r in db.execute(
+        "SELECT trial FROM trials WHERE sweep = ? AND status = 'queued' ORDER BY trial", (sweep,))]
+
+    print(f"🚀 {len(queue)} trial(s) queued on {len(slots)} slot(s): {', '.join(slots)} "
+          f"({threads} CPU threads each)")
+    running = {}   # slot index -> (trial, process)
+    start = time.time()
+    try:
+        while queue or running:
+            for slot in range(len(slots)):
+                if slot not in running and queue:
+                    trial = queue.pop(0)
+                    running[slot] = (trial, launch(sweep, trial, slots[slot], threads, db_path))
+                    print(f"   ▶ trial {trial} on {slots[slot]}")
+            time.sleep(POLL_SECONDS)
+            for slot, (trial, proc) in list(running.items()):
+                if proc.poll() is None:
+                    continue
+                proc.log.close()
+                del running[slot]
+                status = db.execute("SELECT status, epochs_run, best_metric FROM trials "
+                                    "WHERE sweep = ? AND trial = ?", (sweep, trial)).fetchone()
+                if proc.returncode != 0:
+                    update_trial(db, sweep, trial, status='failed', error=f"exit code {proc.returncode}")
+                    print(f"   ❌ trial {trial} failed (see {SWEEP_DIR}/{sweep}/trial_{trial:03d}.log)")
+                else:
+                    print(f"   {'✂️ ' if status['status'] == 'pruned' else '✅'} trial {trial} "
+                          f"{status['status']} after {status['epochs_run']} epochs "
+                          f"({config['metric'].split('/')[-1]} {status['best_metric'] or 0:.3f})")
+    except KeyboardInterrupt:
+        print("\n⚠️  Interrupted - stopping running trials (re-run with --resume to continue)")
+        for trial, proc in running.values():
+            proc.terminate()
+            proc.wait()
+            proc.log.close()
+        raise
+    print(f"\n⏱️  Sweep wall time: {(time.time() - start) / 60:.1f} min")
+
+
+def show(sweep, db_path=SWEEP_DB, top=10):
+    db = connect(db_path)
+    config = load_config(db, sweep)
+    rows = db.execute("SELECT * FROM trials WHERE sweep = ? ORDER BY best_metric DESC", (sweep,)).fetchall()
+    finished = [r for r in rows if r['status'] in ('completed', 'pruned')]
+    epochs = sum(r['epochs_run'] or 0 for r in rows)
+    full = len(rows) * config['max_epochs']
+
+    print("=" * 60)
+    print(f"🧪 SWEEP '{sweep}' ({config['pruner']} pruning, metric {config['metric']})")
+    print("=" * 60)
+    counts = {}
+    for r in rows:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    print("Trials: " + ', '.join(f"{n} {s}" for s, n in sorted(counts.items())))
+    print(f"Epochs trained: {epochs} of {full} without pruning ({epochs / max(full, 1):.0%} of the compute)")
+
+    print(f"\nTop {min(top, len(finished))}:")
+    for r in finished[:top]:
+        params = json.loads(r['params'])
+        desc = ' '.join(f"{k}={v}" for k, v in params.items())
+        print(f"  #{r['trial']:<3d} {r['best_metric'] or 0:.3f} @ep{r['best_epoch']:<3} "
+              f"{r['status']:9s} {desc}")
+    if finished:
+        write_best(sweep, config, finished[0])
+    print("=" * 60)
+
+
+def write_best(sweep, config, row):
+    """Best trial as a train_runner.py profile with the full epoch budget"""
+    params = json.loads(row['params'])
+    train = dict(config['base'], **params)
+    train.update(epochs=50, batch='auto', workers='auto', cache='auto', device='auto',
+                 project='runs/detect', name=f"sweep_{sweep}", exist_ok=True)
+    profile = {'model': 'yolov8s.pt', 'data': config['data'], 'rebalance': False,
+               'register': {'name': f"sweep_{sweep}"}, 'train': train}
+    path = os.path.join(SWEEP_DIR, sweep, 'best_profile.yaml')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(f"# Best trial #{row['trial']} of sweep '{sweep}' "
+                f"({config['metric']} {row['best_metric']:.3f} at epoch {row['best_epoch']})\n")
+        yaml.safe_dump(profile, f, sort_keys=False)
+    print(f"\n💾 Best config: {path}")
+    print(f"👉 Full run: python train_runner.py {path}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep with early pruning")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='Start (or --resume) a sweep')
+    p.add_argument('--name', type=str, default=None, help='Sweep name (default: timestamp)')
+    p.add_argument('--trials', type=int, default=N_TRIALS)
+    p.add_argument('--pruner', choices=['asha', 'median', 'none'], default='asha')
+    p.add_argument('--space', type=str, default=None, help='YAML search space (name: [kind, args...])')
+    p.add_argument('--devices', type=str, default=None,
+                   help="Trial slots, e.g. '0,1' (one per GPU) or 'cpu,cpu,cpu' (default: auto)")
+    p.add_argument('--workers', type=int, default=0, help='Dataloader workers per trial')
+    p.add_argument('--model', type=str, default=MODEL)
+    p.add_argument('--data', type=str, default=DATA_YAML)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--resume', action='store_true', help='Continue queued/interrupted trials of --name')
+    p.add_argument('--db', type=str, default=SWEEP_DB)
+
+    p = sub.add_parser('show', help='Leaderboard for a sweep (writes best_profile.yaml)')
+    p.add_argument('name', type=str)
+    p.add_argument('--top', type=int, default=10)
+    p.add_argument('--db', type=str, default=SWEEP_DB)
+
+    p = sub.add_parser('list', help='All sweeps in the results file')
+    p.add_argument('--db', type=str, default=SWEEP_DB)
+
+    p = sub.add_parser('_trial', help=argparse.SUPPRESS)
+    p.add_argument('name', type=str)
+    p.add_argument('trial', type=int)
+    p.add_argument('--device', type=str, default='cpu')
+    p.add_argument('--db', type=str, default=SWEEP_DB)
+
+    args = parser.parse_args()
+
+    if args.command == '_trial':
+        run_trial(args.name, args.trial, args.device, args.db)
+    elif args.command == 'list':
+        db = connect(args.db)
+        for r in db.execute("SELECT s.sweep, s.created, COUNT(t.trial) AS n, MAX(t.best_metric) AS best "
+                            "FROM sweeps s LEFT JOIN trials t USING (sweep) GROUP BY s.sweep ORDER BY s.created"):
+            print(f"  {r['sweep']:24s} {r['created']}  {r['n']:3d} trials  best {r['best'] or 0:.3f}")
+    elif args.command == 'show':
+        show(args.name, args.db, args.top)
+    else:
+        name = args.name or datetime.now().strftime('%Y%m%d_%H%M%S')
+        db = connect(args.db)
+        if not args.resume:
+            if not os.path.exists(args.data):
+                print(f"❌ {args.data} not found - run generate_yaml.py first")
+                sys.exit(1)
+            if db.execute("SELECT 1 FROM sweeps WHERE sweep = ?", (name,)).fetchone():
+                print(f"❌ Sweep '{name}' exists - pass --resume or choose another --name")
+                sys.exit(1)
+            devices = args.devices.split(',') if args.devices else default_devices()
+            config = create_sweep(db, name, load_space(args.space), args.trials, args.pruner,
+                                  args.seed, devices, args.workers, args.model, args.data)
+            print(f"🧪 Sweep '{name}': {args.trials} trials, {config['pruner']} pruning, "
+                  f"up to {config['max_epochs']} epochs each (rungs {config['rungs']})")
+        run_sweep(name, args.db)
+        show(name, args.db)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,20 @@
 Optimized Training Script for Expanded Dataset (99 train + 24 val images)
 """
 
-from ultralytics import YOLO
-import torch
 import os
+from model_registry import register_model, box_metrics
+from rebalance import rebalanced_trainer
+from profile_training import add_profile_arguments, run_profile_from_args
+from ddp_cpu import add_ddp_arguments, train_cpu_ddp
 
+# Repeat-factor sampling: rare SKUs are drawn more often (see rebalance.py); opt in with --rebalance
+REBALANCE = False
 
-def train_with_augmented_data():
+
+def train_with_augmented_data(rebalance=REBALANCE, profile_args=None, cpu_ddp=0):
+    from ultralytics import YOLO
+    import torch
+    
     print("\n" + "=" * 70)
     print("🚀 RETAILEYE TRAINING - OPTIMIZED FOR AUGMENTED DATASET")
     print("=" * 70)
@@ -81,6 +89,15 @@ def train_with_augmented_data():
     print(f"   Image Size: {config['imgsz']}")
     print(f"   Optimizer: {config['optimizer']}")
     print(f"   Mosaic: {config['mosaic']}, Mixup: {config['mixup']}")
+    if cpu_ddp:
+        print(f"   CPU DDP: {cpu_ddp} workers (sharded uniform sampling)")
+    else:
+        print(f"   Sampling: {'repeat-factor (rare classes up-weighted)' if rebalance else 'uniform'}")
+    
+    trainer = rebalanced_trainer() if rebalance else None
+    if profile_args is not None:
+        run_profile_from_args(model_name, config, trainer, profile_args)
+        return None
     
     # Start training
     print("\n" + "=" * 70)
@@ -89,16 +106,18 @@ def train_with_augmented_data():
     print("\nThis will take approximately 20-40 minutes on RTX 3050...")
     print("Watch the mAP@50 metric - should improve over epochs\n")
     
-    results = model.train(**config)
+    if cpu_ddp:
+        best_model_path = train_cpu_ddp(model_name, config, cpu_ddp)['best']
+    else:
+        results = model.train(trainer=trainer, **config)
+        best_model_path = str(model.trainer.best)
     
     # Training complete
     print("\n" + "=" * 70)
     print("✅ TRAINING COMPLETED")
     print("=" * 70)
     
-    # Evaluate best model
-    best_model_path = 'runs/detect/RetailEye_Runs/augmented_v1/weights/best.pt'
-    
+    # Evaluate best model (where ultralytics actually saved it)
     if os.path.exists(best_model_path):
         print("\n📈 Evaluating Best Model...")
         best_model = YOLO(best_model_path)
@@ -113,6 +132,12 @@ def train_with_augmented_data():
         print(f"   mAP@50:      {metrics.box.map50:.3f}")
         print(f"   mAP@50-95:   {metrics.box.map:.3f}")
         
+        # Record the run (class names + metrics) so scripts can resolve it by alias
+        run_name = register_model(best_model_path, name='augmented_v1',
+                                  class_names=best_model.names, metrics=box_metrics(metrics))
+        print(f"\n📚 Registered as '{run_name}' in the model registry")
+        print(f"   Promote it with: python model_registry.py alias production {run_name}")
+        
         # Performance assessment
         print("\n🎯 Performance Assessment:")
         map50 = metrics.box.map50
@@ -154,7 +179,7 @@ def train_with_augmented_data():
         
         print("\n📋 Next Steps:")
         print("   1. Review training plots:")
-        print("      runs/detect/RetailEye_Runs/augmented_v1/")
+        print(f"      {os.path.dirname(os.path.dirname(best_model_path))}/")
         print("   2. Run inference:")
         print("      python inference.py")
         print("   3. If mAP < 0.4, augment more:")
@@ -170,10 +195,23 @@ def train_with_augmented_data():
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Train on the augmented dataset")
+    parser.add_argument('--rebalance', action='store_true',
+                        help='Repeat-factor sampling: draw images with rare classes more often')
+    add_profile_arguments(parser)
+    add_ddp_arguments(parser)
+    args = parser.parse_args()
+    
     try:
-        map50 = train_with_augmented_data()
+        map50 = train_with_augmented_data(rebalance=REBALANCE or args.rebalance,
+                                          profile_args=args if args.profile else None,
+                                          cpu_ddp=args.cpu_ddp)
         
-        if map50 == 0:
+        if map50 is None:
+            pass  # Profiling run - the report was printed above
+        elif map50 == 0:
             print("\n⚠️  Training completed but model did not learn")
             print("Review the solutions above and try again")
         elif map50 < 0.4:
@@ -1,12 +1,11 @@
-from ultralytics import YOLO
 import os
-import glob
-import yaml
 import sys
-import torch
 
 def validate_dataset(data_yaml_path):
     """Validate dataset before training"""
+    import yaml
+    import torch
+    
     print("\n" + "="*60)
     print("🔍 PRE-TRAINING VALIDATION")
     print("="*60)
@@ -31,15 +30,21 @@ def validate_dataset(data_yaml_path):
     train_path = os.path.join(base_path, data_config.get('train', 'images/train'))
     val_path = os.path.join(base_path, data_config.get('val', 'images/val'))
     
-    # Count images and labels
-    train_images = len(glob.glob(os.path.join(train_path, '*.jpg')))
-    val_images = len(glob.glob(os.path.join(val_path, '*.jpg')))
+    # Count images and labels (single scan per folder via the dataset index)
+    from dataset_index import DatasetIndex
+    index = DatasetIndex()
     
     train_labels_dir = train_path.replace('images', 'labels')
     val_labels_dir = val_path.replace('images', 'labels')
     
-    train_labels = len(glob.glob(os.path.join(train_labels_dir, '*.txt')))
-    val_labels = len(glob.glob(os.path.join(val_labels_dir, '*.txt')))
+    train_summary = index.summarize(train_path, train_labels_dir)
+    val_summary = index.summarize(val_path, val_labels_dir)
+    try:
+        index.save()    # Next run only re-parses labels that changed
+    except OSError:
+        pass  # Read-only data dir - still usable in memory
+    train_images, train_labels = train_summary['images'], train_summary['labels']
+    val_images, val_labels = val_summary['images'], val_summary['labels']
     
     num_classes = len(data_config.get('names', {}))
     
@@ -77,10 +82,7 @@ def validate_dataset(data_yaml_path):
         warnings.append(f"Validation: {val_images} images but {val_labels} labels")
     
     # Check if validation labels are empty
-    empty_val_labels = 0
-    for label_file in glob.glob(os.path.join(val_labels_dir, '*.txt')):
-        if os.path.getsize(label_file) == 0:
-            empty_val_labels += 1
+    empty_val_labels = len(val_summary['empty_labels'])
     
     if empty_val_labels == val_labels and val_labels > 0:
         warnings.append("All validation labels are EMPTY! Metrics will be meaningless.")
@@ -109,6 +111,9 @@ def validate_dataset(data_yaml_path):
     return True
 
 def train():
+    from ultralytics import YOLO
+    import torch
+    
     # Get the directory where this script is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
     data_yaml = os.path.join(script_dir, 'data', 'vista.yaml')
@@ -0,0 +1,346 @@
+"""
+Training Runner - One config-driven entry point for every training recipe
+Reads a YAML profile (profiles/*.yaml), probes this machine and replaces
+batch/workers/cache/device "auto" values with settings measured by short trial steps
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import shutil
+from datetime import datetime
+
+import yaml
+
+# --- CONFIGURATION ---
+DEFAULT_PROFILE = 'profiles/student.yaml'
+AUTOTUNE_CACHE = 'runs/autotune_cache.json'
+
+AUTOTUNE_DEFAULTS = {
+    'max_batch': 64,
+    'cpu_max_batch': 16,          # CPU trial steps are slow - don't probe past this
+    'trial_steps': 3,             # Timed optimizer steps per batch-size trial
+    'loader_batches': 8,          # Timed batches per dataloader-worker trial
+    'worker_candidates': [0, 2, 4, 8, 16],
+    'memory_fraction': 0.85,      # Max share of accelerator memory a batch may use
+    'ram_fraction': 0.5,          # Max share of free RAM for cache='ram'
+    'batch_tolerance': 0.03,      # Prefer a larger batch if within 3% of the best images/sec
+}
+AUTO_KEYS = ('batch', 'workers', 'cache', 'device')
+
+
+def load_profile(path):
+    """Profile dict with autotune defaults filled in"""
+    with open(path) as f:
+        profile = yaml.safe_load(f) or {}
+    profile.setdefault('model', 'yolov8s.pt')
+    profile.setdefault('data', 'data/vista.yaml')
+    profile.setdefault('train', {})
+    profile['autotune'] = dict(AUTOTUNE_DEFAULTS, **(profile.get('autotune') or {}))
+    return profile
+
+
+# ============================================================
+# HARDWARE PROBE
+# ============================================================
+
+def probe_hardware():
+    """CPU cores, RAM, disk and accelerator of this machine"""
+    import torch
+
+    hw = {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'cpu_cores': os.cpu_count() or 1,
+        'ram_gb': None,
+        'ram_available_gb': None,
+        'disk_free_gb': shutil.disk_usage('.').free / 1024**3,
+        'accelerator': 'cpu',
+        'device_name': platform.processor() or 'CPU',
+        'vram_gb': None,
+    }
+    try:
+        import psutil
+        mem = psutil.virtual_memory()
+        hw['ram_gb'] = mem.total / 1024**3
+        hw['ram_available_gb'] = mem.available / 1024**3
+    except ImportError:
+        if hasattr(os, 'sysconf') and 'SC_PHYS_PAGES' in os.sysconf_names:
+            page = os.sysconf('SC_PAGE_SIZE')
+            hw['ram_gb'] = os.sysconf('SC_PHYS_PAGES') * page / 1024**3
+            hw['ram_available_gb'] = os.sysconf('SC_AVPHYS_PAGES') * page / 1024**3
+
+    if torch.cuda.is_available():
+        props = torch.cuda.get_device_properties(0)
+        hw.update(accelerator='cuda', device_name=props.name, vram_gb=props.total_memory / 1024**3)
+    elif getattr(torch.backends, 'mps', None) is not None and torch.backends.mps.is_available():
+        hw.update(accelerator='mps', device_name='Apple MPS')
+    return hw
+
+
+def device_for(hw):
+    return {'cuda': 0, 'mps': 'mps'}.get(hw['accelerator'], 'cpu')
+
+
+# ============================================================
+# TRIAL STEPS
+# ============================================================
+
+def _is_oom(error):
+    return 'out of memory' in str(error).lower()
+
+
+def tune_batch(model_path, imgsz, hw, opts):
+    """
+    Time a few forward/backward/optimizer steps at doubling batch sizes.
+    Returns (batch, compute images/sec, trials).
+    """
+    import torch
+    from ultralytics import YOLO
+
+    device = torch.device('cuda:0' if hw['accelerator'] == 'cuda' else hw['accelerator'])
+    is_cuda = device.type == 'cuda'
+    net = YOLO(model_path).model.to(device).train()
+    for p in net.parameters():
+        p.requires_grad_(True)
+    optimizer = torch.optim.SGD(net.parameters(), lr=1e-5)
+
+    def sync():
+        if is_cuda:
+            torch.cuda.synchronize()
+
+    max_batch = opts['max_batch'] if hw['accelerator'] != 'cpu' else opts['cpu_max_batch']
+    trials = []
+    batch = 1
+    while batch <= max_batch:
+        try:
+            x = torch.rand(batch, 3, imgsz, imgsz, device=device)
+            if is_cuda:
+                torch.cuda.empty_cache()
+                torch.cuda.reset_peak_memory_stats()
+            for step in range(opts['trial_steps'] + 1):
+                if step == 1:       # Step 0 is warm-up (cudnn autotune, allocator)
+                    sync()
+                    start = time.perf_counter()
+                with torch.autocast(device.type, enabled=is_cuda):
+                    out = net(x)
+                outs = out if isinstance(out, (list, tuple)) else [out]
+                loss = sum(o.float().mean() for o in outs)
+                loss.backward()
+                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+            sync()
+            ips = batch * opts['trial_steps'] / (time.perf_counter() - start)
+            mem = torch.cuda.max_memory_allocated() / 1024**3 if is_cuda else None
+            trials.append({'batch': batch, 'images_per_sec': ips, 'mem_gb': mem})
+            print(f"   batch {batch:3d}: {ips:7.1f} img/s" + (f", {mem:.2f} GB" if mem is not None else ''))
+            if is_cuda and mem / hw['vram_gb'] > opts['memory_fraction']:
+                trials[-1]['too_large'] = True
+                break
+        except RuntimeError as e:
+            if not _is_oom(e):
+                raise
+            print(f"   batch {batch:3d}: out of memory")
+            trials.append({'batch': batch, 'oom': True})
+            if is_cuda:
+                torch.cuda.empty_cache()
+            break
+        batch *= 2
+
+    stable = [t for t in trials if not t.get('oom') and not t.get('too_large')]
+    if not stable:
+        return 1, 0.0, trials
+    best_ips = max(t['images_per_sec'] for t in stable)
+    chosen = max((t for t in stable if t['images_per_sec'] >= best_ips * (1 - opts['batch_tolerance'])),
+                 key=lambda t: t['batch'])
+    del net, optimizer
+    return chosen['batch'], chosen['images_per_sec'], trials
+
+
+def tune_workers(data_yaml, train_args, batch, hw, opts):
+    """
+    Time the real ultralytics train dataloader (augmentations included) per worker count.
+    Returns (workers, loader images/sec, number of train images, trials).
+    """
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import build_dataloader, build_yolo_dataset
+    from ultralytics.data.utils import check_det_dataset
+
+    data = check_det_dataset(data_yaml)
+    overrides = {k: v for k, v in train_args.items() if k not in AUTO_KEYS}
+    cfg = get_cfg(overrides=dict(overrides, batch=batch, cache=False, data=data_yaml))
+    dataset = build_yolo_dataset(cfg, data['train'], batch, data, mode='train')
+
+    trials = []
+    best = None
+    for workers in opts['worker_candidates']:
+        if workers > hw['cpu_cores']:
+            break
+        loader = build_dataloader(dataset, batch, workers, shuffle=True, rank=-1)
+        iterator = iter(loader)
+        next(iterator)      # Worker start-up is a one-off cost
+        start = time.perf_counter()
+        seen = 0
+        for _ in range(opts['loader_batches']):
+            try:
+                seen += len(next(iterator)['img'])
+            except StopIteration:
+                break
+        ips = seen / max(time.perf_counter() - start, 1e-9)
+        trials.append({'workers': workers, 'images_per_sec': ips})
+        print(f"   workers {workers:2d}: {ips:7.1f} img/s")
+        del iterator, loader
+        if best is not None and ips < best['images_per_sec'] * 1.05:
+            break           # More workers stopped paying off
+        if best is None or ips > best['images_per_sec']:
+            best = trials[-1]
+    return best['workers'], best['images_per_sec'], len(dataset.im_files), trials
+
+
+def choose_cache(n_images, imgsz, loader_ips, compute_ips, hw, opts):
+    """RAM cache if decoding is the bottleneck and it fits, else disk (.npy), else none"""
+    needed_gb = n_images * imgsz * imgsz * 3 / 1024**3
+    if loader_ips >= compute_ips * 1.1:
+        return False, f"dataloader ({loader_ips:.0f} img/s) already outpaces compute ({compute_ips:.0f} img/s)"
+    if hw['ram_available_gb'] and needed_gb < hw['ram_available_gb'] * opts['ram_fraction']:
+        return 'ram', f"decoded dataset ~{needed_gb:.1f} GB fits in free RAM"
+    if needed_gb * 1.2 < hw['disk_free_gb']:
+        return 'disk', f"~{needed_gb:.1f} GB of .npy files fits on disk (too big for RAM)"
+    return False, "not enough RAM or disk to cache"
+
+
+def autotune(profile, hw, retune=False):
+    """Resolve every 'auto' training setting; trial results are cached per machine + profile"""
+    train_args = profile['train']
+    opts = profile['autotune']
+    imgsz = int(train_args.get('imgsz', 640))
+    key = '|'.join(str(v) for v in (profile['model'], profile['data'], imgsz,
+                                    hw['device_name'], hw['cpu_cores']))
+
+    cache = {}
+    if os.path.exists(AUTOTUNE_CACHE):
+        with open(AUTOTUNE_CACHE) as f:
+            cache = json.load(f)
+    if key in cache and not retune:
+        print("♻️  Using cached auto-tune results (pass --retune to re-measure)")
+        return cache[key]
+
+    result = {'device': device_for(hw)}
+    print("\n🔬 Batch-size trials:")
+    result['batch'], compute_ips, result['batch_trials'] = tune_batch(profile['model'], imgsz, hw, opts)
+    result['compute_images_per_sec'] = compute_ips
+
+    print("\n🔬 Dataloader-worker trials:")
+    result['workers'], loader_ips, n_images, result['worker_trials'] = tune_workers(
+        profile['data'], train_args, result['batch'], hw, opts)
+    result['loader_images_per_sec'] = loader_ips
+
+    result['cache'], result['cache_reason'] = choose_cache(n_images, imgsz, loader_ips, compute_ips, hw, opts)
+    result['tuned'] = datetime.now().isoformat(timespec='seconds')
+
+    cache[key] = result
+    os.makedirs(os.path.dirname(AUTOTUNE_CACHE), exist_ok=True)
+    with open(AUTOTUNE_CACHE, 'w') as f:
+        json.dump(cache, f, indent=2)
+    return result
+
+
+def resolve_settings(profile, hw, retune=False):
+    """Final ultralytics train() kwargs plus the tuning record"""
+    train_args = dict(profile['train'])
+    auto = [k for k in AUTO_KEYS if train_args.get(k) == 'auto']
+    tuning = None
+    if 'device' in auto:
+        train_args['device'] = device_for(hw)
+    if set(auto) - {'device'}:
+        tuning = autotune(profile, hw, retune=retune)
+        for k in auto:
+            if k != 'device':
+                train_args[k] = tuning[k]
+    return train_args, auto, tuning
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+def prepare(profile_path, retune=False):
+    """Load a profile, probe the machine and resolve 'auto' settings (printed)"""
+    profile = load_profile(profile_path)
+
+    print("=" * 60)
+    print(f"🧭 TRAINING RUNNER: {profile_path}")
+    print("=" * 60)
+    hw = probe_hardware()
+    ram = f"{hw['ram_gb']:.1f} GB RAM" if hw['ram_gb'] else "RAM unknown"
+    vram = f", {hw['vram_gb']:.1f} GB" if hw['vram_gb'] else ''
+    print(f"🖥️  {hw['cpu_cores']} CPU cores, {ram}, {hw['accelerator'].upper()}: {hw['device_name']}{vram}")
+
+    train_args, auto, tuning = resolve_settings(profile, hw, retune=retune)
+
+    print("\n⚙️  Settings:")
+    for k in AUTO_KEYS:
+        tag = ' (auto)' if k in auto else ''
+        print(f"   {k:8s}: {train_args.get(k)}{tag}")
+    if tuning:
+        print(f"   compute {tuning['compute_images_per_sec']:.1f} img/s | "
+              f"loader {tuning['loader_images_per_sec']:.1f} img/s | cache: {tuning['cache_reason']}")
+    return profile, hw, train_args, tuning
+
+
+def record_run(model, profile_path, profile, hw, train_args, tuning):
+    """runner.json next to the run's own args.yaml, then the model registry entry"""
+    save_dir = str(model.trainer.save_dir)
+    record = {'profile': profile_path, 'profile_config': profile, 'hardware': hw,
+              'resolved': {k: train_args.get(k) for k in AUTO_KEYS}, 'autotune': tuning}
+    with open(os.path.join(save_dir, 'runner.json'), 'w') as f:
+        json.dump(record, f, indent=2, default=str)
+    print(f"\n💾 Run settings recorded in {os.path.join(save_dir, 'runner.json')}")
+
+    register = profile.get('register')
+    best = str(model.trainer.best)
+    if register and os.path.exists(best):
+        from model_registry import register_model, record_benchmark
+        name = register_model(best, name=register.get('name'), alias=register.get('alias'),
+                              class_names=model.names)
+        record_benchmark(name, 'training_settings', record['resolved'])
+        print(f"📚 Registered {best} as '{name}'")
+    return save_dir
+
+
+def run(profile_path, dry_run=False, retune=False):
+    profile, hw, train_args, tuning = prepare(profile_path, retune=retune)
+    if dry_run:
+        print("\n(dry run) Not training")
+        return None
+
+    from ultralytics import YOLO
+    from rebalance import rebalanced_trainer
+
+    model = YOLO(profile['model'])
+    model.train(trainer=rebalanced_trainer() if profile.get('rebalance') else None,
+                data=profile['data'], **{k: v for k, v in train_args.items() if k != 'data'})
+    return record_run(model, profile_path, profile, hw, train_args, tuning)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Config-driven training with hardware auto-tuning")
+    parser.add_argument('profile', nargs='?', default=DEFAULT_PROFILE,
+                        help=f'YAML profile (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--dry-run', action='store_true', help='Probe and tune, but do not train')
+    parser.add_argument('--retune', action='store_true', help='Ignore cached auto-tune results')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.profile):
+        print(f"❌ Profile not found: {args.profile}")
+        sys.exit(1)
+    run(args.profile, dry_run=args.dry_run, retune=args.retune)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""
+Training Supervisor - Crash-safe, automatically resumed training runs
+Runs a train_runner.py profile in a child process and restarts it from the latest
+checkpoint when it dies. Checkpoints are written atomically on a time budget, hold
+everything needed for an exact resume (raw + EMA weights, optimizer, AMP scaler, RNG
+state) and are pruned to a disk cap. Every epoch reseeds its RNGs from (seed, epoch),
+so a resumed run sees the same data order and augmentations as an uninterrupted one.
+
+Usage:
+    python train_supervisor.py profiles/student.yaml          # start, or resume if interrupted
+    python train_supervisor.py profiles/student.yaml --status
+    python train_supervisor.py profiles/student.yaml --fresh  # new run dir, ignore checkpoints
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+from datetime import datetime
+
+# --- CONFIGURATION ---
+STATE_DIR = 'runs/supervisor'
+CHECKPOINT_MINUTES = 10.0    # Write a checkpoint once this much training time has passed (epoch boundaries)
+KEEP_CHECKPOINTS = 3         # Newest checkpoints kept
+MAX_CHECKPOINT_GB = 2.0      # Older checkpoints are deleted beyond this (the newest always stays)
+MAX_RESTARTS = 5
+RESTART_BACKOFF = 10         # Seconds before restart n waits n * this
+
+
+# ============================================================
+# FILES
+# ============================================================
+
+def atomic_write_json(path, data):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def state_path(profile_path):
+    return os.path.join(STATE_DIR, os.path.splitext(os.path.basename(profile_path))[0] + '.json')
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def update_state(path, **fields):
+    state = load_state(path) or {}
+    state.update(fields, updated=datetime.now().isoformat(timespec='seconds'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write_json(path, state)
+    return state
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def list_checkpoints(checkpoint_dir):
+    """Checkpoint paths, oldest first (names sort by epoch)"""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    return sorted(os.path.join(checkpoint_dir, name) for name in os.listdir(checkpoint_dir)
+                  if name.startswith('ckpt_') and name.endswith('.pt'))
+
+
+def prune_checkpoints(checkpoint_dir, keep=KEEP_CHECKPOINTS, max_gb=MAX_CHECKPOINT_GB):
+    """Delete the oldest checkpoints beyond `keep` or the disk cap; returns deleted paths"""
+    paths = list_checkpoints(checkpoint_dir)
+    sizes = {p: os.path.getsize(p) for p in paths}
+    deleted = []
+    while len(paths) > 1 and (len(paths) > keep or sum(sizes[p] for p in paths) > max_gb * 1024**3):
+        oldest = paths.pop(0)
+        os.remove(oldest)
+        deleted.append(oldest)
+    return deleted
+
+
+def latest_checkpoint(checkpoint_dir):
+    pointer = os.path.join(checkpoint_dir, 'latest.json')
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            path = json.load(f).get('path')
+        if path and os.path.exists(path):
+            return path
+    paths = list_checkpoints(checkpoint_dir)
+    return paths[-1] if paths else None
+
+
+# ============================================================
+# TRAINER (runs in the child process)
+# ============================================================
+
+def epoch_seed(seed, epoch):
+    return (seed * 1_000_003 + epoch) % 2**32
+
+
+def supervised_trainer(base=None, state_file=None, minutes=CHECKPOINT_MINUTES,
+                       keep=KEEP_CHECKPOINTS, max_gb=MAX_CHECKPOINT_GB):
+    """
+    Trainer subclass (of `base`, default DetectionTrainer) that writes resume checkpoints
+    to <save_dir>/checkpoints and restores the full state from them.
+    """
+    import random
+    from copy import deepcopy
+
+    import numpy as np
+    import torch
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils.torch_utils import de_parallel
+
+    base = base or DetectionTrainer
+
+    class SupervisedTrainer(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.checkpoint_dir = os.path.join(str(self.save_dir), 'checkpoints')
+            self._last_checkpoint = time.time()
+            self.add_callback('on_train_start', self._supervisor_start)
+            self.add_callback('on_train_epoch_start', self._seed_epoch)
+            self.add_callback('on_fit_epoch_end', self._maybe_checkpoint)
+
+        # --- deterministic epochs ---
+
+        def _seed_epoch(self, trainer):
+            seed = epoch_seed(int(self.args.seed), self.epoch)
+            random.seed(seed)
+            np.random.seed(seed)
+            torch.manual_seed(seed)
+            loader = self.train_loader
+            if getattr(loader, 'generator', None) is not None:
+                loader.generator.manual_seed(seed)
+            # Prefetching workers already drew from the old seeds: restart them
+            if getattr(loader, 'num_workers', 0) > 0 and hasattr(loader, 'reset'):
+                loader.reset()
+
+        # --- checkpoints ---
+
+        def _supervisor_start(self, trainer):
+            if state_file:
+                update_state(state_file, status='running', pid=os.getpid(), host=socket.gethostname(),
+                             save_dir=str(self.save_dir), checkpoint_dir=self.checkpoint_dir)
+
+        def _maybe_checkpoint(self, trainer):
+            final = self.epoch + 1 >= self.epochs or self.stop
+            if final or time.time() - self._last_checkpoint >= minutes * 60:
+                self.save_checkpoint()
+
+        def save_checkpoint(self):
+            start = time.time()
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            ckpt = {
+                # ultralytics resume format (YOLO(path).train(resume=True) reads these)
+                'epoch': self.epoch,
+                'best_fitness': self.best_fitness,
+                'model': None,
+                'ema': deepcopy(self.ema.ema).half(),
+                'updates': self.ema.updates,
+                'optimizer': self.optimizer.state_dict(),
+                'train_args': vars(self.args),
+                'date': datetime.now().isoformat(),
+                # exact resume
+                'model_state': de_parallel(self.model).state_dict(),
+                'scaler': self.scaler.state_dict(),
+                'rng': {'python': random.getstate(), 'numpy': np.random.get_state(),
+                        'torch': torch.get_rng_state(),
+                        'cuda': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None},
+            }
+            path = os.path.join(self.checkpoint_dir, f"ckpt_e{self.epoch + 1:04d}.pt")
+            tmp = f"{path}.tmp"
+            with open(tmp, 'wb') as f:
+                torch.save(ckpt, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            atomic_write_json(os.path.join(self.checkpoint_dir, 'latest.json'),
+                              {'path': path, 'epoch': self.epoch + 1, 'saved': ckpt['date']})
+            deleted = prune_checkpoints(self.checkpoint_dir, keep, max_gb)
+            self._last_checkpoint = time.time()
+            size_mb = os.path.getsize(path) / 1024**2
+            print(f"💾 Checkpoint epoch {self.epoch + 1}: {path} ({size_mb:.0f} MB, "
+                  f"{time.time() - start:.1f}s{f', pruned {len(deleted)}' if deleted else ''})")
+            if state_file:
+                update_state(state_file, checkpoint=path, checkpoint_epoch=self.epoch + 1)
+
+        def resume_training(self, ckpt):
+            super().resume_training(ckpt)
+            if not ckpt or 'model_state' not in ckpt:
+                return
+            # ultralytics resumes from EMA weights; restore the raw weights and the rest
+            de_parallel(self.model).load_state_dict(ckpt['model_state'])
+            self.scaler.load_state_dict(ckpt['scaler'])
+            rng = ckpt['rng']
+            random.setstate(rng['python'])
+            np.random.set_state(rng['numpy'])
+            torch.set_rng_state(rng['torch'])
+            if rng['cuda'] is not None and torch.cuda.is_available():
+                torch.cuda.set_rng_state_all(rng['cuda'])
+            print(f"♻️  Restored weights, optimizer, scaler and RNG state from epoch {ckpt['epoch'] + 1}")
+
+    return SupervisedTrainer
+
+
+def run_child(profile_path, state_file, resume=None, minutes=CHECKPOINT_MINUTES,
+              keep=KEEP_CHECKPOINTS, max_gb=MAX_CHECKPOINT_GB):
+    """One training attempt: fresh from the profile, or resumed from a checkpoint"""
+    from ultralytics import YOLO
+    from rebalance import rebalanced_trainer
+    from train_runner import load_profile, prepare, record_run
+
+    state = load_state(state_file) or {}
+    if resume:
+        profile = load_profile(profile_path)
+        hw, train_args, tuning = state.get('hardware'), state.get('train_args', {}), state.get('autotune')
+    else:
+        profile, hw, train_args, tuning = prepare(profile_path)
+        train_args = dict(train_args, exist_ok=False)   # Never overwrite an earlier run
+        train_args.setdefault('seed', 0)
+        update_state(state_file, hardware=hw, train_args=train_args, autotune=tuning)
+
+    trainer = supervised_trainer(rebalanced_trainer() if profile.get('rebalance') else None,
+                                 state_file, minutes, keep, max_gb)
+    if resume:
+        print(f"\n♻️  Resuming from {resume}")
+        model = YOLO(resume)
+        model.train(trainer=trainer, resume=resume)
+    else:
+        model = YOLO(profile['model'])
+        model.train(trainer=trainer, data=profile['data'],
+                    **{k: v for k, v in train_args.items() if k != 'data'})
+    record_run(model, profile_path, profile, hw, train_args, tuning)
+
+
+# ============================================================
+# SUPERVISOR (parent process)
+# ============================================================
+
+def find_resume_point(state):
+    """Latest checkpoint of an unfinished run, or None"""
+    if not state or state.get('status') == 'completed' or not state.get('checkpoint_dir'):
+        return None
+    return latest_checkpoint(state['checkpoint_dir'])
+
+
+def supervise(profile_path, fresh=False, max_restarts=MAX_RESTARTS, minutes=CHECKPOINT_MINUTES,
+              keep=KEEP_CHECKPOINTS, max_gb=MAX_CHECKPOINT_GB):
+    path = state_path(profile_path)
+    state = load_state(path)
+
+    print("=" * 60)
+    print(f"🛡️  TRAINING SUPERVISOR: {profile_path}")
+    print("=" * 60)
+    if state and state.get('status') in ('starting', 'running') and state.get('host', socket.gethostname()) \
+            == socket.gethostname() and pid_alive(state.get('supervisor_pid', -1)):
+        print(f"❌ Already supervised by pid {state['supervisor_pid']} ({state.get('save_dir')})")
+        return 1
+
+    resume = None if fresh else find_resume_point(state)
+    if resume:
+        print(f"⚠️  Interrupted run found: {state.get('save_dir')} (status: {state.get('status')})")
+        print(f"   Resuming from {resume}")
+        restarts = state.get('restarts', 0)
+    else:
+        if fresh or (state and state.get('status') == 'completed'):
+            state = None
+            if os.path.exists(path):
+                os.remove(path)
+        restarts = 0
+    update_state(path, profile=profile_path, status='starting', supervisor_pid=os.getpid(),
+                 host=socket.gethostname(), restarts=restarts)
+
+    while True:
+        cmd = [sys.executable, os.path.abspath(__file__), profile_path, '--child', '--state', path,
+               '--minutes', str(minutes), '--keep', str(keep), '--max-gb', str(max_gb)]
+        if resume:
+            cmd += ['--resume-from', resume]
+        try:
+            code = subprocess.call(cmd)
+        except KeyboardInterrupt:
+            update_state(path, status='interrupted')
+            print("\n⚠️  Interrupted - run this command again to resume from the last checkpoint")
+            return 130
+
+        if code == 0:
+            state = update_state(path, status='completed', finished=datetime.now().isoformat(timespec='seconds'))
+            print(f"\n✅ Training complete: {state.get('save_dir')} ({restarts} restart(s))")
+            return 0
+
+        state = update_state(path, status='crashed', last_exit_code=code)
+        if restarts >= max_restarts:
+            print(f"\n❌ Child exited with code {code}; giving up after {restarts} restart(s)")
+            print("   Fix the cause, then run this command again to resume")
+            return 1
+        restarts += 1
+        resume = find_resume_point(state)
+        wait = RESTART_BACKOFF * restarts
+        where = f"checkpoint {resume}" if resume else "the start (no checkpoint yet)"
+        print(f"\n⚠️  Child exited with code {code}; restart {restarts}/{max_restarts} from {where} in {wait}s")
+        update_state(path, restarts=restarts)
+        time.sleep(wait)
+
+
+def show_status(profile_path):
+    state = load_state(state_path(profile_path))
+    if not state:
+        print(f"No supervised run for {profile_path}")
+        return
+    print(f"Status:      {state.get('status')}  (updated {state.get('updated')})")
+    print(f"Run dir:     {state.get('save_dir')}")
+    print(f"Checkpoint:  {state.get('checkpoint')} (epoch {state.get('checkpoint_epoch')})")
+    print(f"Restarts:    {state.get('restarts', 0)}")
+    if state.get('checkpoint_dir'):
+        paths = list_checkpoints(state['checkpoint_dir'])
+        total = sum(os.path.getsize(p) for p in paths) / 1024**2
+        print(f"On disk:     {len(paths)} checkpoint(s), {total:.0f} MB")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crash-safe, auto-resuming training supervisor")
+    parser.add_argument('profile', help='train_runner.py profile, e.g. profiles/student.yaml')
+    parser.add_argument('--fresh', action='store_true', help='Start a new run even if one was interrupted')
+    parser.add_argument('--status', action='store_true', help='Show the supervised run and exit')
+    parser.add_argument('--max-restarts', type=int, default=MAX_RESTARTS)
+    parser.add_argument('--minutes', type=float, default=CHECKPOINT_MINUTES,
+                        help=f'Checkpoint time budget (default: {CHECKPOINT_MINUTES})')
+    parser.add_argument('--keep', type=int, default=KEEP_CHECKPOINTS, help='Checkpoints to keep')
+    parser.add_argument('--max-gb', type=float, default=MAX_CHECKPOINT_GB, help='Checkpoint disk cap')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--state', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--resume-from', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.profile, args.state, args.resume_from, args.minutes, args.keep, args.max_gb)
+        return
+    if not os.path.exists(args.profile):
+        print(f"❌ Profile not found: {args.profile}")
+        sys.exit(1)
+    if args.status:
+        show_status(args.profile)
+        return
+    sys.exit(supervise(args.profile, fresh=args.fresh, max_restarts=args.max_restarts,
+                       minutes=args.minutes, keep=args.keep, max_gb=args.max_gb))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,13 @@ Quick validation script for the trained model
 """
 from ultralytics import YOLO
 import os
+from model_registry import resolve_weights, find_entry_by_weights, record_metrics, box_metrics
 
 print("\n" + "=" * 70)
 print("📈 VALIDATING TRAINED MODEL")
 print("=" * 70)
 
-best_model_path = 'runs/detect/RetailEye_Runs/augmented_v1/weights/best.pt'
+best_model_path = resolve_weights('production', default='runs/detect/RetailEye_Runs/augmented_v1/weights/best.pt')
 
 if os.path.exists(best_model_path):
     print(f"\nLoading model: {best_model_path}")
@@ -26,6 +27,10 @@ if os.path.exists(best_model_path):
     print(f"   mAP@50:      {metrics.box.map50:.3f}")
     print(f"   mAP@50-95:   {metrics.box.map:.3f}")
     
+    entry = find_entry_by_weights(best_model_path)
+    if entry and record_metrics(entry['name'], box_metrics(metrics)):
+        print(f"\n📚 Metrics recorded in model registry ('{entry['name']}')")
+    
     # Performance assessment
     print("\n🎯 Performance Assessment:")
     map50 = metrics.box.map50
@@ -24,7 +24,7 @@ def check_gpu():
 
 def check_packages():
     print("\n📦 Checking Required Packages...")
-    required = ['ultralytics', 'pandas', 'cv2', 'tqdm', 'numpy']
+    required = ['ultralytics', 'cv2', 'tqdm', 'numpy']
     all_good = True
     
     for package in required:
@@ -95,14 +95,13 @@ def check_data_files():
     else:
         print(f"   ⚠️  {json_file} NOT FOUND - You need to add this before running convert_data.py")
     
-    # Check training images
-    train_imgs = len(os.listdir('data/images/train')) if os.path.exists('data/images/train') else 0
-    val_imgs = len(os.listdir('data/images/val')) if os.path.exists('data/images/val') else 0
-    test_imgs = len(os.listdir('data/images/test')) if os.path.exists('data/images/test') else 0
-    
-    # Check labels
-    train_labels = len(os.listdir('data/labels/train')) if os.path.exists('data/labels/train') else 0
-    val_labels = len(os.listdir('data/labels/val')) if os.path.exists('data/labels/val') else 0
+    # Check images and labels (one cached scan of every split)
+    from dataset_index import get_index
+    index = get_index()
+    train, val, test = (index.split_summary(split) for split in ('train', 'val', 'test'))
+    train_imgs, train_labels = train['images'], train['labels']
+    val_imgs, val_labels = val['images'], val['labels']
+    test_imgs = test['images']
     
     print(f"   📷 Training images: {train_imgs} | Labels: {train_labels}")
     print(f"   📷 Validation images: {val_imgs} | Labels: {val_labels}")
@@ -139,10 +138,28 @@ def check_data_files():
     return train_imgs > 0 and val_imgs > 0
 
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Verify the RetailEye environment")
+    parser.add_argument('--quick', action='store_true',
+                        help='Only check directories and data files (skips torch/package imports)')
+    args = parser.parse_args()
+    
     print("="*60)
     print("🔧 RetailEye Environment Verification")
     print("="*60)
     
+    if args.quick:
+        dirs_ok = check_directories()
+        data_ok = check_data_files()
+        print("\n" + "="*60)
+        print("📋 SUMMARY (quick)")
+        print("="*60)
+        print(f"{'✅' if dirs_ok else '❌'} Directories")
+        print(f"{'✅' if data_ok else '⚠️ '} Data files")
+        print("="*60)
+        sys.exit(0 if dirs_ok and data_ok else 1)
+    
     gpu_ok = check_gpu()
     packages_ok = check_packages()
     dirs_ok = check_directories()